@@ -0,0 +1,14 @@
+class ApiError(Exception):
+    """Ошибка запроса к API, ответ - JSON с кодом status."""
+
+    def __init__(self, status, message, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.errors = errors
+
+    def as_dict(self):
+        data = {'detail': self.message}
+        if self.errors is not None:
+            data['errors'] = self.errors
+        return data
@@ -0,0 +1,66 @@
+"""Представление моделей в JSON с выбором полей (?fields=id,text).
+
+Каждое поле - функция от объекта, поэтому ненужные поля не считаются
+вовсе, а для списков постов хватает одного запроса с автором и группой.
+"""
+from django.urls import reverse
+
+from .errors import ApiError
+
+
+def iso(value):
+    return value.isoformat() if value else None
+
+
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'pub_date': lambda post: iso(post.pub_date),
+    'image': lambda post: post.image.url if post.image else None,
+    'thumbnail': lambda post: post.thumbnail_url or None,
+    'comment_count': lambda post: post.comment_count,
+    'url': lambda post: reverse('posts:post', args=[post.author.username,
+                                                    post.pk]),
+}
+GROUP_FIELDS = {
+    'slug': lambda group: group.slug,
+    'title': lambda group: group.title,
+    'description': lambda group: group.description,
+}
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.pk,
+    'parent': lambda comment: comment.parent_id,
+    'depth': lambda comment: comment.depth,
+    'author': lambda comment: comment.author.username,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: iso(comment.created),
+}
+PROFILE_FIELDS = {
+    'username': lambda user: user.username,
+    'full_name': lambda user: user.get_full_name(),
+    'posts_count': lambda user: user.stats.posts_count,
+    'followers_count': lambda user: user.stats.followers_count,
+    'following_count': lambda user: user.stats.following_count,
+}
+
+
+def requested_fields(request, available):
+    """Поля из ?fields=, по умолчанию все."""
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(available)
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ApiError(400, f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+
+def serialize(obj, available, fields):
+    return {field: available[field](obj) for field in fields}
+
+
+def serialize_many(objects, available, fields):
+    return [serialize(obj, available, fields) for obj in objects]
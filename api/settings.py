@@ -0,0 +1,4 @@
+# Сколько записей можно запросить на одну страницу ответа (?limit=).
+API_PAGE_LIMIT = 100
+# Сколько постов можно получить или создать одним запросом.
+API_BULK_LIMIT = 100
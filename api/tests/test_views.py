@@ -0,0 +1,188 @@
+import json
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.settings import POSTS_PER_PAGE
+from posts.tests import constants
+
+POSTS_URL = reverse('api:posts')
+POSTS_BULK_URL = reverse('api:posts_bulk')
+FOLLOW_URL = reverse('api:follow_index')
+FOLLOW_BULK_URL = reverse('api:follow_bulk')
+GROUP_POSTS_URL = reverse('api:group_posts', args=[constants.GROUP_SLUG])
+PROFILE_URL = reverse('api:profile', args=[constants.USERNAME])
+PROFILE_FOLLOW_URL = reverse('api:profile_follow', args=[constants.USERNAME])
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=constants.USERNAME)
+        cls.reader = User.objects.create_user(username=constants.USERNAME2)
+        cls.group = Group.objects.create(
+            title=constants.GROUP_NAME,
+            slug=constants.GROUP_SLUG,
+            description=constants.GROUP_DESCRIPTION,
+        )
+        cls.posts = [
+            Post.objects.create(text=f'Test-{i}', author=cls.author,
+                                group=cls.group)
+            for i in range(POSTS_PER_PAGE + 2)
+        ]
+        cls.post = cls.posts[-1]
+        cls.post_url = reverse('api:post', args=[cls.post.pk])
+        cls.comments_url = reverse('api:post_comments', args=[cls.post.pk])
+        cls.guest_client = Client()
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def send(self, client, method, url, data):
+        return getattr(client, method)(url, json.dumps(data),
+                                       content_type='application/json')
+
+    def test_cursor_pages(self):
+        """Проверка постраничного вывода постов по курсору"""
+        for url in (POSTS_URL, GROUP_POSTS_URL,
+                    reverse('api:profile_posts', args=[self.author])):
+            with self.subTest(url=url):
+                first = self.guest_client.get(url).json()
+                self.assertEqual(len(first['results']), POSTS_PER_PAGE)
+                self.assertEqual(first['results'][0]['id'], self.post.pk)
+                second = self.guest_client.get(
+                    url, {'after': first['next']}
+                ).json()
+                self.assertEqual(len(second['results']), 2)
+                self.assertIsNone(second['next'])
+
+    def test_sparse_fields(self):
+        """Проверка выбора полей ответа"""
+        response = self.guest_client.get(self.post_url,
+                                         {'fields': 'id,author'})
+        self.assertEqual(response.json(), {'id': self.post.pk,
+                                           'author': self.author.username})
+        response = self.guest_client.get(self.post_url, {'fields': 'bad'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_etag(self):
+        """Проверка ответа 304 на неизменившиеся данные"""
+        response = self.guest_client.get(self.post_url)
+        etag = response['ETag']
+        response = self.guest_client.get(self.post_url,
+                                         HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.send(self.author_client, 'patch', self.post_url,
+                  {'text': 'Changed'})
+        response = self.guest_client.get(self.post_url,
+                                         HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['text'], 'Changed')
+
+    def test_create_post_uses_form(self):
+        """Проверка создания поста с проверкой через PostForm"""
+        response = self.send(self.guest_client, 'post', POSTS_URL,
+                             {'text': 'New'})
+        self.assertEqual(response.status_code, 401)
+        response = self.send(self.reader_client, 'post', POSTS_URL,
+                             {'text': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+        response = self.send(self.reader_client, 'post', POSTS_URL,
+                             {'text': 'New', 'group': self.group.pk})
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get(pk=response.json()['id'])
+        self.assertEqual((post.author, post.group),
+                         (self.reader, self.group))
+
+    def test_edit_post(self):
+        """Проверка, что изменить пост может только автор"""
+        response = self.send(self.reader_client, 'patch', self.post_url,
+                             {'text': 'Changed'})
+        self.assertEqual(response.status_code, 403)
+        response = self.send(self.author_client, 'patch', self.post_url,
+                             {'text': 'Changed'})
+        self.assertEqual(response.status_code, 200)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.text, self.post.group),
+                         ('Changed', self.group))
+
+    def test_bulk_fetch(self):
+        """Проверка получения постов по списку id в порядке запроса"""
+        ids = [self.posts[1].pk, self.posts[0].pk, 0]
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(
+                POSTS_BULK_URL, {'ids': ','.join(map(str, ids))}
+            )
+        data = response.json()
+        self.assertEqual([post['id'] for post in data['results']], ids[:2])
+        self.assertEqual(data['missing'], [0])
+
+    def test_bulk_create(self):
+        """Проверка, что посты создаются все вместе или никакие"""
+        count = Post.objects.count()
+        response = self.send(self.author_client, 'post', POSTS_BULK_URL,
+                             {'posts': [{'text': 'One'}, {'text': ''}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['errors']), ['1'])
+        self.assertEqual(Post.objects.count(), count)
+        response = self.send(self.author_client, 'post', POSTS_BULK_URL,
+                             {'posts': [{'text': 'One'}, {'text': 'Two'}]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Post.objects.count(), count + 2)
+
+    def test_comments(self):
+        """Проверка добавления комментариев и ответов"""
+        response = self.send(self.reader_client, 'post', self.comments_url,
+                             {'text': 'Comment'})
+        self.assertEqual(response.status_code, 201)
+        parent = response.json()['id']
+        self.send(self.reader_client, 'post', self.comments_url,
+                  {'text': 'Reply', 'parent': parent})
+        results = self.guest_client.get(self.comments_url).json()['results']
+        self.assertEqual([(item['text'], item['depth']) for item in results],
+                         [('Comment', 0), ('Reply', 1)])
+        replies = self.guest_client.get(self.comments_url,
+                                        {'root': parent}).json()['results']
+        self.assertEqual([item['text'] for item in replies], ['Reply'])
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_follow(self):
+        """Проверка подписки, ленты и отписки"""
+        self.assertEqual(self.guest_client.get(FOLLOW_URL).status_code, 401)
+        response = self.reader_client.post(PROFILE_FOLLOW_URL)
+        self.assertEqual(response.json(), {'changed': True})
+        feed = self.reader_client.get(FOLLOW_URL).json()
+        self.assertEqual(feed['results'][0]['id'], self.post.pk)
+        profile = self.guest_client.get(PROFILE_URL).json()
+        self.assertEqual(profile['followers_count'], 1)
+        self.reader_client.delete(PROFILE_FOLLOW_URL)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_follow_bulk(self):
+        """Проверка подписки на нескольких авторов одним запросом"""
+        response = self.send(self.reader_client, 'post', FOLLOW_BULK_URL,
+                             {'usernames': [self.author.username, 'nobody']})
+        self.assertEqual(response.json(), {'changed': [self.author.username]})
+        self.assertTrue(Follow.objects.filter(user=self.reader,
+                                              author=self.author).exists())
+
+    def test_errors(self):
+        """Проверка ответов JSON на ошибки"""
+        cases = [
+            (self.guest_client.get(reverse('api:post', args=[0])), 404),
+            (self.guest_client.delete(self.post_url), 405),
+            (self.author_client.patch(self.post_url, 'not json',
+                                      content_type='application/json'), 400),
+        ]
+        for response, status in cases:
+            with self.subTest(status=status):
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
@@ -0,0 +1,24 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.posts, name='posts'),
+    path('posts/bulk/', views.posts_bulk, name='posts_bulk'),
+    path('posts/<int:post_id>/', views.post_detail, name='post'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
+    path('follow/', views.follow_index, name='follow_index'),
+    path('follow/bulk/', views.follow_bulk, name='follow_bulk'),
+    path('unfollow/bulk/', views.unfollow_bulk, name='unfollow_bulk'),
+    path('groups/', views.groups, name='groups'),
+    path('groups/<slug:slug>/', views.group_detail, name='group'),
+    path('groups/<slug:slug>/posts/', views.group_posts, name='group_posts'),
+    path('users/<str:username>/', views.profile, name='profile'),
+    path('users/<str:username>/posts/', views.profile_posts,
+         name='profile_posts'),
+    path('users/<str:username>/follow/', views.profile_follow,
+         name='profile_follow'),
+]
@@ -0,0 +1,303 @@
+"""JSON API поверх тех же моделей, форм и правил, что и страницы сайта.
+
+Аутентификация - сессия сайта, изменяющие запросы проверяют CSRF.
+Тело запроса - JSON или обычная форма (картинки - только формой).
+"""
+import json
+from functools import wraps
+
+from django.db import transaction
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, set_response_etag
+
+from posts import comments, follows, sharding
+from posts.feed import FEED_KEY, follow_feed
+from posts.forms import CommentForm, PostForm
+from posts.models import Group, Post, User
+from posts.paginator import CursorPaginator
+from posts.settings import FOLLOW_BULK_LIMIT, POSTS_PER_PAGE
+
+from .errors import ApiError
+from .serializers import (COMMENT_FIELDS, GROUP_FIELDS, POST_FIELDS,
+                          PROFILE_FIELDS, requested_fields, serialize,
+                          serialize_many)
+from .settings import API_BULK_LIMIT, API_PAGE_LIMIT
+
+
+def respond(request, data, status=200):
+    """JSON-ответ; на GET с прежним ETag - 304 без тела."""
+    response = JsonResponse(data, status=status,
+                            json_dumps_params={'ensure_ascii': False})
+    if request.method == 'GET' and status == 200:
+        set_response_etag(response)
+        return get_conditional_response(request, etag=response['ETag'],
+                                        response=response)
+    return response
+
+
+def api_view(*methods, login=False):
+    """Проверяет метод и вход, превращает ошибки в JSON-ответы.
+
+    Представление возвращает данные ответа или пару (данные, код).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = respond(request, {'detail': 'Метод не разрешён.'},
+                                   405)
+                response['Allow'] = ', '.join(methods)
+                return response
+            if login and not request.user.is_authenticated:
+                return respond(request, {'detail': 'Нужно войти.'}, 401)
+            try:
+                data = view(request, *args, **kwargs)
+            except Http404:
+                return respond(request, {'detail': 'Не найдено.'}, 404)
+            except ApiError as error:
+                return respond(request, error.as_dict(), error.status)
+            status = 200
+            if isinstance(data, tuple):
+                data, status = data
+            return respond(request, data, status)
+        return wrapper
+    return decorator
+
+
+def request_data(request):
+    """Данные запроса из JSON или формы и загруженные файлы."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or '{}')
+        except ValueError:
+            raise ApiError(400, 'Тело запроса - не JSON.')
+        if not isinstance(data, dict):
+            raise ApiError(400, 'Ожидается JSON-объект.')
+        return data, None
+    return request.POST, request.FILES
+
+
+def validate(form):
+    if not form.is_valid():
+        raise ApiError(400, 'Данные не прошли проверку.',
+                       form.errors.get_json_data())
+    return form
+
+
+def page_limit(request):
+    limit = request.GET.get('limit', '')
+    if limit.isdigit() and int(limit) > 0:
+        return min(int(limit), API_PAGE_LIMIT)
+    return POSTS_PER_PAGE
+
+
+def posts_page(request, posts, key=('pub_date', 'pk'), parts=None):
+    """Страница постов по курсорам ?after= и ?before=."""
+    fields = requested_fields(request, POST_FIELDS)
+    page = CursorPaginator(
+        posts, page_limit(request), key, parts=parts
+    ).get_cursor_page(after=request.GET.get('after'),
+                      before=request.GET.get('before'))
+    return {
+        'results': serialize_many(page, POST_FIELDS, fields),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def post_data(request, post):
+    return serialize(post, POST_FIELDS,
+                     requested_fields(request, POST_FIELDS))
+
+
+def usernames(data):
+    """Имена из JSON {"usernames": [...]} или полей формы username."""
+    if hasattr(data, 'getlist'):
+        names = data.getlist('username')
+    else:
+        names = data.get('usernames')
+    if not isinstance(names, list):
+        raise ApiError(400, 'Ожидается список usernames.')
+    return [str(name) for name in names[:FOLLOW_BULK_LIMIT]]
+
+
+@api_view('GET', 'POST')
+def posts(request):
+    if request.method == 'GET':
+        posts, parts = sharding.scatter_list(Post.objects.for_feed())
+        return posts_page(request, posts, parts=parts)
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужно войти.')
+    data, files = request_data(request)
+    form = validate(PostForm(data=data, files=files))
+    form.instance.author = request.user
+    with transaction.atomic():
+        post = form.save()
+    return post_data(request, post), 201
+
+
+@api_view('GET', 'POST')
+def posts_bulk(request):
+    """Посты по списку id (?ids=1,2,3) или создание нескольких постов."""
+    if request.method == 'GET':
+        ids = list(dict.fromkeys(
+            int(pk) for pk in request.GET.get('ids', '').split(',')
+            if pk.strip().isdigit()
+        ))[:API_BULK_LIMIT]
+        fields = requested_fields(request, POST_FIELDS)
+        found = sharding.in_bulk(Post.objects.for_feed(), ids)
+        return {
+            'results': [serialize(found[pk], POST_FIELDS, fields)
+                        for pk in ids if pk in found],
+            'missing': [pk for pk in ids if pk not in found],
+        }
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужно войти.')
+    data, _ = request_data(request)
+    items = data.get('posts')
+    if not isinstance(items, list) or len(items) > API_BULK_LIMIT:
+        raise ApiError(400, f'Ожидается список posts, не больше '
+                            f'{API_BULK_LIMIT}.')
+    forms = [PostForm(data=item if isinstance(item, dict) else {})
+             for item in items]
+    errors = {index: form.errors.get_json_data()
+              for index, form in enumerate(forms) if not form.is_valid()}
+    if errors:
+        raise ApiError(400, 'Данные не прошли проверку.', errors)
+    created = []
+    with transaction.atomic():
+        for form in forms:
+            form.instance.author = request.user
+            created.append(form.save())
+    fields = requested_fields(request, POST_FIELDS)
+    return {'results': serialize_many(created, POST_FIELDS, fields)}, 201
+
+
+@api_view('GET', 'PATCH', 'POST')
+def post_detail(request, post_id):
+    """Пост; PATCH с JSON или POST с формой меняют его у автора."""
+    post = get_object_or_404(
+        Post.objects.using(sharding.find_db(post_id)).for_feed(), pk=post_id
+    )
+    if request.method == 'GET':
+        return post_data(request, post)
+    if post.author_id != request.user.pk:
+        raise ApiError(403, 'Изменять пост может только автор.')
+    data, files = request_data(request)
+    # Не переданные поля остаются прежними.
+    form = validate(PostForm(
+        data={'text': post.text, 'group': post.group_id,
+              **dict(data.items())},
+        files=files, instance=post,
+    ))
+    with transaction.atomic():
+        post = form.save()
+    return post_data(request, post)
+
+
+@api_view('GET', 'POST')
+def post_comments(request, post_id):
+    """Комментарии поста по курсору или ветке ?root=; POST добавляет."""
+    post = get_object_or_404(
+        Post.objects.using(sharding.find_db(post_id)).only('author'),
+        pk=post_id,
+    )
+    if request.method == 'POST':
+        return add_comment(request, post)
+    fields = requested_fields(request, COMMENT_FIELDS)
+    _, page, next_cursor = comments.post_page(
+        post, request.GET.get('after'), request.GET.get('root', ''),
+        page_limit(request),
+    )
+    return {
+        'results': serialize_many(page, COMMENT_FIELDS, fields),
+        'next': next_cursor,
+    }
+
+
+def add_comment(request, post):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужно войти.')
+    data, _ = request_data(request)
+    form = validate(CommentForm(data=data))
+    comment = form.save(commit=False)
+    comment.author = request.user
+    comment.post = post
+    parent_id = str(data.get('parent') or '')
+    if parent_id.isdigit():
+        comment.parent = comments.reply_parent(
+            post.pk, parent_id, using=sharding.db_of(post)
+        )
+    with transaction.atomic():
+        comment.save()
+    fields = requested_fields(request, COMMENT_FIELDS)
+    return serialize(comment, COMMENT_FIELDS, fields), 201
+
+
+@api_view('GET')
+def groups(request):
+    fields = requested_fields(request, GROUP_FIELDS)
+    return {'results': serialize_many(Group.objects.order_by('title'),
+                                      GROUP_FIELDS, fields)}
+
+
+@api_view('GET')
+def group_detail(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return serialize(group, GROUP_FIELDS,
+                     requested_fields(request, GROUP_FIELDS))
+
+
+@api_view('GET')
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    posts, parts = sharding.scatter_list(group.posts.for_feed())
+    return posts_page(request, posts, parts=parts)
+
+
+@api_view('GET')
+def profile(request, username):
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    return serialize(author, PROFILE_FIELDS,
+                     requested_fields(request, PROFILE_FIELDS))
+
+
+@api_view('GET')
+def profile_posts(request, username):
+    get_object_or_404(User.objects.only('pk'), username=username)
+    return posts_page(request, sharding.author_posts(username).for_feed())
+
+
+@api_view('GET', login=True)
+def follow_index(request):
+    posts, parts = follow_feed(request.user)
+    return posts_page(request, posts, key=FEED_KEY, parts=parts)
+
+
+@api_view('POST', 'DELETE', login=True)
+def profile_follow(request, username):
+    """POST подписывает на автора, DELETE отписывает."""
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    action = follows.follow if request.method == 'POST' else follows.unfollow
+    return {'changed': bool(action(request.user, [author.pk]))}
+
+
+def bulk_follow(request, action):
+    data, _ = request_data(request)
+    authors = dict(User.objects.filter(
+        username__in=usernames(data)
+    ).values_list('pk', 'username'))
+    changed = action(request.user, authors)
+    return {'changed': [authors[pk] for pk in changed]}
+
+
+@api_view('POST', login=True)
+def follow_bulk(request):
+    return bulk_follow(request, follows.follow)
+
+
+@api_view('POST', login=True)
+def unfollow_bulk(request):
+    return bulk_follow(request, follows.unfollow)
@@ -0,0 +1,12 @@
+"""Замеры производительности yatube.
+
+Скрипты запускаются из корня проекта, например:
+    python -m benchmarks.image_bytes
+"""
+import os
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    django.setup()
@@ -0,0 +1,155 @@
+"""Замер SQLite под смешанной нагрузкой чтения и записи.
+
+Несколько процессов одновременно читают посты с комментариями, как
+post_view, и добавляют комментарии, как add_comment. Вокруг каждой
+операции отправляются сигналы начала и конца запроса, поэтому
+соединения закрываются или живут по CONN_MAX_AGE, как на сайте.
+
+Замер идёт на временной базе дважды: с настройками Django по умолчанию
+(YATUBE_SQLITE_TUNING=0) и с профилем SQLITE_PRAGMAS из настроек, и
+печатает операции в секунду, p95 и число ошибок «database is locked»:
+    python -m benchmarks.concurrency --workers 8 --seconds 10 --writes 0.2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import setup_django
+from benchmarks.load import percentile
+
+PROFILES = {'django': '0', 'tuned': '1'}
+USERS = 50
+POSTS = 500
+
+
+def seed():
+    from django.core.management import call_command
+    from posts.models import Post, User
+
+    call_command('migrate', verbosity=0)
+    User.objects.bulk_create(User(username=f'user{number}')
+                             for number in range(USERS))
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    Post.objects.bulk_create(
+        Post(author_id=user_ids[number % USERS], text=f'Пост {number}')
+        for number in range(POSTS)
+    )
+    return user_ids, list(Post.objects.values_list('pk', flat=True))
+
+
+def read(rng, user_ids, post_ids):
+    from posts import comments
+    from posts.models import Post
+
+    post = Post.objects.select_related('author', 'group').get(
+        pk=rng.choice(post_ids)
+    )
+    comments.get_page(post.pk)
+
+
+def write(rng, user_ids, post_ids):
+    from django.db import transaction
+    from posts.models import Comment, Post
+
+    with transaction.atomic():
+        post = Post.objects.get(pk=rng.choice(post_ids))
+        Comment.objects.create(post=post, author_id=rng.choice(user_ids),
+                               text='Комментарий')
+
+
+def work(task):
+    """Операции одного процесса до конца замера."""
+    from django.core.signals import request_finished, request_started
+    from django.db import OperationalError
+
+    number, user_ids, post_ids, args = task
+    rng = random.Random(args.seed + number)
+    latencies = {'read': [], 'write': []}
+    errors = 0
+    deadline = time.perf_counter() + args.seconds
+    while time.perf_counter() < deadline:
+        kind = 'write' if rng.random() < args.writes else 'read'
+        operation = write if kind == 'write' else read
+        request_started.send(sender=None)
+        started = time.perf_counter()
+        try:
+            operation(rng, user_ids, post_ids)
+            latencies[kind].append(time.perf_counter() - started)
+        except OperationalError:
+            errors += 1
+        finally:
+            request_finished.send(sender=None)
+    return latencies, errors
+
+
+def run_profile(args):
+    """Замер в этом процессе, результат - строка JSON."""
+    setup_django()
+    from django.db import connections
+
+    user_ids, post_ids = seed()
+    # Процессы получают копию Django, но не открытые соединения.
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with context.Pool(args.workers) as pool:
+        results = pool.map(work, [(number, user_ids, post_ids, args)
+                                  for number in range(args.workers)])
+    reads = [latency for result in results for latency in result[0]['read']]
+    writes = [latency for result in results
+              for latency in result[0]['write']]
+    print(json.dumps({
+        'reads': len(reads) / args.seconds,
+        'writes': len(writes) / args.seconds,
+        'read_p95': percentile(reads, 95) * 1000 if reads else 0,
+        'write_p95': percentile(writes, 95) * 1000 if writes else 0,
+        'errors': sum(result[1] for result in results),
+    }))
+
+
+def run_child(profile, args):
+    """Замер профиля в отдельном процессе на новой временной базе."""
+    with tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, 'YATUBE_SQLITE_TUNING': PROFILES[profile],
+               'YATUBE_DB': os.path.join(directory, 'db.sqlite3')}
+        env.pop('YATUBE_REPLICAS', None)
+        env.pop('YATUBE_SHARDS', None)
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.concurrency',
+             '--profile', profile, '--workers', str(args.workers),
+             '--seconds', str(args.seconds), '--writes', str(args.writes),
+             '--seed', str(args.seed)],
+            env=env, stdout=subprocess.PIPE, text=True, check=True,
+        ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--writes', type=float, default=0.2,
+                        help='Доля операций записи.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--profile', choices=PROFILES,
+                        help='Замерить один профиль в этом процессе.')
+    args = parser.parse_args()
+    if args.profile:
+        run_profile(args)
+        return
+    print(f'{"профиль":<9}{"чтений/с":>10}{"записей/с":>11}'
+          f'{"p95 чтения, мс":>16}{"p95 записи, мс":>16}{"ошибки":>8}')
+    for profile in PROFILES:
+        result = run_child(profile, args)
+        print(f'{profile:<9}{result["reads"]:>10.1f}'
+              f'{result["writes"]:>11.1f}{result["read_p95"]:>16.1f}'
+              f'{result["write_p95"]:>16.1f}{result["errors"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Сколько байт картинок скачивает браузер на странице ленты.
+
+До: одна миниатюра 960x339 в JPEG для всех экранов.
+После: копия, которую браузер выберет из srcset для ширины экрана,
+в лучшем поддерживаемом формате.
+
+    python -m benchmarks.image_bytes --pages 3
+"""
+import argparse
+
+from benchmarks import setup_django
+
+# Ширина области карточки в CSS-пикселях и плотность экрана.
+DEVICES = {
+    'mobile': (360, 2),
+    'tablet': (768, 2),
+    'desktop': (960, 1),
+}
+
+
+def choose(items, pixels):
+    """Копия, которую выберет браузер: наименьшая не уже нужной."""
+    for item in sorted(items, key=lambda item: item['width']):
+        if item['width'] >= pixels:
+            return item
+    return max(items, key=lambda item: item['width'])
+
+
+def before_bytes(post, storage):
+    name = post.thumbnail or post.image.name
+    return storage.size(name) if storage.exists(name) else 0
+
+
+def after_bytes(post, storage, pixels, formats):
+    for fmt in formats:
+        items = post.renditions.get(fmt)
+        if items:
+            return choose(items, pixels)['size']
+    return before_bytes(post, storage)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=1,
+                        help='Сколько первых страниц ленты учитывать.')
+    parser.add_argument('--formats', default='avif,webp,jpeg',
+                        help='Форматы, которые поддерживает браузер.')
+    args = parser.parse_args()
+    setup_django()
+
+    from django.core.files.storage import default_storage
+    from posts.models import Post
+    from posts.settings import POSTS_PER_PAGE
+
+    posts = list(
+        Post.objects.exclude(image='').exclude(image__isnull=True)
+        [:POSTS_PER_PAGE * args.pages]
+    )
+    if not posts:
+        print('В базе нет постов с картинками.')
+        return
+    formats = args.formats.split(',')
+    before = sum(before_bytes(post, default_storage) for post in posts)
+    pages = -(-len(posts) // POSTS_PER_PAGE)
+    print(f'Постов с картинками: {len(posts)}, страниц: {pages}')
+    print(f'{"экран":<10}{"до, КБ/стр":>14}{"после, КБ/стр":>16}'
+          f'{"экономия":>11}')
+    for device, (width, density) in DEVICES.items():
+        after = sum(
+            after_bytes(post, default_storage, width * density, formats)
+            for post in posts
+        )
+        saving = 1 - after / before if before else 0
+        print(f'{device:<10}{before / pages / 1024:>14.1f}'
+              f'{after / pages / 1024:>16.1f}{saving:>11.0%}')
+
+
+if __name__ == '__main__':
+    main()
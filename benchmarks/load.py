@@ -0,0 +1,321 @@
+"""Нагрузочный замер основных страниц yatube.
+
+Запрашивает index, group_posts, profile, post_view и follow_index со
+случайными адресами из базы (см. benchmarks.seed) и печатает задержку
+p50/p95/p99, запросы в секунду и число SQL-запросов на запрос. Число
+SQL-запросов берётся из заголовка Server-Timing, который добавляет
+PerformanceMiddleware.
+
+В процессе, через WSGI-обработчик Django:
+    python -m benchmarks.load --requests 500
+Через локальный многопоточный сервер или уже запущенный сервер
+с той же базой:
+    python -m benchmarks.load --server --concurrency 8
+    python -m benchmarks.load --url http://127.0.0.1:8000
+
+Результаты можно сохранить как базовые и сравнивать с ними, при
+ухудшении скрипт завершается с кодом 1:
+    python -m benchmarks.load --save-baseline sqlite-100k
+    python -m benchmarks.load --compare sqlite-100k
+
+В benchmarks/baselines лежат базовые результаты на базе из
+    python -m benchmarks.seed --users 2000 --posts 50000 --comments 50000
+С тем же --seed запрашиваются те же адреса.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup_django
+
+BASELINES_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+SCENARIOS = ('index', 'group_posts', 'profile', 'post_view', 'follow_index')
+# Сколько адресов каждого вида выбирается из базы.
+POOL_SIZE = 200
+# Сколько пользователей входит на сайт для follow_index.
+READERS = 20
+QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def sample(rng, queryset, size=POOL_SIZE):
+    """Случайные строки, одни и те же при одном --seed."""
+    pks = sorted(set(queryset.values_list('pk', flat=True)))
+    return queryset.model.objects.filter(
+        pk__in=rng.sample(pks, min(size, len(pks)))
+    ).order_by('pk')
+
+
+def build_pools(rng):
+    """Адреса страниц и пользователи для ленты подписок."""
+    from django.urls import reverse
+    from posts.models import Group, Post, User
+
+    users = list(sample(rng, User.objects.filter(posts__isnull=False))
+                 .values_list('username', flat=True))
+    groups = list(sample(rng, Group.objects).values_list('slug', flat=True))
+    posts = list(sample(rng, Post.objects)
+                 .values_list('author__username', 'pk'))
+    readers = list(sample(rng, User.objects.filter(follower__isnull=False),
+                          READERS))
+    if not (users and groups and posts and readers):
+        sys.exit('В базе мало данных, запустите benchmarks.seed.')
+    pages = [None, None, 2, 5]
+    return {
+        'index': lambda: page(reverse('posts:index'), rng.choice(pages)),
+        'group_posts': lambda: page(
+            reverse('posts:group', args=[rng.choice(groups)]),
+            rng.choice(pages),
+        ),
+        'profile': lambda: reverse('posts:profile',
+                                   args=[rng.choice(users)]),
+        'post_view': lambda: reverse('posts:post', args=rng.choice(posts)),
+        'follow_index': lambda: reverse('posts:follow_index'),
+    }, readers
+
+
+def dataset_size():
+    """Размер базы, на которой сделан замер."""
+    from posts.models import Comment, Follow, Group, Post, User
+
+    return {model.__name__.lower(): model.objects.count()
+            for model in (User, Group, Post, Comment, Follow)}
+
+
+def page(url, number):
+    return f'{url}?page={number}' if number else url
+
+
+class InProcessTarget:
+    """Запросы через тестовый клиент Django, без сети."""
+
+    def __init__(self, readers):
+        from django.test import Client
+
+        self.guest = Client()
+        self.readers = []
+        for user in readers:
+            client = Client()
+            client.force_login(user)
+            self.readers.append(client)
+
+    def get(self, url, login, rng):
+        client = rng.choice(self.readers) if login else self.guest
+        response = client.get(url)
+        return response.status_code, response.get('Server-Timing', '')
+
+
+class HTTPTarget:
+    """Запросы по HTTP с сессионными cookie вошедших пользователей."""
+
+    def __init__(self, base_url, readers):
+        from django.conf import settings
+        from django.test import Client
+
+        self.base_url = base_url.rstrip('/')
+        self.cookies = []
+        for user in readers:
+            client = Client()
+            client.force_login(user)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            self.cookies.append(f'{settings.SESSION_COOKIE_NAME}={session}')
+
+    def get(self, url, login, rng):
+        request = urllib.request.Request(self.base_url + url)
+        if login:
+            request.add_header('Cookie', rng.choice(self.cookies))
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status, response.headers.get(
+                    'Server-Timing', ''
+                )
+        except urllib.error.HTTPError as error:
+            return error.code, ''
+
+
+def start_server():
+    """Многопоточный WSGI-сервер Django на свободном порту."""
+    from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                              WSGIRequestHandler,
+                                              get_internal_wsgi_application)
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+    server.set_app(get_internal_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f'http://{host}:{port}'
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    values = sorted(values)
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+def run_scenario(target, make_url, login, args, rng):
+    latencies, queries, errors = [], [], 0
+
+    def one(_):
+        url = make_url()
+        started = time.perf_counter()
+        status, timing = target.get(url, login, rng)
+        return time.perf_counter() - started, status, timing
+
+    for _ in range(args.warmup):
+        one(None)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        for latency, status, timing in executor.map(one,
+                                                    range(args.requests)):
+            latencies.append(latency)
+            errors += status >= 400
+            match = QUERIES_RE.search(timing)
+            if match:
+                queries.append(int(match.group(1)))
+    elapsed = time.perf_counter() - started
+    return {
+        'p50': percentile(latencies, 50) * 1000,
+        'p95': percentile(latencies, 95) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'rps': len(latencies) / elapsed,
+        'queries': statistics.mean(queries) if queries else None,
+        'errors': errors,
+    }
+
+
+def print_results(results):
+    print(f'{"страница":<14}{"p50, мс":>9}{"p95, мс":>9}{"p99, мс":>9}'
+          f'{"запр/с":>9}{"SQL":>7}{"ошибки":>8}')
+    for name, result in results.items():
+        queries = result['queries']
+        queries = '-' if queries is None else f'{queries:.1f}'
+        print(f'{name:<14}{result["p50"]:>9.1f}{result["p95"]:>9.1f}'
+              f'{result["p99"]:>9.1f}{result["rps"]:>9.1f}'
+              f'{queries:>7}{result["errors"]:>8}')
+
+
+def compare(results, baseline, tolerance):
+    """Ухудшения относительно базовых результатов."""
+    problems = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['p95'] > base['p95'] * (1 + tolerance):
+            problems.append(f'{name}: p95 {base["p95"]:.1f} -> '
+                            f'{result["p95"]:.1f} мс')
+        if result['rps'] < base['rps'] * (1 - tolerance):
+            problems.append(f'{name}: запр/с {base["rps"]:.1f} -> '
+                            f'{result["rps"]:.1f}')
+        if (result['queries'] is not None and base['queries'] is not None
+                and result['queries'] > base['queries'] + 0.5):
+            problems.append(f'{name}: SQL {base["queries"]:.1f} -> '
+                            f'{result["queries"]:.1f}')
+        if result['errors'] > base['errors']:
+            problems.append(f'{name}: ошибки {base["errors"]} -> '
+                            f'{result["errors"]}')
+    return problems
+
+
+def baseline_path(name):
+    return os.path.join(BASELINES_DIR, f'{name}.json')
+
+
+def save_baseline(name, conditions, results):
+    os.makedirs(BASELINES_DIR, exist_ok=True)
+    with open(baseline_path(name), 'w') as file:
+        json.dump({'conditions': conditions, 'results': results}, file,
+                  indent=2, ensure_ascii=False)
+    print(f'Сохранено: {baseline_path(name)}')
+
+
+def check_baseline(name, conditions, results, tolerance):
+    with open(baseline_path(name)) as file:
+        baseline = json.load(file)
+    # Сравнивать имеет смысл только замеры в одинаковых условиях.
+    if baseline['conditions'] != conditions:
+        print(f'Условия замера отличаются: {baseline["conditions"]}')
+    problems = compare(results, baseline['results'], tolerance)
+    for problem in problems:
+        print(f'Ухудшение: {problem}')
+    if problems:
+        sys.exit(1)
+    print('Ухудшений нет.')
+
+
+def make_target(args, parser, readers):
+    """Цель запросов и локальный сервер, если он поднят."""
+    if args.server:
+        server, url = start_server()
+        return HTTPTarget(url, readers), server
+    if args.url:
+        return HTTPTarget(args.url, readers), None
+    if args.concurrency > 1:
+        parser.error('В процессе запросы идут по одному, '
+                     'для --concurrency нужен --server или --url.')
+    return InProcessTarget(readers), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Запросов на каждую страницу.')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    target_group = parser.add_mutually_exclusive_group()
+    target_group.add_argument('--server', action='store_true',
+                              help='Поднять локальный сервер.')
+    target_group.add_argument('--url', help='Адрес запущенного сервера.')
+    parser.add_argument('--save-baseline', metavar='NAME')
+    parser.add_argument('--compare', metavar='NAME')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Допустимое ухудшение, доля.')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    # Метрики нужны на каждом запросе, а не на выборке.
+    os.environ.setdefault('YATUBE_PERF_SAMPLE_RATE', '1')
+    setup_django()
+
+    rng = random.Random(args.seed)
+    pools, readers = build_pools(rng)
+    target, server = make_target(args, parser, readers)
+    results = {}
+    try:
+        for name in args.scenarios.split(','):
+            results[name] = run_scenario(target, pools[name],
+                                         name == 'follow_index', args, rng)
+    finally:
+        if server:
+            server.shutdown()
+    print_results(results)
+
+    conditions = {
+        'target': 'server' if args.server else args.url or 'in-process',
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'seed': args.seed,
+        'dataset': dataset_size(),
+    }
+    if args.save_baseline:
+        save_baseline(args.save_baseline, conditions, results)
+    if args.compare:
+        check_baseline(args.compare, conditions, results, args.tolerance)
+
+
+if __name__ == '__main__':
+    main()
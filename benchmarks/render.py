@@ -0,0 +1,117 @@
+"""Замер отрисовки шаблонов index.html, profile.html и post.html.
+
+Контекст каждой страницы берётся из настоящего ответа view на базе
+замеров (см. benchmarks.seed), затем страница отрисовывается заново
+много раз: с загрузчиками, которые читают и разбирают шаблоны с диска
+на каждый get_template и include, и с кеширующим загрузчиком, как без
+DEBUG. Кеш фрагментов со списками постов отключается, чтобы каждый раз
+отрисовывались все карточки; сами карточки берутся из своего кеша, а с
+--cold кеш очищается перед каждой отрисовкой. Главная замеряется и на
+странице по номеру, где выводится список страниц:
+    YATUBE_DB=bench.sqlite3 python -m benchmarks.render --renders 200
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from benchmarks import setup_django
+
+
+def make_backends():
+    """Движки шаблонов из настроек без кеша и с кешем загрузчика."""
+    from django.conf import settings
+    from django.template.backends.django import DjangoTemplates
+
+    config = settings.TEMPLATES[0]
+    loaders = settings.TEMPLATE_LOADERS
+    backends = {}
+    for name, options in (
+        ('без кеша', {'loaders': loaders}),
+        ('кеш', {'loaders': [('django.template.loaders.cached.Loader',
+                              loaders)]}),
+    ):
+        backends[name] = DjangoTemplates({
+            'NAME': name,
+            'DIRS': config['DIRS'],
+            'APP_DIRS': False,
+            'OPTIONS': {**config['OPTIONS'], **options, 'debug': False},
+        })
+    return backends
+
+
+def capture_contexts():
+    """Контекст и запрос каждой страницы из ответов view."""
+    from django.core.cache import cache
+    from django.test import Client
+    from django.test.utils import (setup_test_environment,
+                                   teardown_test_environment)
+    from django.urls import reverse
+    from posts.models import Post, User
+
+    setup_test_environment()
+    post = Post.objects.filter(comment_count__gt=0).select_related(
+        'author'
+    ).first()
+    if post is None:
+        sys.exit('В базе нет постов с комментариями, '
+                 'запустите benchmarks.seed.')
+    client = Client()
+    client.force_login(User.objects.exclude(pk=post.author_id).first())
+    pages = {
+        'index': ('index.html', reverse('posts:index')),
+        'index?page=50': ('index.html', reverse('posts:index') + '?page=50'),
+        'profile': ('profile.html', reverse('posts:profile',
+                                            args=[post.author.username])),
+        'post': ('post.html', reverse('posts:post',
+                                      args=[post.author.username, post.pk])),
+    }
+    contexts = {}
+    for page, (name, url) in pages.items():
+        cache.clear()
+        response = client.get(url)
+        # Первым отрисован сам шаблон страницы, дальше - вложенные.
+        context = response.context[0].flatten()
+        contexts[page] = name, context, response.wsgi_request
+    # Без сигналов об отрисовке, которые нужны были только для контекста.
+    teardown_test_environment()
+    return contexts
+
+
+def measure(backend, name, context, request, renders, cold):
+    from django.core.cache import cache
+
+    timings = []
+    for _ in range(renders):
+        if cold:
+            cache.clear()
+        started = time.perf_counter()
+        backend.get_template(name).render(context, request)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--renders', type=int, default=200)
+    parser.add_argument('--cold', action='store_true',
+                        help='Рисовать карточки постов без их кеша.')
+    args = parser.parse_args()
+    setup_django()
+
+    contexts = capture_contexts()
+    backends = make_backends()
+    print(f'{"страница":<15}'
+          + ''.join(f'{name + ", мс":>16}' for name in backends)
+          + f'{"ускорение":>11}')
+    for page, (name, context, request) in contexts.items():
+        timings = [measure(backend, name, context, request, args.renders,
+                           args.cold)
+                   for backend in backends.values()]
+        print(f'{page:<15}' + ''.join(f'{timing:>16.2f}'
+                                      for timing in timings)
+              + f'{timings[0] / timings[-1]:>10.1f}x')
+
+
+if __name__ == '__main__':
+    main()
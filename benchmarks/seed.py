@@ -0,0 +1,192 @@
+"""Наполняет пустую базу большим набором данных для замеров.
+
+Группы создаёт mixer, как фикстуры в tests/fixtures. Пользователи,
+посты, подписки и комментарии вставляются пачками через bulk_create,
+а тексты генерирует mixer.faker. Авторы выбираются по закону Ципфа:
+на немногих авторов подписана большая часть пользователей, у них же
+больше всего постов. Сигналы при bulk_create не срабатывают, поэтому
+ленты, счётчики и поисковый индекс строятся в конце одним проходом.
+
+Данные лучше держать в отдельной базе:
+    YATUBE_DB=bench.sqlite3 python manage.py migrate
+    YATUBE_DB=bench.sqlite3 python -m benchmarks.seed --posts 1000000
+
+У всех пользователей пароль PASSWORD.
+"""
+import argparse
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from benchmarks import setup_django
+
+PASSWORD = 'benchmark'
+
+
+class Zipf:
+    """Случайный выбор из значений с весом 1 / rank ** alpha."""
+
+    def __init__(self, values, alpha, rng):
+        self.values = list(values)
+        rng.shuffle(self.values)
+        self.cum_weights = list(itertools.accumulate(
+            1 / rank ** alpha for rank in range(1, len(self.values) + 1)
+        ))
+        self.rng = rng
+
+    def sample(self, k=1):
+        return self.rng.choices(self.values, cum_weights=self.cum_weights,
+                                k=k)
+
+
+@contextmanager
+def step(title):
+    started = time.perf_counter()
+    print(f'{title}...', end=' ', flush=True)
+    yield
+    print(f'{time.perf_counter() - started:.1f} с')
+
+
+def batches(objects, size):
+    iterator = iter(objects)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def bulk_insert(model, objects, size):
+    from django.db import transaction
+
+    count = 0
+    for batch in batches(objects, size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=size)
+        count += len(batch)
+    return count
+
+
+def seed(args):
+    from django.contrib.auth.hashers import make_password
+    from django.core.cache import cache
+    from django.db import transaction
+    from django.utils import timezone
+    from mixer.backend.django import mixer
+    from posts.comments import fill_root_paths
+    from posts.counters import recount_comments, recount_stats
+    from posts.feed import fill_feeds
+    from posts.importer import manual_dates
+    from posts.models import Comment, Follow, Group, Post, User
+    from posts.search import get_backend
+
+    rng = random.Random(args.seed)
+    faker = mixer.faker
+    faker.locale = 'ru'
+    faker.seed_instance(args.seed)
+    now = timezone.now()
+    period = timedelta(days=args.days).total_seconds()
+
+    def random_date():
+        return now - timedelta(seconds=rng.uniform(0, period))
+
+    with step(f'Пользователи: {args.users}'):
+        password = make_password(PASSWORD)
+        bulk_insert(User, (
+            User(username=f'{faker.user_name()}{i}', password=password)
+            for i in range(args.users)
+        ), args.batch)
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        authors = Zipf(user_ids, args.alpha, rng)
+
+    with step(f'Группы: {args.groups}'):
+        group_ids = [group.pk for group in mixer.cycle(args.groups).blend(
+            Group, slug=mixer.sequence('group-{0}'),
+        )] if args.groups else []
+
+    post_date = Post._meta.get_field('pub_date')
+    comment_date = Comment._meta.get_field('created')
+    with manual_dates(post_date, comment_date):
+        with step(f'Посты: {args.posts}'):
+            bulk_insert(Post, (
+                Post(text=faker.text(rng.randint(50, 600)),
+                     author_id=author_id,
+                     group_id=(rng.choice(group_ids)
+                               if group_ids and rng.random() < 0.5
+                               else None),
+                     pub_date=random_date())
+                for author_id in itertools.islice(
+                    itertools.chain.from_iterable(iter(
+                        lambda: authors.sample(args.batch), None
+                    )), args.posts
+                )
+            ), args.batch)
+
+        with step('Подписки'):
+            def follows():
+                for user_id in user_ids:
+                    count = min(len(user_ids) - 1,
+                                int(rng.expovariate(1 / args.follows)))
+                    followed = set(authors.sample(count)) - {user_id}
+                    for author_id in followed:
+                        yield Follow(user_id=user_id, author_id=author_id)
+            bulk_insert(Follow, follows(), args.batch)
+
+        with step(f'Комментарии: {args.comments}'):
+            posts = Zipf(Post.objects.values_list('pk', flat=True),
+                         args.alpha, rng)
+            bulk_insert(Comment, (
+                Comment(post_id=post_id, author_id=rng.choice(user_ids),
+                        text=faker.sentence(), created=random_date())
+                for post_id in posts.sample(args.comments)
+            ), args.batch)
+            fill_root_paths()
+
+    cache.clear()
+    # Счётчики - до лент: recount_stats отмечает популярных авторов, и
+    # fill_feeds не раскладывает их посты по лентам.
+    with step('Счётчики'):
+        with transaction.atomic():
+            recount_stats()
+            recount_comments()
+    with step('Ленты подписок'):
+        with transaction.atomic():
+            fill_feeds()
+    if not args.no_search:
+        with step('Поисковый индекс'):
+            with transaction.atomic():
+                get_backend().rebuild()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--comments', type=int, default=200000)
+    parser.add_argument('--follows', type=float, default=20,
+                        help='Среднее число подписок пользователя.')
+    parser.add_argument('--alpha', type=float, default=1.1,
+                        help='Показатель степени в законе Ципфа.')
+    parser.add_argument('--days', type=int, default=365,
+                        help='За сколько дней разбросаны даты постов.')
+    parser.add_argument('--batch', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-search', action='store_true',
+                        help='Не строить поисковый индекс.')
+    args = parser.parse_args()
+    setup_django()
+
+    from posts.models import Post
+
+    if Post.objects.exists():
+        parser.error('В базе уже есть посты, укажите пустую через YATUBE_DB.')
+    started = time.perf_counter()
+    seed(args)
+    print(f'Готово за {time.perf_counter() - started:.1f} с')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'priority', 'run_at',
+                    'attempts', 'locked_by')
+    list_filter = ('status', 'name')
+    readonly_fields = ('last_error', 'locked_by', 'locked_at', 'created')
+    actions = ('retry',)
+
+    def retry(self, request, queryset):
+        count = queryset.filter(status=Job.Status.FAILED).update(
+            status=Job.Status.QUEUED, attempts=0, run_at=timezone.now(),
+        )
+        self.message_user(request, f'Заданий снова в очереди: {count}')
+    retry.short_description = 'Повторить упавшие задания'
+
+
+admin.site.register(Job, JobAdmin)
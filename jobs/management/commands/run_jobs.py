@@ -0,0 +1,90 @@
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils.module_loading import autodiscover_modules
+
+from jobs import queue
+from jobs.settings import JOBS_POLL_INTERVAL, JOBS_WORKERS
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задания из очереди. Обработчиков можно '
+            'запустить сколько угодно, в том числе на разных машинах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=JOBS_WORKERS,
+            help='Сколько заданий выполнять одновременно (потоков).',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задания и выйти.',
+        )
+        parser.add_argument('--poll-interval', type=float,
+                            default=JOBS_POLL_INTERVAL)
+
+    def handle(self, *args, **options):
+        # Периодические задачи приложений лежат в их модулях tasks.
+        autodiscover_modules('tasks')
+        self.stopping = threading.Event()
+        # Начатые задания доделываются, новые не берутся.
+        handlers = {
+            signum: signal.signal(signum, lambda *args: self.stopping.set())
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            self.serve(options)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+    def serve(self, options):
+        queue.requeue_stale()
+        queue.schedule_periodic()
+        name = f'{socket.gethostname()}:{os.getpid()}'
+        self.done = 0
+        self.lock = threading.Lock()
+        if options['workers'] == 1:
+            self.work(f'{name}:0', options)
+        else:
+            threads = [
+                threading.Thread(target=self.work,
+                                 args=(f'{name}:{number}', options))
+                for number in range(options['workers'])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено заданий: {self.done}'
+        ))
+
+    def work(self, worker, options):
+        """Берёт задания по одному, пока есть работа или до остановки."""
+        try:
+            while not self.stopping.is_set():
+                job = queue.claim(worker)
+                if job is None:
+                    if options['once']:
+                        return
+                    queue.requeue_stale()
+                    self.stopping.wait(options['poll_interval'])
+                    continue
+                started = time.perf_counter()
+                result = 'готово' if queue.run(job) else 'ошибка'
+                with self.lock:
+                    self.done += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(
+                        f'{job}: {result} за '
+                        f'{time.perf_counter() - started:.2f} с'
+                    )
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
@@ -0,0 +1,95 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'В очереди'
+        RUNNING = 'running', 'Выполняется'
+        FAILED = 'failed', 'Упало'
+
+    name = models.CharField(
+        max_length=200,
+        verbose_name='Задача',
+        help_text='Путь к функции задачи',
+    )
+    args = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name='Аргументы',
+    )
+    kwargs = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Именованные аргументы',
+    )
+    priority = models.SmallIntegerField(
+        default=0,
+        verbose_name='Приоритет',
+        help_text='Задания с большим приоритетом выполняются раньше',
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.QUEUED,
+        verbose_name='Состояние',
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Не раньше',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток',
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=1,
+        verbose_name='Всего попыток',
+    )
+    key = models.CharField(
+        max_length=200,
+        blank=True,
+        null=True,
+        verbose_name='Ключ',
+        help_text='В очереди не бывает двух заданий с одним ключом',
+    )
+    locked_by = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Обработчик',
+    )
+    locked_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Взято',
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создано',
+    )
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+    class Meta:
+        verbose_name = 'Задание'
+        verbose_name_plural = 'Задания'
+        # Частичные индексы: очередь и занятые задания малы, даже если
+        # упавших накопилось много.
+        indexes = (
+            models.Index(fields=('-priority', 'run_at', 'id'),
+                         condition=models.Q(status='queued'),
+                         name='job_queue_idx'),
+            models.Index(fields=('locked_at',),
+                         condition=models.Q(status='running'),
+                         name='job_running_idx'),
+        )
+        constraints = (
+            models.UniqueConstraint(fields=('key',),
+                                    condition=models.Q(status='queued'),
+                                    name='job_unique_queued_key'),
+        )
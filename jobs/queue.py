@@ -0,0 +1,197 @@
+"""Очередь фоновых заданий в таблице базы данных.
+
+Задача - функция, обёрнутая декоратором task. Её вызов через delay()
+добавляет строку в таблицу заданий в той же транзакции, что и
+остальные записи запроса: задание появится, только если они
+сохранились. Обработчики (manage.py run_jobs) берут задания условным
+UPDATE, так что одно задание не достанется двум, сколько бы процессов
+и потоков ни разбирали очередь. Сама задача выполняется вне транзакции
+и должна выдерживать повторный запуск. Выполненные задания удаляются, упавшие
+повторяются с растущей паузой, а после последней попытки остаются в
+таблице с текстом ошибки.
+"""
+import datetime as dt
+import logging
+import traceback
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+from .settings import JOBS_LOCK_TIMEOUT, JOBS_MAX_ATTEMPTS, JOBS_RETRY_DELAY
+
+logger = logging.getLogger(__name__)
+
+# Задачи по имени, заполняется при импорте их модулей.
+tasks = {}
+
+
+class Task:
+    def __init__(self, function, name, priority, max_attempts, retry_delay,
+                 every):
+        self.function = function
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.every = every
+
+    def __call__(self, *args, **kwargs):
+        return self.function(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Ставит вызов задачи в очередь."""
+        return self.enqueue(args, kwargs)
+
+    def enqueue(self, args=(), kwargs=None, run_at=None, priority=None,
+                key=None):
+        """Ставит вызов в очередь на время run_at или сразу.
+
+        Если в очереди уже ждёт задание с тем же ключом, новое не
+        добавляется и возвращается None.
+        """
+        job = Job(
+            name=self.name,
+            args=list(args),
+            kwargs=kwargs or {},
+            run_at=run_at or timezone.now(),
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts,
+            key=key,
+        )
+        try:
+            with transaction.atomic():
+                job.save()
+        except IntegrityError:
+            return None
+        return job
+
+    def schedule_next(self):
+        """Следующий запуск периодической задачи."""
+        if self.every:
+            self.enqueue(run_at=timezone.now() + dt.timedelta(
+                seconds=self.every
+            ), key=f'every:{self.name}')
+
+
+def task(name=None, priority=0, max_attempts=JOBS_MAX_ATTEMPTS,
+         retry_delay=JOBS_RETRY_DELAY, every=None):
+    """Делает из функции задачу для фоновой очереди.
+
+    every - период в секундах для задач, которые обработчики запускают
+    сами, без delay().
+    """
+    def decorator(function):
+        task_name = name or f'{function.__module__}.{function.__qualname__}'
+        tasks[task_name] = Task(function, task_name, priority,
+                                max_attempts, retry_delay, every)
+        return tasks[task_name]
+    return decorator
+
+
+def get_task(name):
+    """Задача по имени, её модуль импортируется при необходимости."""
+    if name not in tasks:
+        import_string(name)
+    return tasks[name]
+
+
+def claim(worker):
+    """Занимает следующее готовое задание или возвращает None.
+
+    Кандидат выбирается по индексу очереди, а занимается условным
+    UPDATE: если его уже взял другой обработчик, берётся следующий.
+    """
+    while True:
+        job = Job.objects.filter(
+            status=Job.Status.QUEUED, run_at__lte=timezone.now(),
+        ).order_by('-priority', 'run_at', 'pk').first()
+        if job is None:
+            return None
+        # Ключ освобождается: пока задание выполняется, в очередь можно
+        # поставить следующее такое же.
+        locked_at = timezone.now()
+        if Job.objects.filter(pk=job.pk, status=Job.Status.QUEUED).update(
+            status=Job.Status.RUNNING, key=None, locked_by=worker,
+            locked_at=locked_at, attempts=F('attempts') + 1,
+        ):
+            job.status = Job.Status.RUNNING
+            job.key = None
+            job.locked_by = worker
+            job.locked_at = locked_at
+            job.attempts += 1
+            return job
+
+
+def fail(job, error, task=None):
+    """Ставит задание на повтор или помечает упавшим."""
+    logger.error('Задание %s упало: %s', job, error)
+    if task and job.attempts < job.max_attempts:
+        delay = task.retry_delay * 2 ** (job.attempts - 1)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.QUEUED, locked_by='', locked_at=None,
+            run_at=timezone.now() + dt.timedelta(seconds=delay),
+            last_error=error,
+        )
+        return
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.Status.FAILED, locked_by='', last_error=error,
+    )
+    if task:
+        task.schedule_next()
+
+
+def run(job):
+    """Выполняет занятое задание."""
+    try:
+        task = get_task(job.name)
+    except (ImportError, KeyError):
+        fail(job, f'Нет задачи {job.name}')
+        return False
+    # Задача выполняется вне транзакции: долгая обработка картинок не
+    # держит блокировку записи базы. Задачи можно повторять, поэтому
+    # записи упавшей задачи не откатываются.
+    try:
+        task.function(*job.args, **job.kwargs)
+    except Exception:
+        fail(job, traceback.format_exc(), task)
+        return False
+    with transaction.atomic():
+        Job.objects.filter(pk=job.pk).delete()
+        task.schedule_next()
+    return True
+
+
+def run_pending(worker='inline'):
+    """Выполняет все готовые задания по очереди, возвращает их число."""
+    count = 0
+    job = claim(worker)
+    while job is not None:
+        run(job)
+        count += 1
+        job = claim(worker)
+    return count
+
+
+def requeue_stale():
+    """Возвращает в очередь задания, брошенные упавшими обработчиками."""
+    stale = Job.objects.filter(
+        status=Job.Status.RUNNING,
+        locked_at__lt=timezone.now() - dt.timedelta(
+            seconds=JOBS_LOCK_TIMEOUT
+        ),
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.Status.FAILED, last_error='Обработчик не завершил задание',
+    )
+    return stale.update(status=Job.Status.QUEUED, locked_by='',
+                        locked_at=None)
+
+
+def schedule_periodic():
+    """Ставит в очередь периодические задачи, которых там ещё нет."""
+    for periodic in tasks.values():
+        if periodic.every:
+            periodic.enqueue(key=f'every:{periodic.name}')
@@ -0,0 +1,12 @@
+# Сколько заданий один обработчик выполняет одновременно (потоков).
+JOBS_WORKERS = 2
+# Как часто свободный обработчик проверяет очередь, в секундах.
+JOBS_POLL_INTERVAL = 1
+# Сколько раз выполнять упавшее задание и пауза перед первым повтором,
+# дальше она удваивается.
+JOBS_MAX_ATTEMPTS = 3
+JOBS_RETRY_DELAY = 30
+# Задание, занятое дольше, считается брошенным упавшим обработчиком.
+JOBS_LOCK_TIMEOUT = 10 * 60
+# Сколько дней хранятся упавшие задания.
+JOBS_KEEP_FAILED = 30
@@ -0,0 +1,16 @@
+import datetime as dt
+
+from django.utils import timezone
+
+from .models import Job
+from .queue import task
+from .settings import JOBS_KEEP_FAILED
+
+
+@task(every=24 * 60 * 60, priority=-1)
+def purge_failed():
+    """Удаляет старые упавшие задания."""
+    Job.objects.filter(
+        status=Job.Status.FAILED,
+        created__lt=timezone.now() - dt.timedelta(days=JOBS_KEEP_FAILED),
+    ).delete()
@@ -0,0 +1,132 @@
+import datetime as dt
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from jobs import queue
+from jobs.models import Job
+
+CALLS = []
+
+
+@queue.task()
+def record(value, suffix=''):
+    CALLS.append(f'{value}{suffix}')
+
+
+@queue.task(priority=5)
+def urgent(value):
+    CALLS.append(value)
+
+
+@queue.task(max_attempts=2, retry_delay=60)
+def broken():
+    raise RuntimeError('Сломано')
+
+
+@queue.task(every=60)
+def periodic():
+    CALLS.append('periodic')
+
+
+@queue.task()
+def in_transaction():
+    CALLS.append(connection.in_atomic_block)
+
+
+class QueueTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_delay_and_run(self):
+        """Проверка постановки задания и его выполнения"""
+        job = record.delay('a', suffix='!')
+        self.assertEqual((job.name, job.args, job.kwargs),
+                         ('jobs.tests.test_queue.record', ['a'],
+                          {'suffix': '!'}))
+        self.assertEqual(CALLS, [])
+        self.assertEqual(queue.run_pending(), 1)
+        self.assertEqual(CALLS, ['a!'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_order(self):
+        """Проверка порядка по приоритету и отложенного запуска"""
+        record.enqueue(['later'], run_at=timezone.now()
+                       + dt.timedelta(hours=1))
+        record.delay('first')
+        urgent.delay('urgent')
+        record.delay('second')
+        queue.run_pending()
+        self.assertEqual(CALLS, ['urgent', 'first', 'second'])
+        self.assertEqual(Job.objects.get().args, ['later'])
+
+    def test_retries(self):
+        """Проверка повтора с паузой и пометки упавшего задания"""
+        job = broken.delay()
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            queue.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts),
+                         (Job.Status.QUEUED, 1))
+        self.assertIn('Сломано', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            queue.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts),
+                         (Job.Status.FAILED, 2))
+
+    def test_key(self):
+        """Проверка, что задание с ключом стоит в очереди один раз"""
+        self.assertIsNotNone(record.enqueue(['a'], key='one'))
+        self.assertIsNone(record.enqueue(['b'], key='one'))
+        job = queue.claim('test')
+        self.assertIsNotNone(record.enqueue(['c'], key='one'))
+        queue.run(job)
+        queue.run_pending()
+        self.assertEqual(CALLS, ['a', 'c'])
+
+    def test_periodic(self):
+        """Проверка перезапуска периодической задачи"""
+        queue.schedule_periodic()
+        queue.schedule_periodic()
+        queue.run_pending()
+        self.assertEqual(CALLS.count('periodic'), 1)
+        job = Job.objects.get(name=periodic.name)
+        self.assertGreater(job.run_at, timezone.now())
+
+    def test_requeue_stale(self):
+        """Проверка возврата брошенных заданий в очередь"""
+        record.delay('a')
+        job = queue.claim('test')
+        with mock.patch('jobs.queue.JOBS_LOCK_TIMEOUT', -1):
+            self.assertEqual(queue.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+
+    def test_command(self):
+        """Проверка выполнения очереди командой run_jobs"""
+        record.delay('a')
+        record.delay('b')
+        out = io.StringIO()
+        call_command('run_jobs', '--once', '--workers', '1', stdout=out)
+        self.assertIn('a', CALLS)
+        self.assertIn('b', CALLS)
+        self.assertFalse(Job.objects.filter(name=record.name).exists())
+
+
+class RunTransactionTest(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_task_outside_transaction(self):
+        """Проверка выполнения задачи вне транзакции"""
+        in_transaction.delay()
+        self.assertEqual(queue.run_pending(), 1)
+        self.assertEqual(CALLS, [False])
+        self.assertFalse(Job.objects.exists())
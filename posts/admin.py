@@ -1,14 +1,117 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR
+from django.core.exceptions import ValidationError
+from django.db.models import Case, IntegerField, Value, When
 
-from .models import Comment, Follow, Group, Post
+from . import sharding, thumbnails
+from .models import Comment, Follow, Group, Post, ProfileStats
+from .search import get_backend
+from .settings import SEARCH_ADMIN_LIMIT
 
 
-class PostAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+class ShardListFilter(admin.SimpleListFilter):
+    """Список записей одной базы, при шардах - на выбор."""
+    title = 'база'
+    parameter_name = 'shard'
+
+    def database(self):
+        databases = sharding.get_databases()
+        return self.value() if self.value() in databases else databases[0]
+
+    def lookups(self, request, model_admin):
+        if not sharding.is_sharded():
+            return ()
+        return [(database, database)
+                for database in sharding.get_databases()]
+
+    def choices(self, changelist):
+        # Без пункта «Все»: список строится запросом к одной базе.
+        database = self.database()
+        for value, title in self.lookup_choices:
+            yield {
+                'selected': value == database,
+                'query_string': changelist.get_query_string(
+                    {self.parameter_name: value}
+                ),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        return queryset.using(self.database())
+
+
+class ShardedAdmin(admin.ModelAdmin):
+    """Админка постов и комментариев, которые могут лежать на шардах."""
+    # Поля, от которых зависит база записи.
+    shard_fields = ()
+
+    def get_list_filter(self, request):
+        return (ShardListFilter, *super().get_list_filter(request))
+
+    def get_object(self, request, object_id, from_field=None):
+        queryset = self.get_queryset(request)
+        model = queryset.model
+        field = (model._meta.pk if from_field is None
+                 else model._meta.get_field(from_field))
+        try:
+            object_id = field.to_python(object_id)
+        except (ValidationError, ValueError):
+            return None
+        for database in sharding.get_databases():
+            obj = queryset.using(database).filter(
+                **{field.name: object_id}
+            ).first()
+            if obj is not None:
+                return obj
+        return None
+
+    def get_readonly_fields(self, request, obj=None):
+        fields = super().get_readonly_fields(request, obj)
+        if obj is not None and sharding.is_sharded():
+            # Перенос записи в другую базу делает rebalance_shards.
+            return (*fields, *self.shard_fields)
+        return fields
+
+
+class PostAdmin(ShardedAdmin):
+    list_display = ('pk', 'text', 'pub_date', 'author', 'group',
+                    'comment_count')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    shard_fields = ('author',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return super().get_search_results(request, queryset,
+                                              search_term)
+        ids = [pk for _, pk in get_backend().ranked_ids(
+            search_term, limit=SEARCH_ADMIN_LIMIT
+        )]
+        # Место в выдаче поиска, по нему список сортируется, пока не
+        # выбрана сортировка по столбцу.
+        position = Case(
+            *(When(pk=pk, then=Value(number))
+              for number, pk in enumerate(ids)),
+            default=Value(len(ids)),
+            output_field=IntegerField(),
+        )
+        queryset = queryset.filter(pk__in=ids).annotate(
+            search_position=position
+        )
+        if ORDER_VAR not in request.GET:
+            queryset = queryset.order_by('search_position', '-pk')
+        return queryset, False
+
+    def save_model(self, request, obj, form, change):
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            obj.thumbnail = ''
+            obj.renditions = {}
+        super().save_model(request, obj, form, change)
+        if image_changed and obj.image:
+            thumbnails.schedule(obj)
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'slug', 'description')
@@ -17,15 +120,24 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ShardedAdmin):
     list_display = ('post', 'author', 'text', 'created')
+    shard_fields = ('post',)
 
 
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('author', 'user')
 
 
+class ProfileStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'posts_count', 'followers_count',
+                    'following_count')
+    search_fields = ('user__username',)
+    readonly_fields = ('posts_count', 'followers_count', 'following_count')
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(ProfileStats, ProfileStatsAdmin)
@@ -0,0 +1,73 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+GENERATION_KEY = 'posts:generation:{}'
+CHANGED_KEY = 'posts:changed:{}'
+
+
+def new_generation():
+    # После вытеснения счётчика из кеша старые версии не должны повториться.
+    return time.time_ns()
+
+
+def post_scopes(post):
+    """Области кеша, в которых выводится пост."""
+    scopes = ['index', f'profile:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group:{post.group_id}')
+    return scopes
+
+
+def stats_scopes(*user_ids):
+    """Области счётчиков профиля и кнопки подписки."""
+    return [f'stats:{user_id}' for user_id in user_ids]
+
+
+def get_generations(*scopes):
+    """Текущие поколения областей кеша, например 'index' или 'group:1'."""
+    keys = [GENERATION_KEY.format(scope) for scope in ('global', *scopes)]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, new_generation(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def get_changed(*scopes):
+    """Время последнего изменения областей кеша, Unix-время.
+
+    Если отметка вытеснена из кеша, изменением считается текущий момент.
+    """
+    keys = [CHANGED_KEY.format(scope) for scope in ('global', *scopes)]
+    changed = cache.get_many(keys)
+    now = int(time.time())
+    for key in keys:
+        if key not in changed:
+            cache.add(key, now, None)
+            changed[key] = cache.get(key, now)
+    return max(changed.values())
+
+
+def bump(*scopes):
+    """Сбрасывает фрагменты областей после фиксации транзакции.
+
+    Иначе читатель успеет взять новое поколение до фиксации и положит
+    в кеш под новым ключом страницу из старых данных.
+    """
+    transaction.on_commit(lambda: bump_now(*scopes))
+
+
+def bump_now(*scopes):
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_generation(), None)
+    now = int(time.time())
+    cache.set_many({CHANGED_KEY.format(scope): now for scope in scopes},
+                   None)
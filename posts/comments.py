@@ -0,0 +1,129 @@
+"""Ветки комментариев с материализованным путём.
+
+Путь комментария - id его предков и его собственный, по 10 цифр через
+«/». Первый сегмент хранит не id корня, а его дополнение до 10**10:
+тогда сортировка по пути выдаёт ветки от новых к старым, а ответы
+внутри ветки - по порядку. Страница комментариев - следующие строки
+индекса (post, path) после пути последнего показанного, поддерево
+ветки - один диапазон того же индекса.
+"""
+import re
+
+from django.db.models import CharField, F, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Concat, LPad
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from . import sharding
+from .models import Comment
+from .settings import COMMENT_MAX_DEPTH, COMMENTS_PER_PAGE
+
+ROOT_BASE = 10 ** 10
+WIDTH = 10
+SEPARATOR = '/'
+# Курсор страницы - путь последнего комментария.
+PATH_RE = re.compile(rf'\d{{{WIDTH}}}(?:{SEPARATOR}\d{{{WIDTH}}})*')
+
+
+def make_path(comment_id, parent_path=''):
+    if parent_path:
+        return f'{parent_path}{SEPARATOR}{comment_id:0{WIDTH}d}'
+    return f'{ROOT_BASE - comment_id:0{WIDTH}d}'
+
+
+def assign_path(comment):
+    """Путь нового комментария, id известен только после вставки."""
+    parent_path = comment.parent.path if comment.parent_id else ''
+    comment.path = make_path(comment.pk, parent_path)
+    Comment.objects.using(comment._state.db).filter(pk=comment.pk).update(
+        path=comment.path
+    )
+
+
+def fill_root_paths():
+    """Пути комментариев, вставленных в обход save(), одним UPDATE."""
+    Comment.objects.filter(path='', parent=None).update(path=LPad(
+        Cast(Value(ROOT_BASE) - F('pk'), CharField()), WIDTH, Value('0'),
+    ))
+
+
+def fill_paths():
+    """Пути всех комментариев без пути, в том числе ответов.
+
+    Ответы заполняются по одному UPDATE на уровень вложенности: каждый
+    раз те, у чьих родителей путь уже есть.
+    """
+    fill_root_paths()
+    parent_path = Comment.objects.filter(
+        pk=OuterRef('parent_id')
+    ).values('path')[:1]
+    while Comment.objects.filter(path='', parent__path__gt='').update(
+        path=Concat(
+            Subquery(parent_path), Value(SEPARATOR),
+            LPad(Cast('pk', CharField()), WIDTH, Value('0')),
+            output_field=CharField(),
+        )
+    ):
+        pass
+
+
+def reply_parent(post_id, parent_id, using=None):
+    """Родитель ответа или None, если такого комментария у поста нет.
+
+    Ответ на слишком глубокий комментарий становится его соседом.
+    using - база поста, если посты шардированы.
+    """
+    parent = Comment.objects.using(using).filter(
+        post_id=post_id, pk=parent_id
+    ).only('path').first()
+    if parent and parent.depth >= COMMENT_MAX_DEPTH:
+        parent = Comment.objects.using(using).filter(
+            post_id=post_id, path=parent.path.rsplit(SEPARATOR, 1)[0]
+        ).only('path').first()
+    return parent
+
+
+def thread(post_id, root=None, using=None):
+    """Комментарии поста или ответы в ветке root в порядке показа."""
+    comments = Comment.objects.using(using).filter(post_id=post_id)
+    if root is not None:
+        # '0' следует сразу за '/', так что это все пути вида «root/...».
+        comments = comments.filter(path__gt=root.path + SEPARATOR,
+                                   path__lt=root.path + '0')
+    return comments.select_related('author').only(
+        'text', 'created', 'path', 'post', 'parent', 'author__username',
+    ).order_by('path')
+
+
+def get_page(post_id, after=None, root=None, limit=None, using=None):
+    """Страница комментариев и курсор следующей или None.
+
+    Возвращается уже выполненный QuerySet.
+    """
+    limit = limit or COMMENTS_PER_PAGE
+    comments = thread(post_id, root, using)
+    if after and PATH_RE.fullmatch(after):
+        comments = comments.filter(path__gt=after)
+    page = comments[:limit]
+    items = list(page)
+    next_cursor = None
+    if len(items) == limit and comments.filter(
+        path__gt=items[-1].path
+    ).exists():
+        next_cursor = items[-1].path
+    return page, next_cursor
+
+
+def post_page(post, after=None, root_id='', limit=None):
+    """Ветка, страница комментариев поста из его базы и курсор.
+
+    Одна для страницы сайта и API. Неверная ветка - Http404.
+    """
+    root = None
+    if root_id:
+        if not str(root_id).isdigit():
+            raise Http404
+        root = get_object_or_404(post.comments.only('path'), pk=root_id)
+    page, next_cursor = get_page(post.pk, after, root, limit,
+                                 using=sharding.db_of(post))
+    return root, page, next_cursor
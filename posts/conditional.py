@@ -0,0 +1,63 @@
+"""Условные GET-запросы к страницам (ETag и Last-Modified).
+
+Валидаторы страницы строятся из поколений её областей кеша и времени
+их последнего изменения. Области сбрасываются при любой записи постов,
+комментариев, групп и подписок, поэтому на 304 не нужны ни шаблон, ни
+запросы списков к базе. Анонимные страницы разрешено хранить прокси.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.shortcuts import render
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date
+
+from yatube.db_router import pin_primary
+
+from .caching import get_changed, get_generations
+from .page_cache import render_page
+from .settings import PAGE_EDGE_MAX_AGE
+
+
+def get_validators(request, *scopes):
+    """ETag и Last-Modified страницы для этого посетителя."""
+    key = ':'.join(map(str, (
+        *get_generations(*scopes),
+        request.get_full_path(),
+        request.user.pk or '',
+    )))
+    etag = f'"{hashlib.md5(key.encode()).hexdigest()}"'
+    return etag, get_changed(*scopes)
+
+
+def render_conditional(request, scopes, template_name, get_context,
+                       cache_page=True):
+    """Ответ 304, если страница не менялась, иначе сама страница.
+
+    Страница берётся из кеша страниц (cache_page) или отрисовывается,
+    контекст строится только для отрисовки.
+    """
+    etag, last_modified = get_validators(request, *scopes)
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is None:
+        # Страница попадёт в кеш под новым поколением, поэтому сразу
+        # после записи её нельзя строить по отстающей реплике.
+        if time.time() - last_modified < settings.REPLICA_PIN_SECONDS:
+            pin_primary()
+        if cache_page:
+            response = render_page(request, scopes, template_name,
+                                   get_context)
+        else:
+            response = render(request, template_name, get_context())
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, max_age=0,
+                            s_maxage=PAGE_EDGE_MAX_AGE)
+    patch_vary_headers(response, ('Cookie',))
+    return response
@@ -0,0 +1,94 @@
+from collections import Counter
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import sharding
+from .feed import sync_celebrities
+from .models import Comment, Follow, Post, ProfileStats, User
+from .settings import RECOUNT_BATCH_SIZE
+
+
+def count_subquery(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    ), 0)
+
+
+def change_stats(user_id, **deltas):
+    """Изменяет счётчики профиля одним UPDATE без гонок."""
+    updated = ProfileStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated and all(delta > 0 for delta in deltas.values()):
+        recount_stats(User.objects.filter(pk=user_id))
+
+
+def change_followers(author_ids, delta):
+    """Изменяет счётчик подписчиков сразу у нескольких авторов."""
+    updated = ProfileStats.objects.filter(user_id__in=author_ids).update(
+        followers_count=F('followers_count') + delta
+    )
+    if updated < len(author_ids) and delta > 0:
+        recount_stats(User.objects.filter(pk__in=author_ids,
+                                          stats__isnull=True))
+
+
+def change_comment_count(post_id, delta, using=None):
+    Post.objects.using(using).filter(pk=post_id).update(
+        comment_count=F('comment_count') + delta
+    )
+
+
+def recount_stats(users=None):
+    """Пересчитывает счётчики профилей, создавая недостающие."""
+    users = User.objects.all() if users is None else users
+    ProfileStats.objects.bulk_create(
+        [ProfileStats(user_id=user_id)
+         for user_id in users.filter(stats__isnull=True)
+                             .values_list('pk', flat=True)],
+        ignore_conflicts=True,
+    )
+    stats = ProfileStats.objects.filter(user__in=users)
+    if sharding.is_sharded():
+        updated = stats.update(
+            followers_count=count_subquery(Follow.objects, 'author'),
+            following_count=count_subquery(Follow.objects, 'user'),
+        )
+        recount_sharded_posts(stats)
+    else:
+        updated = stats.update(
+            posts_count=count_subquery(Post.objects, 'author'),
+            followers_count=count_subquery(Follow.objects, 'author'),
+            following_count=count_subquery(Follow.objects, 'user'),
+        )
+    sync_celebrities(users.values('pk'))
+    return updated
+
+
+def recount_sharded_posts(stats):
+    """Число постов авторов, сложенное по всем базам с постами."""
+    counts = Counter()
+    for database in sharding.get_databases():
+        counts.update(dict(
+            Post.objects.using(database).order_by().values_list(
+                'author_id'
+            ).annotate(count=Count('pk'))
+        ))
+    profiles = list(stats.only('pk'))
+    for profile in profiles:
+        profile.posts_count = counts[profile.pk]
+    ProfileStats.objects.bulk_update(profiles, ['posts_count'],
+                                     batch_size=RECOUNT_BATCH_SIZE)
+
+
+def recount_comments(posts=None):
+    """Пересчитывает комментарии постов в каждой базе с постами."""
+    posts = Post.objects.all() if posts is None else posts
+    return sum(part.update(
+        comment_count=count_subquery(Comment.objects, 'post'),
+    ) for part in sharding.scatter(posts))
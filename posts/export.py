@@ -0,0 +1,131 @@
+"""Потоковая выгрузка пользователей, постов, комментариев и подписок.
+
+Строки читаются из базы по id через iterator(chunk_size=...) (в
+PostgreSQL - серверным курсором) и сразу превращаются в NDJSON или CSV,
+при необходимости сжатые gzip. В памяти одновременно только одна пачка
+строк, сколько бы их ни было в таблице. Для выгрузки только новых строк
+есть фильтры по времени и по id. При шардах посты и комментарии
+читаются из каждой базы и сливаются по id.
+"""
+import csv
+import datetime as dt
+import heapq
+import json
+import zlib
+from operator import itemgetter
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import sharding
+from .models import Comment, Follow, Post, User
+from .settings import EXPORT_CHUNK_SIZE
+
+# Выгружаемые поля и поле времени для выгрузки изменений.
+EXPORTS = {
+    'users': (User, ('id', 'username', 'email', 'first_name', 'last_name',
+                     'date_joined'), 'date_joined'),
+    'posts': (Post, ('id', 'author__username', 'group__slug', 'text',
+                     'pub_date', 'image', 'comment_count'), 'pub_date'),
+    'comments': (Comment, ('id', 'post_id', 'parent_id', 'author__username',
+                           'text', 'created'), 'created'),
+    'follows': (Follow, ('id', 'user__username', 'author__username'), None),
+}
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def parse_time(value):
+    """Время из ISO 8601, дата - это начало дня по часовому поясу сайта."""
+    since = parse_datetime(value)
+    if since is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f'Не понятно время: {value}')
+        since = dt.datetime.combine(date, dt.time.min)
+    if settings.USE_TZ and timezone.is_naive(since):
+        return timezone.make_aware(since)
+    if not settings.USE_TZ and timezone.is_aware(since):
+        return timezone.make_naive(since)
+    return since
+
+
+def get_rows(kind, since=None, after_id=None):
+    """Кортежи значений полей EXPORTS[kind] в порядке id."""
+    model, fields, date_field = EXPORTS[kind]
+    rows = model.objects.order_by('pk')
+    if since is not None:
+        if date_field is None:
+            raise ValueError(f'У {kind} нет времени создания, '
+                             f'выгружайте их по id.')
+        rows = rows.filter(**{f'{date_field}__gte': since})
+    if after_id is not None:
+        rows = rows.filter(pk__gt=after_id)
+    parts = sharding.scatter(rows) if model in (Post, Comment) else [rows]
+    iterators = [part.values_list(*fields).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    ) for part in parts]
+    if len(iterators) == 1:
+        return iterators[0]
+    # Первое поле каждой выгрузки - id.
+    return heapq.merge(*iterators, key=itemgetter(0))
+
+
+def column_names(kind):
+    return [field.replace('__', '_') for field in EXPORTS[kind][1]]
+
+
+def to_text(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def ndjson_lines(kind, rows):
+    names = column_names(kind)
+    for row in rows:
+        yield json.dumps(dict(zip(names, map(to_text, row))),
+                         ensure_ascii=False) + '\n'
+
+
+class Line:
+    """Файл для csv.writer, который просто возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(kind, rows):
+    writer = csv.writer(Line())
+    yield writer.writerow(column_names(kind))
+    for row in rows:
+        yield writer.writerow([to_text(value) for value in row])
+
+
+def export_lines(kind, export_format='ndjson', since=None, after_id=None):
+    """Строки выгрузки в формате export_format."""
+    lines = ndjson_lines if export_format == 'ndjson' else csv_lines
+    return lines(kind, get_rows(kind, since, after_id))
+
+
+def encode(lines, batch_size=EXPORT_CHUNK_SIZE):
+    """Байты строк, склеенные пачками: меньше мелких записей в поток."""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield ''.join(batch).encode()
+            batch = []
+    if batch:
+        yield ''.join(batch).encode()
+
+
+def gzip_chunks(chunks):
+    """Сжимает поток байтов в формат gzip на лету."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
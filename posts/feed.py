@@ -0,0 +1,255 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from jobs.queue import task
+
+from . import sharding
+from .models import FeedEntry, Follow, Post, ProfileStats
+from .paginator import MergedList
+from .settings import (FEED_BACKFILL_SIZE, FEED_CELEBRITIES_TIMEOUT,
+                       FEED_FANOUT_BATCH_SIZE, FEED_FANOUT_LIMIT,
+                       FEED_FANOUT_RESUME_LIMIT)
+
+CELEBRITIES_CACHE_KEY = 'feed:celebrities'
+# Ключ, по которому части ленты сливаются и делятся на страницы.
+FEED_KEY = ('feed_date', 'feed_post')
+
+
+def get_celebrity_ids():
+    """Авторы, чьи посты подмешиваются в ленту при чтении."""
+    celebrity_ids = cache.get(CELEBRITIES_CACHE_KEY)
+    if celebrity_ids is None:
+        # celebrity=True Django пишет голым столбцом, и SQLite тогда
+        # просматривает всю таблицу. Со сравнением он ищет по индексу.
+        celebrity_ids = set(
+            ProfileStats.objects.filter(celebrity__in=[True])
+            .values_list('user_id', flat=True)
+        )
+        cache.set(CELEBRITIES_CACHE_KEY, celebrity_ids,
+                  FEED_CELEBRITIES_TIMEOUT)
+    return celebrity_ids
+
+
+def is_celebrity(author_id):
+    """Не раскладываются ли сейчас посты автора по лентам."""
+    return ProfileStats.objects.filter(user_id=author_id,
+                                       celebrity=True).exists()
+
+
+def celebrities_changed():
+    # Список сбрасывается после фиксации, иначе его перечитают до неё.
+    transaction.on_commit(lambda: cache.delete(CELEBRITIES_CACHE_KEY))
+
+
+def sync_celebrities(author_ids=None):
+    """Отмечает популярных авторов по их счётчикам подписчиков.
+
+    Вызывается там же, где меняются счётчики. Пока автор отмечен, его
+    посты в ленты не раскладываются и читаются из его профиля. Отметка
+    ставится, когда подписчиков больше FEED_FANOUT_LIMIT, а снимается
+    фоновым заданием, когда их меньше FEED_FANOUT_RESUME_LIMIT.
+    """
+    stats = ProfileStats.objects.all()
+    if author_ids is not None:
+        stats = stats.filter(user_id__in=author_ids)
+    if stats.filter(celebrity=False,
+                    followers_count__gt=FEED_FANOUT_LIMIT).update(
+        celebrity=True
+    ):
+        celebrities_changed()
+    former = stats.filter(
+        celebrity=True, followers_count__lt=FEED_FANOUT_RESUME_LIMIT,
+    ).values_list('user_id', flat=True)
+    for author_id in former:
+        fan_out_author.enqueue([author_id], key=f'fan_out:{author_id}')
+
+
+@task()
+def fan_out_author(author_id):
+    """Раскладывает последние посты бывшего популярного автора по лентам.
+
+    Пока идёт раскладка, отметка стоит и посты автора подмешиваются в
+    ленты при чтении. Снимается она короткой транзакцией, которая
+    докладывает посты, вышедшие за время раскладки.
+    """
+    former = ProfileStats.objects.filter(
+        user_id=author_id, celebrity=True,
+        followers_count__lt=FEED_FANOUT_RESUME_LIMIT,
+    )
+    if sharding.is_sharded():
+        if former.update(celebrity=False):
+            celebrities_changed()
+        return
+    if not former.exists():
+        return
+    started = timezone.now()
+    fill_author_feeds(author_id)
+    with transaction.atomic():
+        if former.update(celebrity=False):
+            celebrities_changed()
+            fill_author_feeds(author_id, since=started)
+
+
+def fill_author_feeds(author_id, since=None):
+    """Раскладывает последние посты автора по лентам всех подписчиков."""
+    posts = Post.objects.filter(author_id=author_id)
+    if since is not None:
+        posts = posts.filter(pub_date__gte=since)
+    posts = list(posts.values_list('id', 'pub_date')[:FEED_BACKFILL_SIZE])
+    follower_ids = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=follower_id, post_id=post_id,
+                   author_id=author_id, pub_date=pub_date)
+         for follower_id in follower_ids
+         for post_id, pub_date in posts],
+        batch_size=FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if sharding.is_sharded() or is_celebrity(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=follower_id, post=post,
+                   author_id=post.author_id, pub_date=post.pub_date)
+         for follower_id in follower_ids],
+        ignore_conflicts=True,
+    )
+
+
+def fill_feeds():
+    """Раскладывает по лентам все посты, которых там ещё нет.
+
+    Нужна после вставки постов и подписок в обход сигналов: один
+    INSERT ... SELECT вместо fan_out_post на каждый пост. При шардах
+    лента собирается из шардов при чтении, и раскладывать нечего.
+    """
+    if sharding.is_sharded():
+        return 0
+    celebrity_ids = [str(int(pk)) for pk in ProfileStats.objects.filter(
+        celebrity=True
+    ).values_list('user_id', flat=True)] or ['0']
+    entries = FeedEntry._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {entries} (user_id, post_id, author_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+            f'FROM {Follow._meta.db_table} f '
+            f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+            f'WHERE f.author_id NOT IN ({", ".join(celebrity_ids)}) '
+            f'AND NOT EXISTS (SELECT 1 FROM {entries} e '
+            f'WHERE e.user_id = f.user_id AND e.post_id = p.id)'
+        )
+        return cursor.rowcount
+
+
+def backfill_feed(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if sharding.is_sharded() or is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date'
+    )[:FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post_id=post_id,
+                   author_id=author_id, pub_date=pub_date)
+         for post_id, pub_date in posts],
+        ignore_conflicts=True,
+    )
+
+
+def trim_feed(user_id, author_ids):
+    """Убирает из ленты посты авторов после отписки."""
+    FeedEntry.objects.filter(user_id=user_id,
+                             author_id__in=author_ids).delete()
+
+
+def followed_celebrities(user):
+    """Популярные авторы, на которых подписан пользователь."""
+    celebrity_ids = get_celebrity_ids()
+    if not celebrity_ids:
+        return []
+    return list(Follow.objects.filter(
+        user=user, author_id__in=celebrity_ids
+    ).values_list('author_id', flat=True))
+
+
+def get_feed_parts(user, celebrities=None):
+    """Части ленты, каждая идёт по своему индексу.
+
+    Первая - разложенные записи ленты, дальше - по одной на каждого
+    популярного автора. Постраничный вывод по курсору сливает их по
+    ключу (feed_date, feed_post).
+    """
+    if celebrities is None:
+        celebrities = followed_celebrities(user)
+    return [
+        Post.objects.filter(feed_entries__user=user).annotate(
+            feed_date=F('feed_entries__pub_date'),
+            feed_post=F('feed_entries__post'),
+        ),
+        *(Post.objects.filter(author_id=author_id).annotate(
+            feed_date=F('pub_date'), feed_post=F('pk'),
+        ) for author_id in celebrities),
+    ]
+
+
+def get_feed(user, celebrities=None):
+    """Посты ленты подписок пользователя одним запросом.
+
+    Обычно это одно чтение по индексу ленты. Посты популярных авторов
+    в ленты не раскладываются и добавляются при чтении.
+    """
+    if celebrities is None:
+        celebrities = followed_celebrities(user)
+    if celebrities:
+        return Post.objects.filter(
+            Q(pk__in=FeedEntry.objects.filter(user=user).values('post'))
+            | Q(author_id__in=celebrities)
+        ).annotate(feed_date=F('pub_date'), feed_post=F('pk'))
+    return get_feed_parts(user, celebrities)[0].order_by(
+        '-feed_date', '-feed_post'
+    )
+
+
+def get_sharded_feed_parts(user):
+    """Части ленты при шардах: посты подписок из каждой базы.
+
+    Записи ленты ссылаются на посты и не могут лежать в основной базе,
+    когда посты в шардах, поэтому лента читается по подпискам.
+    """
+    author_ids = defaultdict(list)
+    for author_id in Follow.objects.filter(user=user).values_list(
+        'author_id', flat=True
+    ):
+        author_ids[sharding.shard_for(author_id)].append(author_id)
+    return [
+        Post.objects.using(database).filter(author_id__in=ids).annotate(
+            feed_date=F('pub_date'), feed_post=F('pk'),
+        ) for database, ids in author_ids.items()
+    ] or [Post.objects.none()]
+
+
+def follow_feed(user):
+    """Посты ленты подписок и её части для вывода по ключу FEED_KEY.
+
+    Одна для страницы сайта и API, с шардами и без.
+    """
+    if sharding.is_sharded():
+        parts = [part.for_feed() for part in get_sharded_feed_parts(user)]
+        return MergedList(parts, FEED_KEY), parts
+    celebrities = followed_celebrities(user)
+    posts = get_feed(user, celebrities).for_feed()
+    parts = [part.for_feed() for part in get_feed_parts(user, celebrities)]
+    return posts, parts
@@ -0,0 +1,117 @@
+"""Подписки и отписки без гонок.
+
+Пара (user, author) уникальна на уровне базы. Подписка - одна вставка,
+которая пропускает уже существующие пары, отписка - одно удаление. Оба
+запроса возвращают авторов, у которых подписка действительно появилась
+или исчезла, поэтому счётчики и ленты меняются ровно на них даже при
+одновременных запросах.
+"""
+from django.db import IntegrityError, connection, transaction
+
+from . import caching, counters, feed
+from .models import Follow
+
+TABLE = Follow._meta.db_table
+
+
+def followed(user_id, author_ids):
+    """Счётчики и ленты после появления подписок."""
+    if not author_ids:
+        return
+    counters.change_stats(user_id, following_count=len(author_ids))
+    counters.change_followers(author_ids, 1)
+    feed.sync_celebrities(author_ids)
+    caching.bump(*caching.stats_scopes(user_id, *author_ids))
+    for author_id in author_ids:
+        feed.backfill_feed(user_id, author_id)
+
+
+def unfollowed(user_id, author_ids):
+    """Счётчики и ленты после удаления подписок."""
+    if not author_ids:
+        return
+    counters.change_stats(user_id, following_count=-len(author_ids))
+    counters.change_followers(author_ids, -1)
+    feed.sync_celebrities(author_ids)
+    caching.bump(*caching.stats_scopes(user_id, *author_ids))
+    feed.trim_feed(user_id, author_ids)
+
+
+def returning_supported():
+    if connection.vendor == 'postgresql':
+        return True
+    return (connection.vendor == 'sqlite'
+            and connection.Database.sqlite_version_info >= (3, 35))
+
+
+def execute_returning(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} RETURNING author_id', params)
+        return [author_id for author_id, in cursor.fetchall()]
+
+
+def insert_follows(user_id, author_ids):
+    if returning_supported():
+        values = ', '.join(['(%s, %s)'] * len(author_ids))
+        return execute_returning(
+            f'INSERT INTO {TABLE} (user_id, author_id) VALUES {values} '
+            f'ON CONFLICT DO NOTHING',
+            [value for author_id in author_ids
+             for value in (user_id, author_id)],
+        )
+    created = []
+    for author_id in author_ids:
+        try:
+            with transaction.atomic():
+                Follow.objects.bulk_create(
+                    [Follow(user_id=user_id, author_id=author_id)]
+                )
+        except IntegrityError:
+            continue
+        created.append(author_id)
+    return created
+
+
+def delete_follows(user_id, author_ids):
+    if returning_supported():
+        placeholders = ', '.join(['%s'] * len(author_ids))
+        return execute_returning(
+            f'DELETE FROM {TABLE} '
+            f'WHERE user_id = %s AND author_id IN ({placeholders})',
+            [user_id, *author_ids],
+        )
+    deleted = []
+    with connection.cursor() as cursor:
+        for author_id in author_ids:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE user_id = %s AND author_id = %s',
+                [user_id, author_id],
+            )
+            if cursor.rowcount:
+                deleted.append(author_id)
+    return deleted
+
+
+@transaction.atomic
+def follow(user, author_ids):
+    """Подписывает на авторов, возвращает id новых подписок.
+
+    Авторы должны существовать, подписка на себя пропускается.
+    """
+    author_ids = sorted(set(author_ids) - {user.pk})
+    if not author_ids:
+        return []
+    created = insert_follows(user.pk, author_ids)
+    followed(user.pk, created)
+    return created
+
+
+@transaction.atomic
+def unfollow(user, author_ids):
+    """Отписывает от авторов, возвращает id удалённых подписок."""
+    author_ids = sorted(set(author_ids))
+    if not author_ids:
+        return []
+    deleted = delete_follows(user.pk, author_ids)
+    unfollowed(user.pk, deleted)
+    return deleted
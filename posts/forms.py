@@ -1,5 +1,6 @@
 from django import forms
 
+from . import thumbnails
 from .models import Comment, Post
 
 
@@ -11,6 +12,19 @@ class PostForm(forms.ModelForm):
                   'group': 'Выберите группу',
                   'image': 'Загрузите картинку'}
 
+    def save(self, commit=True):
+        """Сохраняет пост, копии новой картинки готовятся в фоне."""
+        image_changed = 'image' in self.changed_data
+        post = super().save(commit=False)
+        if image_changed:
+            post.thumbnail = ''
+            post.renditions = {}
+        if commit:
+            post.save()
+            if image_changed and post.image:
+                thumbnails.schedule(post)
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,280 @@
+"""Пакетная загрузка пользователей, постов, комментариев и подписок.
+
+Вход - NDJSON или CSV с теми же колонками, что у выгрузки (см.
+posts/export.py). Значения проверяются полями форм сайта, авторы,
+группы, посты и родительские комментарии находятся одним запросом на
+пачку строк и запоминаются в памяти. Строки вставляются bulk_create
+пачками, каждая пачка - в своей транзакции.
+
+Посты и комментарии сохраняют свои id, пользователи уникальны по
+имени, подписки - по паре. Строки, которые уже есть в базе, пропускаются
+и не попадают в поисковый индекс, поэтому повторная вставка той же
+пачки ничего не дублирует и загрузку можно продолжить после сбоя с
+последней записанной отметки. Сигналы при bulk_create не срабатывают:
+пути веток, счётчики и ленты доделывает finish(), поисковый индекс
+пополняется вместе с пачками.
+"""
+import csv
+import gzip
+import io
+import itertools
+import json
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from users.forms import RegistrationForm
+
+from . import caching, comments
+from .counters import recount_comments, recount_stats
+from .export import parse_time
+from .feed import fill_feeds
+from .forms import CommentForm, PostForm
+from .models import Comment, Follow, Group, Post, User
+from .search import get_backend
+from .settings import IMPORT_CACHE_SIZE
+
+# Модель каждого вида загрузки и метод поиска, индексирующий её строки.
+IMPORTS = {
+    'users': (User, None),
+    'posts': (Post, 'index_post'),
+    'comments': (Comment, 'index_comment'),
+    'follows': (Follow, None),
+}
+# Поля, по которым строка вида загрузки уже может быть в базе.
+UNIQUE_FIELDS = {
+    'users': ('username',),
+    'posts': ('pk',),
+    'comments': ('pk',),
+    'follows': ('user_id', 'author_id'),
+}
+# Даты из загрузки не должны заменяться текущим временем.
+DATE_FIELDS = (Post._meta.get_field('pub_date'),
+               Comment._meta.get_field('created'))
+
+
+@contextmanager
+def manual_dates(*fields):
+    """Даёт задать даты вручную полям с auto_now_add."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def read_rows(file, import_format='ndjson', compressed=False):
+    """Словари строк из двоичного файла, по одному в памяти."""
+    if compressed:
+        file = gzip.open(file)
+    text = io.TextIOWrapper(file, encoding='utf-8', newline='')
+    if import_format == 'csv':
+        yield from csv.DictReader(text)
+        return
+    for line in text:
+        if line.strip():
+            yield json.loads(line)
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Lookup:
+    """id объектов по ключу (имени, slug, id) с кешем в памяти."""
+
+    def __init__(self, queryset, key, value='pk'):
+        self.queryset = queryset
+        self.key = key
+        self.value = value
+        self.cache = {}
+
+    def load(self, keys):
+        """Находит незнакомые ключи пачки одним запросом."""
+        missing = {key for key in keys if key and key not in self.cache}
+        if not missing:
+            return
+        if len(self.cache) + len(missing) > IMPORT_CACHE_SIZE:
+            self.cache.clear()
+        self.cache.update(self.queryset.filter(
+            **{f'{self.key}__in': missing}
+        ).values_list(self.key, self.value))
+
+    def add(self, key, value):
+        self.cache[key] = value
+
+    def get(self, key, name):
+        if key not in self.cache:
+            raise ValidationError(f'Нет {name}: {key}')
+        return self.cache[key]
+
+
+def clean(form_class, name, row):
+    """Значение колонки, проверенное полем формы."""
+    return form_class.base_fields[name].clean(row.get(name) or '')
+
+
+def to_int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f'{name} должен быть числом: {value}')
+
+
+def to_time(value):
+    if not value:
+        return timezone.now()
+    try:
+        return parse_time(value)
+    except ValueError as error:
+        raise ValidationError(str(error))
+
+
+class Importer:
+    """Строит объекты из строк одного вида и вставляет их пачками."""
+
+    def __init__(self, kind, search=True):
+        self.kind = kind
+        self.model, index = IMPORTS[kind]
+        self.index = index and search and getattr(get_backend(), index)
+        self.users = Lookup(User.objects, 'username')
+        self.groups = Lookup(Group.objects, 'slug')
+        self.posts = Lookup(Post.objects, 'pk')
+        # Родительские комментарии по id: нужен их пост.
+        self.parents = Lookup(Comment.objects, 'pk', 'post_id')
+        self.password = make_password(None)
+
+    def prefetch(self, rows):
+        """Загружает в кеши все ссылки пачки."""
+        def column(name):
+            return [row.get(name) for row in rows]
+
+        def ids(name):
+            return [int(value) for value in column(name)
+                    if str(value).isdigit()]
+        self.users.load(column('author_username') + column('user_username'))
+        self.groups.load(column('group_slug'))
+        if self.kind == 'comments':
+            self.posts.load(ids('post_id'))
+            self.parents.load(ids('parent_id'))
+
+    def build_users(self, row):
+        username = clean(RegistrationForm, 'username', row)
+        User.username_validator(username)
+        return User(
+            username=username,
+            email=clean(RegistrationForm, 'email', row),
+            first_name=clean(RegistrationForm, 'first_name', row),
+            last_name=clean(RegistrationForm, 'last_name', row),
+            date_joined=to_time(row.get('date_joined')),
+            password=self.password,
+        )
+
+    def build_posts(self, row):
+        post = Post(
+            pk=to_int(row.get('id'), 'id'),
+            text=clean(PostForm, 'text', row),
+            author_id=self.users.get(row.get('author_username'), 'автора'),
+            pub_date=to_time(row.get('pub_date')),
+            image=row.get('image') or None,
+        )
+        if row.get('group_slug'):
+            post.group_id = self.groups.get(row['group_slug'], 'группы')
+        return post
+
+    def build_comments(self, row):
+        comment = Comment(
+            pk=to_int(row.get('id'), 'id'),
+            post_id=self.posts.get(to_int(row.get('post_id'), 'post_id'),
+                                   'поста'),
+            author_id=self.users.get(row.get('author_username'), 'автора'),
+            text=clean(CommentForm, 'text', row),
+            created=to_time(row.get('created')),
+        )
+        if row.get('parent_id'):
+            comment.parent_id = to_int(row['parent_id'], 'parent_id')
+            if self.parents.get(comment.parent_id,
+                                'комментария') != comment.post_id:
+                raise ValidationError('Ответ на комментарий к другому посту')
+        # Ответы могут идти в той же пачке сразу за родителем.
+        self.parents.add(comment.pk, comment.post_id)
+        return comment
+
+    def build_follows(self, row):
+        follow = Follow(
+            user_id=self.users.get(row.get('user_username'),
+                                   'пользователя'),
+            author_id=self.users.get(row.get('author_username'), 'автора'),
+        )
+        if follow.user_id == follow.author_id:
+            raise ValidationError('Нельзя подписаться на себя')
+        return follow
+
+    def build(self, rows):
+        """Объекты пачки и ошибки в виде пар (номер строки, текст)."""
+        build = getattr(self, f'build_{self.kind}')
+        objects, errors = [], []
+        for number, row in rows:
+            try:
+                objects.append(build(row))
+            except ValidationError as error:
+                errors.append((number, '; '.join(error.messages)))
+        return objects, errors
+
+    def new_objects(self, objects):
+        """Объекты, которых нет ни в базе, ни раньше в той же пачке."""
+        fields = UNIQUE_FIELDS[self.kind]
+        keys = [tuple(getattr(instance, field) for field in fields)
+                for instance in objects]
+        seen = set(self.model.objects.filter(**{
+            f'{field}__in': {key[position] for key in keys}
+            for position, field in enumerate(fields)
+        }).values_list(*fields)) if objects else set()
+        new = []
+        for instance, key in zip(objects, keys):
+            if key not in seen:
+                seen.add(key)
+                new.append(instance)
+        return new
+
+    def insert(self, rows):
+        """Вставляет пачку пар (номер строки, словарь) в одной транзакции.
+
+        Возвращает число вставленных строк, число пропущенных, потому что
+        такие уже есть, и ошибки остальных.
+        """
+        self.prefetch([row for number, row in rows])
+        objects, errors = self.build(rows)
+        with manual_dates(*DATE_FIELDS), transaction.atomic():
+            new = self.new_objects(objects)
+            # Параллельная запись всё ещё может занять id: такие строки
+            # пропускаются, а не обрывают пачку.
+            self.model.objects.bulk_create(new, ignore_conflicts=True)
+            if self.index:
+                for instance in new:
+                    self.index(instance)
+        return len(new), len(objects) - len(new), errors
+
+
+def finish(kind):
+    """Доделывает то, что при сохранении по одному делают сигналы."""
+    with transaction.atomic():
+        if kind == 'comments':
+            comments.fill_paths()
+            recount_comments()
+        else:
+            recount_stats()
+        if kind in ('posts', 'follows'):
+            fill_feeds()
+    # Меняются все списки, счётчики и кнопки подписки.
+    caching.bump('global')
@@ -0,0 +1,102 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts.feed import get_feed, get_feed_parts
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginator import CursorPaginator
+from posts.query_plans import capture_selects, query_problems
+from posts.settings import POSTS_PER_PAGE
+
+SAMPLE = 'query-plan-check'
+# Без кеша страницы каждый раз выполняют все свои запросы.
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+def cursors(posts, item, key=('pub_date', 'pk')):
+    """Адреса следующих и предыдущих страниц по курсору записи."""
+    cursor = CursorPaginator(posts, POSTS_PER_PAGE, key).encode_cursor(item)
+    return [f'?after={cursor}', f'?before={cursor}']
+
+
+class Command(BaseCommand):
+    help = ('Проверяет планы запросов страниц через EXPLAIN QUERY PLAN и '
+            'завершается с ошибкой при полном просмотре таблицы или '
+            'сортировке без индекса.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка планов работает только с SQLite.')
+        with override_settings(CACHES=NO_CACHE), transaction.atomic():
+            problems = self.check_pages()
+            # Данные для проверки не сохраняются.
+            transaction.set_rollback(True)
+        for url, found in problems.items():
+            self.stderr.write(url)
+            for sql, details in found.items():
+                self.stderr.write(f'  {sql}')
+                for detail in details:
+                    self.stderr.write(f'    {detail}')
+        if problems:
+            raise CommandError(f'Страниц с плохими планами: {len(problems)}')
+        self.stdout.write(self.style.SUCCESS('Планы запросов в порядке.'))
+
+    def check_pages(self):
+        author = User.objects.create_user(username=f'{SAMPLE}-author')
+        reader = User.objects.create_user(username=f'{SAMPLE}-reader')
+        group = Group.objects.create(title=SAMPLE, slug=SAMPLE)
+        post = Post.objects.create(text=SAMPLE, author=author, group=group)
+        comment = Comment.objects.create(text=SAMPLE, author=reader,
+                                         post=post)
+        Follow.objects.create(user=reader, author=author)
+        feed = get_feed(reader)
+        feed_key = ('feed_date', 'feed_post')
+        # Номера страниц (?page=N) требуют COUNT(*) по всем строкам,
+        # проверяется вывод по курсору, который открывается по умолчанию.
+        pages = ['']
+        urls = {
+            reverse('posts:index'): pages + cursors(Post.objects, post),
+            reverse('posts:group', args=[group.slug]):
+                pages + cursors(group.posts, post),
+            reverse('posts:profile', args=[author.username]):
+                pages + cursors(author.posts, post),
+            reverse('posts:post', args=[author.username, post.pk]): [''],
+            reverse('posts:post_comments', args=[author.username, post.pk]):
+                ['', f'?after={comment.path}', f'?root={comment.pk}'],
+        }
+        reader_urls = {
+            reverse('posts:follow_index'):
+                pages + cursors(feed, feed.first(), feed_key),
+            **urls,
+        }
+        guest, client = Client(), Client()
+        client.force_login(reader)
+        problems = {}
+        for visitor, visitor_urls in ((guest, urls), (client, reader_urls)):
+            for path, queries in visitor_urls.items():
+                for query in queries:
+                    with capture_selects() as selects:
+                        visitor.get(path + query)
+                    found = query_problems(selects)
+                    if found:
+                        problems[path + query] = found
+        found = self.check_celebrity_feed(reader, author, feed_key)
+        if found:
+            problems['Лента с популярным автором'] = found
+        return problems
+
+    def check_celebrity_feed(self, reader, author, key):
+        """Части ленты, когда автор считается популярным."""
+        paginator = CursorPaginator(
+            get_feed(reader, [author.pk]), POSTS_PER_PAGE, key,
+            parts=get_feed_parts(reader, [author.pk]),
+        )
+        with capture_selects() as selects:
+            cursor = paginator.encode_cursor(paginator.get_cursor_page()[0])
+            paginator.get_cursor_page(after=cursor)
+            paginator.get_cursor_page(before=cursor)
+        return query_problems(selects)
@@ -0,0 +1,60 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import (EXPORTS, FORMATS, encode, export_lines,
+                          gzip_chunks, parse_time)
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, посты, комментарии или подписки '
+            'в NDJSON или CSV потоком, не загружая таблицу в память.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', nargs='?', default='posts',
+                            choices=EXPORTS)
+        parser.add_argument('--format', default='ndjson', choices=FORMATS)
+        parser.add_argument(
+            '--since',
+            help='Только строки, созданные с этого момента (ISO 8601).',
+        )
+        parser.add_argument('--after-id', type=int,
+                            help='Только строки с id больше этого.')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Сжимать выгрузку gzip.')
+        parser.add_argument('--output', '-o',
+                            help='Файл выгрузки, по умолчанию stdout.')
+
+    def handle(self, *args, **options):
+        try:
+            since = options['since'] and parse_time(options['since'])
+            lines = export_lines(options['kind'], options['format'],
+                                 since=since or None,
+                                 after_id=options['after_id'])
+        except ValueError as error:
+            raise CommandError(error)
+        count = 0
+
+        def counted(lines):
+            nonlocal count
+            for line in lines:
+                count += 1
+                yield line
+        chunks = encode(counted(lines))
+        if options['gzip']:
+            chunks = gzip_chunks(chunks)
+        output = (open(options['output'], 'wb') if options['output']
+                  else sys.stdout.buffer)
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
+            else:
+                output.flush()
+        # Данные могут идти в stdout, итог пишется в stderr.
+        header = options['format'] == 'csv'
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено строк: {count - header}'
+        ))
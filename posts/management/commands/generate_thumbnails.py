@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import Post
+from posts.settings import THUMBNAIL_WORKERS
+from posts.thumbnails import generate
+
+
+def generate_in_thread(post_id):
+    try:
+        return generate(post_id)
+    except Exception as error:
+        return error
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Готовит миниатюры картинок постов, у которых их ещё нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=THUMBNAIL_WORKERS,
+            help='Сколько миниатюр готовить одновременно.',
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Заново подготовить миниатюры всех картинок.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            posts = posts.filter(thumbnail='')
+        post_ids = list(posts.values_list('pk', flat=True))
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for post_id, result in zip(
+                post_ids, pool.map(generate_in_thread, post_ids)
+            ):
+                if isinstance(result, Exception):
+                    failed += 1
+                    self.stderr.write(f'Пост {post_id}: {result}')
+                else:
+                    done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово миниатюр: {done}, ошибок: {failed}'
+        ))
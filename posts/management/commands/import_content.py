@@ -0,0 +1,118 @@
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import FORMATS
+from posts import sharding
+from posts.importer import IMPORTS, Importer, batches, finish, read_rows
+from posts.settings import IMPORT_BATCH_SIZE
+
+# Виды загрузки, записи которых лежат на шардах.
+SHARDED_KINDS = ('posts', 'comments')
+
+
+class Command(BaseCommand):
+    help = ('Загружает пользователей, посты, комментарии или подписки '
+            'из NDJSON или CSV пачками через bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=IMPORTS)
+        parser.add_argument('input', nargs='?',
+                            help='Файл загрузки, по умолчанию stdin.')
+        parser.add_argument('--format', default='ndjson', choices=FORMATS)
+        parser.add_argument('--gzip', action='store_true',
+                            help='Файл сжат gzip.')
+        parser.add_argument('--batch-size', type=int,
+                            default=IMPORT_BATCH_SIZE)
+        parser.add_argument(
+            '--checkpoint',
+            help=('Файл с числом уже загруженных строк, по умолчанию '
+                  'рядом с файлом загрузки.'),
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить загрузку с отметки в файле --checkpoint.',
+        )
+        parser.add_argument('--no-search', action='store_true',
+                            help='Не пополнять поисковый индекс.')
+
+    def read_checkpoint(self, path, kind):
+        if not os.path.exists(path):
+            return 0
+        with open(path) as file:
+            checkpoint = json.load(file)
+        if checkpoint['kind'] != kind:
+            raise CommandError(f'Отметка {path} - загрузка '
+                               f'{checkpoint["kind"]}, а не {kind}.')
+        return checkpoint['rows']
+
+    def write_checkpoint(self, path, kind, rows):
+        # Отметка заменяется целиком, чтобы сбой не оставил половину файла.
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump({'kind': kind, 'rows': rows}, file)
+        os.replace(f'{path}.tmp', path)
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        if kind in SHARDED_KINDS and sharding.is_sharded():
+            # Пачки вставляются в одну базу, а посты авторов живут
+            # на разных шардах.
+            raise CommandError(f'Загрузка {kind} не работает с шардами.')
+        checkpoint = options['checkpoint'] or (
+            options['input'] and f'{options["input"]}.checkpoint'
+        )
+        if options['resume'] and not checkpoint:
+            raise CommandError('Для --resume нужен файл --checkpoint.')
+        skip = (self.read_checkpoint(checkpoint, kind)
+                if options['resume'] else 0)
+        file = (open(options['input'], 'rb') if options['input']
+                else sys.stdin.buffer)
+        try:
+            self.load(file, kind, skip, checkpoint, options)
+        finally:
+            if options['input']:
+                file.close()
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+    def load(self, file, kind, skip, checkpoint, options):
+        importer = Importer(kind, search=not options['no_search'])
+        rows = enumerate(read_rows(file, options['format'],
+                                   options['gzip']), 1)
+        done = skip
+        inserted = skipped = rejected = 0
+        started = time.perf_counter()
+        for batch in batches(rows, options['batch_size']):
+            if batch[-1][0] <= skip:
+                continue
+            batch = [(number, row) for number, row in batch if number > skip]
+            count, existing, errors = importer.insert(batch)
+            done = batch[-1][0]
+            if checkpoint:
+                self.write_checkpoint(checkpoint, kind, done)
+            inserted += count
+            skipped += existing
+            rejected += len(errors)
+            for number, error in errors:
+                self.stderr.write(f'Строка {number}: {error}')
+            if options['verbosity'] > 1:
+                self.stdout.write(self.progress(done, inserted, started))
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.progress(done, inserted, started)}, '
+            f'уже были: {skipped}, отклонено: {rejected}'
+        ))
+        # Пути веток, счётчики и ленты - одним проходом после вставки.
+        started = time.perf_counter()
+        finish(kind)
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики и ленты обновлены за '
+            f'{time.perf_counter() - started:.1f} с'
+        ))
+
+    def progress(self, done, inserted, started):
+        rate = inserted / max(time.perf_counter() - started, 1e-6)
+        return (f'Прочитано строк: {done}, загружено: {inserted}, '
+                f'{rate:.0f} строк/с')
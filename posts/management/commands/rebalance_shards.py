@@ -0,0 +1,135 @@
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.functions import Mod
+
+from posts import sharding
+from posts.models import Comment, FeedEntry, Group, Post, User
+from posts.settings import (SHARD_BUCKETS, SHARD_MOVE_BATCH_SIZE,
+                            SHARD_PLACEMENT_TIMEOUT)
+
+
+class Command(BaseCommand):
+    help = ('Раскладывает корзины авторов по шардам поровну и переносит '
+            'их посты и комментарии.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет перенесено.')
+        parser.add_argument('--limit', type=int,
+                            help='Перенести не больше стольких корзин.')
+        parser.add_argument('--batch-size', type=int,
+                            default=SHARD_MOVE_BATCH_SIZE)
+        parser.add_argument(
+            '--wait', type=float, default=SHARD_PLACEMENT_TIMEOUT,
+            help=('Сколько секунд ждать после переключения корзин, пока '
+                  'процессы сайта забудут старое размещение.'),
+        )
+
+    def handle(self, *args, **options):
+        shards = sharding.get_shards()
+        if not shards:
+            raise CommandError('Шарды не настроены, см. YATUBE_SHARDS.')
+        cache.delete(sharding.PLACEMENT_CACHE_KEY)
+        placement = sharding.get_placement()
+        moves = defaultdict(list)
+        for bucket, shard in sorted(
+            sharding.plan_placement(placement, shards).items()
+        ):
+            source = placement.get(bucket, DEFAULT_DB_ALIAS)
+            if source != shard:
+                moves[source, shard].append(bucket)
+        if options['limit'] is not None:
+            moves = self.limit(moves, options['limit'])
+        for (source, target), buckets in moves.items():
+            self.stdout.write(f'{source} -> {target}: {len(buckets)} '
+                              f'корзин из {SHARD_BUCKETS}')
+        if options['dry_run'] or not moves:
+            return
+        # Дальше id новых записей выдаются с запасом над всеми базами.
+        sharding.reserve_ids(Post, 0)
+        sharding.reserve_ids(Comment, 0)
+        for (source, target), buckets in moves.items():
+            started = time.perf_counter()
+            posts, comments = self.move(buckets, source, target, options)
+            self.stdout.write(self.style.SUCCESS(
+                f'{source} -> {target}: постов {posts}, комментариев '
+                f'{comments} за {time.perf_counter() - started:.1f} с'
+            ))
+
+    def limit(self, moves, limit):
+        limited = {}
+        for pair, buckets in moves.items():
+            if limit <= 0:
+                break
+            limited[pair] = buckets[:limit]
+            limit -= len(limited[pair])
+        return limited
+
+    def move(self, buckets, source, target, options):
+        """Копирует корзины, переключает их и удаляет старые записи.
+
+        Записи, которые сайт успел сохранить в старую базу до
+        переключения, догоняются вторым проходом копирования. Правки
+        старых записей в эти секунды теряются.
+        """
+        posts = Post.objects.using(source).annotate(
+            bucket=Mod('author_id', SHARD_BUCKETS)
+        ).filter(bucket__in=buckets)
+        comments = Comment.objects.using(source).filter(
+            post__in=posts.values('pk')
+        )
+        copied = self.copy(posts, comments, target, options['batch_size'])
+        sharding.set_placement(buckets, target)
+        time.sleep(options['wait'])
+        self.copy(posts, comments, target, options['batch_size'])
+        post_ids, params = posts.order_by().values(
+            'pk'
+        ).query.sql_with_params()
+        with transaction.atomic(using=source), \
+                connections[source].cursor() as cursor:
+            for model in (FeedEntry, Comment):
+                cursor.execute(f'DELETE FROM {model._meta.db_table} '
+                               f'WHERE post_id IN ({post_ids})', params)
+            cursor.execute(f'DELETE FROM {Post._meta.db_table} '
+                           f'WHERE id IN ({post_ids})', params)
+        return copied
+
+    def copy(self, posts, comments, target, batch_size):
+        # Ответ может оказаться в пачке раньше родителя, поэтому внешние
+        # ключи проверяются только по таблицам целиком.
+        with connections[target].constraint_checks_disabled():
+            counts = (self.copy_rows(posts, target, batch_size),
+                      self.copy_rows(comments, target, batch_size))
+        connections[target].check_constraints(table_names=[
+            Post._meta.db_table, Comment._meta.db_table,
+        ])
+        return counts
+
+    def copy_rows(self, queryset, target, batch_size):
+        """Копирует строки пачками по id, уже скопированные пропускаются."""
+        model = queryset.model
+        fields = [field.attname for field in model._meta.concrete_fields]
+        copied, last_id = 0, 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_id).order_by(
+                'pk'
+            ).values(*fields)[:batch_size])
+            if not rows:
+                return copied
+            sharding.copy_references(
+                target, User, [row['author_id'] for row in rows]
+            )
+            if model is Post:
+                sharding.copy_references(
+                    target, Group, [row['group_id'] for row in rows]
+                )
+            with transaction.atomic(using=target):
+                model.objects.using(target).bulk_create(
+                    [model(**row) for row in rows], ignore_conflicts=True,
+                )
+            copied += len(rows)
+            last_id = rows[-1]['id']
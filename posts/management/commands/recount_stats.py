@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount_comments, recount_stats
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики подписчиков, подписок, записей '
+            'и комментариев.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            profiles = recount_stats()
+            posts = recount_comments()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано профилей: {profiles}, постов: {posts}'
+        ))
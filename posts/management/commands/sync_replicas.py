@@ -0,0 +1,28 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик. Для разработки: '
+            'реплики отстают ровно до следующего запуска.')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Реплики копируются только для SQLite, '
+                               'другие базы реплицирует сам сервер.')
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            connections[alias].close()
+            replica = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                primary.connection.backup(replica)
+            finally:
+                replica.close()
+            self.stdout.write(f'{alias}: скопировано')
+        self.stdout.write(self.style.SUCCESS(
+            f'Реплик обновлено: {len(settings.DATABASE_REPLICAS)}'
+        ))
@@ -0,0 +1,51 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt')
+
+
+def template_names(engine):
+    """Имена всех шаблонов в каталогах загрузчиков движка."""
+    names = set()
+    for loader in engine.template_loaders:
+        # Кеширующий загрузчик ищет шаблоны своими вложенными.
+        for source in getattr(loader, 'loaders', [loader]):
+            for directory in source.get_dirs():
+                for root, _, files in os.walk(directory):
+                    names.update(
+                        os.path.relpath(os.path.join(root, file),
+                                        directory).replace(os.sep, '/')
+                        for file in files
+                        if file.endswith(TEMPLATE_EXTENSIONS)
+                    )
+    return sorted(names)
+
+
+class Command(BaseCommand):
+    help = ('Компилирует все шаблоны заранее и проверяет их синтаксис. '
+            'С кеширующим загрузчиком они остаются в памяти процесса.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count, errors = 0, []
+        for backend in engines.all():
+            if not isinstance(backend, DjangoTemplates):
+                continue
+            for name in template_names(backend.engine):
+                try:
+                    backend.engine.get_template(name)
+                except TemplateSyntaxError as error:
+                    errors.append(f'{name}: {error}')
+                count += 1
+        for error in errors:
+            self.stderr.write(error)
+        if errors:
+            raise CommandError(f'Шаблонов с ошибками: {len(errors)}')
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Шаблонов: {count} за {time.perf_counter() - started:.2f} с'
+            ))
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-18 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail',
+            field=models.CharField(blank=True, editable=False, help_text='Путь к готовой миниатюре картинки', max_length=255, verbose_name='Миниатюра'),
+        ),
+    ]
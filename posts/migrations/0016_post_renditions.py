@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-18 20:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Форматы, ширины и пути копий картинки', verbose_name='Адаптивные копии'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.1.7 on 2026-10-18 20:19
+
+from django.db import migrations
+
+from posts.stemmer import stem_text
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX posts_post_text_search ON posts_post "
+            "USING gin (to_tsvector('russian', text))"
+        )
+        return
+    if connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE posts_search USING fts5("
+        "stems, post_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+    )
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    rows = [
+        (2 * pk, stem_text(text), pk)
+        for pk, text in Post.objects.values_list('pk', 'text').iterator()
+    ] + [
+        (2 * pk + 1, stem_text(text), post_id)
+        for pk, text, post_id in Comment.objects.values_list(
+            'pk', 'text', 'post_id'
+        ).iterator()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO posts_search (rowid, stems, post_id) '
+            'VALUES (%s, %s, %s)',
+            rows,
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX posts_post_text_search')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.1.7 on 2026-10-18 20:44
+
+from django.db import migrations
+from django.db.models import Count, F, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('user')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    ), 0)
+
+
+def remove_duplicates(apps, schema_editor):
+    """Удаляет повторные подписки и подписки на себя перед ограничениями."""
+    Follow = apps.get_model('posts', 'Follow')
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    ProfileStats = apps.get_model('posts', 'ProfileStats')
+    affected = set()
+    self_follows = Follow.objects.filter(user=F('author'))
+    affected.update(self_follows.values_list('user_id', flat=True))
+    self_follows.delete()
+    FeedEntry.objects.filter(user=F('author')).delete()
+    duplicates = (
+        Follow.objects.order_by().values('user', 'author')
+        .annotate(first=Min('pk'), count=Count('pk'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        Follow.objects.filter(
+            user=duplicate['user'], author=duplicate['author'],
+        ).exclude(pk=duplicate['first']).delete()
+        affected.update((duplicate['user'], duplicate['author']))
+    ProfileStats.objects.filter(user__in=affected).update(
+        followers_count=count_subquery(Follow.objects, 'author'),
+        following_count=count_subquery(Follow.objects, 'user'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.1.7 on 2026-10-18 20:47
+
+from django.db import migrations, models
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Cast, LPad
+import django.db.models.deletion
+
+# Как в posts/comments.py: корень ветки хранит дополнение id до 10**10.
+ROOT_BASE = 10 ** 10
+WIDTH = 10
+
+
+def fill_paths(apps, schema_editor):
+    """Все прежние комментарии становятся корнями своих веток."""
+    Comment = apps.get_model('posts', 'Comment')
+    Comment.objects.filter(path='').update(path=LPad(
+        Cast(Value(ROOT_BASE) - F('pk'), CharField()), WIDTH, Value('0'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_follow_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.comment', verbose_name='Ответ на'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, help_text='Материализованный путь, см. posts/comments.py', max_length=255, verbose_name='Путь в ветке'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.1.7 on 2026-10-18 21:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_comment_threads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardBucket',
+            fields=[
+                ('bucket', models.PositiveIntegerField(primary_key=True, serialize=False, verbose_name='Корзина')),
+                ('database', models.CharField(max_length=100, verbose_name='База')),
+            ],
+            options={
+                'verbose_name': 'Корзина шардов',
+                'verbose_name_plural': 'Корзины шардов',
+            },
+        ),
+        migrations.CreateModel(
+            name='ShardSequence',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Таблица')),
+                ('value', models.BigIntegerField(verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Последовательность id',
+                'verbose_name_plural': 'Последовательности id',
+            },
+        ),
+    ]
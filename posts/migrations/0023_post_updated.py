@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-18 21:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, help_text='Время последнего изменения, по нему кешируется карточка', verbose_name='Изменён'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.1.7 on 2026-10-18 21:58
+
+from django.db import migrations, models
+
+# FEED_FANOUT_LIMIT на момент миграции.
+FANOUT_LIMIT = 1000
+
+
+def mark_celebrities(apps, schema_editor):
+    """Отмечает авторов, которые уже сейчас выше границы раскладки."""
+    ProfileStats = apps.get_model('posts', 'ProfileStats')
+    ProfileStats.objects.filter(followers_count__gt=FANOUT_LIMIT).update(
+        celebrity=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_post_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profilestats',
+            name='celebrity',
+            field=models.BooleanField(default=False, help_text='Посты автора не раскладываются по лентам подписчиков', verbose_name='Популярный автор'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def create_comment_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX posts_comment_text_search ON posts_comment "
+            "USING gin (to_tsvector('russian', text))"
+        )
+
+
+def drop_comment_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX posts_comment_text_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_profilestats_celebrity'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_comment_index, drop_comment_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-18 22:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_comment_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profilestats',
+            name='celebrity',
+            field=models.BooleanField(db_index=True, default=False, help_text='Посты автора не раскладываются по лентам подписчиков', verbose_name='Популярный автор'),
+        ),
+    ]
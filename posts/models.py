@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
 from django.db import models
 
 
@@ -37,6 +38,16 @@ class Group(models.Model):
         verbose_name_plural = 'Группы'
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для списков: автор и группа в том же запросе."""
+        return self.select_related('author', 'group').only(
+            'text', 'pub_date', 'image', 'thumbnail', 'renditions',
+            'comment_count', 'updated',
+            'author__username', 'group__title', 'group__slug',
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст',
@@ -47,6 +58,11 @@ class Post(models.Model):
         verbose_name='Дата',
         help_text='Дата публикации поста',
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменён',
+        help_text='Время последнего изменения, по нему кешируется карточка',
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -68,6 +84,48 @@ class Post(models.Model):
         blank=True,
         null=True,
     )
+    thumbnail = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра',
+        help_text='Путь к готовой миниатюре картинки',
+    )
+    renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Адаптивные копии',
+        help_text='Форматы, ширины и пути копий картинки',
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев',
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    # Счётчики меняются только выражениями F(), а сохранение поста
+    # записало бы поверх них значения, прочитанные вместе с постом.
+    COUNTER_FIELDS = ('comment_count',)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def thumbnail_url(self):
+        """Миниатюра, а пока она не готова - исходная картинка."""
+        if self.thumbnail:
+            return default_storage.url(self.thumbnail)
+        return self.image.url if self.image else ''
 
     def __str__(self):
         pub_date = self.pub_date.strftime('%d.%m.%Y %H:%M')
@@ -82,6 +140,15 @@ class Post(models.Model):
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ('-pub_date', )
+        # Списки постов идут по (дата, id), в том числе по курсору.
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         name='post_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=('group', '-pub_date', '-id'),
+                         name='post_group_pub_date_idx'),
+        )
 
 
 class Comment(models.Model):
@@ -105,11 +172,37 @@ class Comment(models.Model):
         auto_now_add=True,
         verbose_name='Дата',
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='replies',
+        verbose_name='Ответ на',
+    )
+    path = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name='Путь в ветке',
+        help_text='Материализованный путь, см. posts/comments.py',
+    )
+
+    @property
+    def depth(self):
+        return self.path.count('/')
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('-created',)
+        indexes = (
+            models.Index(fields=('post', '-created'),
+                         name='comment_post_created_idx'),
+            # Страницы комментариев и поддеревья веток - диапазоны пути.
+            models.Index(fields=('post', 'path'),
+                         name='comment_post_path_idx'),
+        )
 
 
 class Follow(models.Model):
@@ -123,3 +216,123 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following',
     )
+
+    class Meta:
+        constraints = (
+            # Уникальный индекс заодно ускоряет поиск подписки.
+            models.UniqueConstraint(fields=('user', 'author'),
+                                    name='follow_unique_user_author'),
+            models.CheckConstraint(check=~models.Q(user=models.F('author')),
+                                   name='follow_not_self'),
+        )
+
+
+class ProfileStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Записей',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок',
+    )
+    celebrity = models.BooleanField(
+        default=False,
+        db_index=True,
+        verbose_name='Популярный автор',
+        help_text='Посты автора не раскладываются по лентам подписчиков',
+    )
+
+    def __str__(self):
+        return str(self.user)
+
+    class Meta:
+        verbose_name = 'Статистика профиля'
+        verbose_name_plural = 'Статистика профилей'
+        # По нему лента находит популярных авторов.
+        indexes = (
+            models.Index(fields=('followers_count',),
+                         name='stats_followers_count_idx'),
+        )
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('user', '-pub_date', '-post'),
+                         name='feed_user_pub_date_idx'),
+            models.Index(fields=('user', 'author'),
+                         name='feed_user_author_idx'),
+        )
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='feed_unique_user_post'),
+        )
+
+
+class ShardBucket(models.Model):
+    """Шард корзины авторов. Корзины без строки живут в основной базе."""
+    bucket = models.PositiveIntegerField(
+        primary_key=True,
+        verbose_name='Корзина',
+    )
+    database = models.CharField(
+        max_length=100,
+        verbose_name='База',
+    )
+
+    class Meta:
+        verbose_name = 'Корзина шардов'
+        verbose_name_plural = 'Корзины шардов'
+
+
+class ShardSequence(models.Model):
+    """Последний выданный id постов или комментариев во всех шардах."""
+    name = models.CharField(
+        max_length=100,
+        primary_key=True,
+        verbose_name='Таблица',
+    )
+    value = models.BigIntegerField(
+        verbose_name='Значение',
+    )
+
+    class Meta:
+        verbose_name = 'Последовательность id'
+        verbose_name_plural = 'Последовательности id'
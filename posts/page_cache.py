@@ -0,0 +1,153 @@
+"""Кеш целых страниц с «дырами» под данные посетителя.
+
+Страница отрисовывается один раз как для гостя, но вместо личных
+кусочков (меню пользователя, кнопки редактирования и подписки) в неё
+попадают метки дыр. Эта заготовка хранится в кеше по адресу и поколениям
+областей страницы. Каждому посетителю дыры заполняются маленькими
+шаблонами из HOLES, без отрисовки всей страницы.
+
+Гостям без сессии готовая страница отдаётся ещё раньше, из
+AnonymousPageCacheMiddleware: до сессий, аутентификации и представления.
+Записи сбрасываются сами, когда записи постов, комментариев и подписок
+увеличивают поколения областей (см. posts/caching.py).
+"""
+import hashlib
+import json
+import re
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from django.utils.safestring import mark_safe
+
+from .caching import get_generations
+from .models import Follow
+from .settings import PAGE_CACHE_TIMEOUT
+
+SKELETON_KEY = 'posts:page:skeleton:{}'
+ANONYMOUS_KEY = 'posts:page:anonymous:{}'
+HOLE_RE = re.compile(r'<!--hole:([\w-]+):(\{.*?\})-->')
+
+
+def follow_context(request, author_id, **params):
+    user = request.user
+    return {'following': user.is_authenticated and user.pk != author_id
+            and Follow.objects.filter(user=user,
+                                      author_id=author_id).exists()}
+
+
+# Шаблон дыры и функция с дополнительным контекстом для него.
+HOLES = {
+    'nav': ('holes/nav.html', None),
+    'menu': ('holes/menu.html', None),
+    'post-actions': ('holes/post-actions.html', None),
+    'follow': ('holes/follow.html', follow_context),
+}
+
+
+def hole_marker(name, params):
+    return mark_safe(f'<!--hole:{name}:{json.dumps(params)}-->')
+
+
+def render_hole(request, name, params):
+    template_name, get_context = HOLES[name]
+    context = dict(params)
+    if get_context:
+        context.update(get_context(request, **params))
+    return render_to_string(template_name, context, request=request)
+
+
+def fill_holes(request, skeleton):
+    """Заполняет дыры заготовки для посетителя, одинаковые - один раз."""
+    rendered = {}
+
+    def fill(match):
+        if match.group(0) not in rendered:
+            rendered[match.group(0)] = render_hole(
+                request, match.group(1), json.loads(match.group(2))
+            )
+        return rendered[match.group(0)]
+    return HOLE_RE.sub(fill, skeleton)
+
+
+def path_hash(request, *parts):
+    key = ':'.join(map(str, (request.get_full_path(), *parts)))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def render_skeleton(request, template_name, get_context):
+    """Страница с метками дыр, отрисованная как для гостя."""
+    user = request.user
+    request.user = AnonymousUser()
+    try:
+        return render(request, template_name,
+                      {**get_context(), 'punch_holes': True})
+    finally:
+        request.user = user
+
+
+def render_page(request, scopes, template_name, get_context):
+    """Страница из заготовки в кеше или заново, с дырами посетителя."""
+    generations = get_generations(*scopes)
+    key = SKELETON_KEY.format(path_hash(request, *generations))
+    rendered = []
+
+    def render_content():
+        rendered.append(render_skeleton(request, template_name, get_context))
+        return rendered[0].content.decode()
+    # Заготовку одного адреса при промахе отрисовывает один воркер.
+    skeleton = cache.get_or_set(key, render_content, PAGE_CACHE_TIMEOUT)
+    response = rendered[0] if rendered else HttpResponse()
+    response.content = fill_holes(request, skeleton)
+    if not request.user.is_authenticated:
+        response.page_cache = {'scopes': scopes, 'generations': generations}
+    return response
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдаёт гостям без сессии готовые страницы из кеша.
+
+    Стоит до SessionMiddleware. Страница сохраняется на обратном пути,
+    уже со всеми заголовками, если представление пометило её атрибутом
+    page_cache и не ставит cookie.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (request.method not in ('GET', 'HEAD')
+                or settings.SESSION_COOKIE_NAME in request.COOKIES):
+            return self.get_response(request)
+        key = ANONYMOUS_KEY.format(path_hash(request))
+        entry = cache.get(key)
+        if entry and get_generations(*entry['scopes']) == entry['generations']:
+            return self.cached_response(request, entry)
+        response = self.get_response(request)
+        page_cache = getattr(response, 'page_cache', None)
+        if (page_cache and request.method == 'GET'
+                and response.status_code == 200 and not response.cookies):
+            cache.set(key, {
+                **page_cache,
+                'content': response.content,
+                'headers': dict(response.items()),
+            }, PAGE_CACHE_TIMEOUT)
+        return response
+
+    def cached_response(self, request, entry):
+        response = HttpResponse(entry['content'])
+        for header, value in entry['headers'].items():
+            response[header] = value
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')
+            ),
+            response=response,
+        )
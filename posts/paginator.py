@@ -0,0 +1,137 @@
+import base64
+import binascii
+import datetime as dt
+import heapq
+import itertools
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+from .settings import POSTS_PER_PAGE
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (дата, id) без COUNT и OFFSET.
+
+    Курсор - непрозрачная строка с датой и id крайней записи страницы.
+    Обычный вывод по номерам страниц через get_page() тоже работает.
+    Если заданы части parts, страница по курсору собирается слиянием
+    их отдельных запросов, каждый из которых идёт по своему индексу.
+    """
+
+    def __init__(self, object_list, per_page, key=('pub_date', 'pk'),
+                 parts=None):
+        super().__init__(object_list, per_page)
+        self.date_field, self.id_field = key
+        self.parts = parts or [object_list]
+
+    def item_key(self, item):
+        return getattr(item, self.date_field), getattr(item, self.id_field)
+
+    def merge(self, parts, reverse):
+        """Сливает упорядоченные части, пропуская повторы записей."""
+        if len(parts) == 1:
+            return parts[0]
+        items, last_key = [], None
+        for item in heapq.merge(*parts, key=self.item_key, reverse=reverse):
+            if self.item_key(item) != last_key:
+                items.append(item)
+                last_key = self.item_key(item)
+        return items
+
+    def get_items(self, items, after, before):
+        date_field, id_field = self.date_field, self.id_field
+        if before:
+            date, pk = before
+            items = items.filter(
+                Q(**{f'{date_field}__gt': date})
+                | Q(**{date_field: date, f'{id_field}__gt': pk})
+            ).order_by(date_field, id_field)
+        else:
+            items = items.order_by(f'-{date_field}', f'-{id_field}')
+            if after:
+                date, pk = after
+                items = items.filter(
+                    Q(**{f'{date_field}__lt': date})
+                    | Q(**{date_field: date, f'{id_field}__lt': pk})
+                )
+        return list(items[:self.per_page + 1])
+
+    def encode_cursor(self, item):
+        value = (f'{getattr(item, self.date_field).isoformat()}'
+                 f'|{getattr(item, self.id_field)}')
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            value = base64.urlsafe_b64decode(cursor.encode()).decode()
+            date, pk = value.split('|')
+            return dt.datetime.fromisoformat(date), int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            return None
+
+    def get_cursor_page(self, after=None, before=None):
+        """Страница записей старше курсора after или новее курсора before."""
+        after = after and self.decode_cursor(after)
+        before = not after and before and self.decode_cursor(before)
+        items = self.merge(
+            [self.get_items(part, after, before) for part in self.parts],
+            reverse=not before,
+        )[:self.per_page + 1]
+        has_more = len(items) > self.per_page
+        if before and not has_more:
+            return self.get_cursor_page()
+        items = items[:self.per_page]
+        if before:
+            items.reverse()
+        page = Page(items, 1 if not (after or before) else None, self)
+        page.cursor_mode = True
+        page.previous_cursor = None
+        page.next_cursor = None
+        if items and (after or before):
+            page.previous_cursor = self.encode_cursor(items[0])
+        if items and (before or has_more):
+            page.next_cursor = self.encode_cursor(items[-1])
+        return page
+
+
+class MergedList:
+    """Упорядоченные части как один список для вывода по номерам страниц.
+
+    Длина - сумма COUNT частей, срез - слияние первых записей каждой
+    части, так что дальняя страница читает из каждой части все записи
+    до своего конца.
+    """
+
+    def __init__(self, parts, key=('pub_date', 'pk')):
+        self.parts = parts
+        self.key = key
+
+    def count(self):
+        return sum(part.count() for part in self.parts)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        order = [f'-{field}' for field in self.key]
+        items = heapq.merge(
+            *(part.order_by(*order)[:index.stop] for part in self.parts),
+            key=lambda item: tuple(getattr(item, field)
+                                   for field in self.key),
+            reverse=True,
+        )
+        return list(itertools.islice(items, index.start, index.stop))
+
+
+def paginate(request, object_list, key=('pub_date', 'pk'), parts=None):
+    """Страница из GET-параметров after/before или page."""
+    paginator = CursorPaginator(object_list, POSTS_PER_PAGE, key=key,
+                                parts=parts)
+    if 'page' in request.GET:
+        page = paginator.get_page(request.GET['page'])
+        page.cursor_mode = False
+        return page
+    return paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
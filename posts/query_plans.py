@@ -0,0 +1,64 @@
+"""Разбор планов запросов SQLite.
+
+Запросы страниц перехватываются через execute_wrapper, для каждого
+SELECT выполняется EXPLAIN QUERY PLAN. Плохими считаются полный
+просмотр таблицы и сортировка во временном B-дереве: на больших
+таблицах оба растут вместе с числом строк.
+"""
+from contextlib import contextmanager
+
+from django.db import connection
+
+FULL_SCAN = 'полный просмотр таблицы'
+TEMP_SORT = 'сортировка без индекса'
+
+
+@contextmanager
+def capture_selects():
+    """Собирает пары (sql, params) всех SELECT внутри блока."""
+    queries = []
+
+    def wrapper(execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield queries
+
+
+def explain(sql, params=()):
+    """Строки плана запроса, как их выводит EXPLAIN QUERY PLAN."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan, limited=False):
+    """Проблемы плана запроса.
+
+    Просмотр по индексу без условия допустим только в запросе с LIMIT:
+    он идёт в порядке индекса и останавливается на первых строках.
+    """
+    problems = []
+    for detail in plan:
+        # В старых версиях SQLite - «SCAN TABLE name».
+        scan = detail.startswith('SCAN ') and not any(
+            word in detail for word in
+            ('VIRTUAL TABLE', 'CONSTANT ROW', 'SUBQUERY')
+        )
+        if scan and not (limited and ' USING ' in detail):
+            problems.append(f'{FULL_SCAN}: {detail}')
+        elif 'USE TEMP B-TREE' in detail:
+            problems.append(f'{TEMP_SORT}: {detail}')
+    return problems
+
+
+def query_problems(queries):
+    """Проблемы планов, по одному разу на каждый вид запроса."""
+    found = {}
+    for sql, params in queries:
+        if sql not in found:
+            found[sql] = plan_problems(explain(sql, params),
+                                       limited=' LIMIT ' in sql)
+    return {sql: problems for sql, problems in found.items() if problems}
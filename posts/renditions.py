@@ -0,0 +1,78 @@
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .settings import (RENDITION_ASPECT, RENDITION_FORMATS, RENDITION_QUALITY,
+                       RENDITION_WIDTHS)
+
+FORMATS = {
+    'avif': ('AVIF', 'image/avif'),
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+
+def supported_formats():
+    Image.init()
+    return [fmt for fmt in RENDITION_FORMATS if FORMATS[fmt][0] in Image.SAVE]
+
+
+def get_widths(source_width):
+    # Маленькие картинки не растягиваем до всех ширин.
+    widths = [width for width in RENDITION_WIDTHS if width <= source_width]
+    return widths or [min(RENDITION_WIDTHS)]
+
+
+def make_renditions(post):
+    """Сохраняет копии картинки поста и возвращает их описание для БД.
+
+    Картинка обрезается по центру под пропорции карточки, затем для
+    каждого формата сохраняются копии нескольких ширин.
+    """
+    with post.image.open('rb') as image_file:
+        image = Image.open(image_file)
+        image.load()
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    aspect_width, aspect_height = RENDITION_ASPECT
+    widths = get_widths(image.width)
+    cropped = ImageOps.fit(
+        image,
+        (max(widths), round(max(widths) * aspect_height / aspect_width)),
+        method=Image.LANCZOS,
+    )
+    renditions = {}
+    for fmt in supported_formats():
+        pil_format, _ = FORMATS[fmt]
+        renditions[fmt] = []
+        for width in widths:
+            height = round(width * aspect_height / aspect_width)
+            buffer = BytesIO()
+            cropped.resize((width, height), Image.LANCZOS).save(
+                buffer, pil_format, quality=RENDITION_QUALITY
+            )
+            name = default_storage.save(
+                f'posts/renditions/{post.pk}/{width}.{fmt}',
+                ContentFile(buffer.getvalue()),
+            )
+            renditions[fmt].append({
+                'width': width,
+                'height': height,
+                'name': name,
+                'size': buffer.tell(),
+            })
+    return renditions
+
+
+def delete_renditions(renditions):
+    for items in renditions.values():
+        for item in items:
+            default_storage.delete(item['name'])
+
+
+def srcset(items):
+    return ', '.join(
+        f"{default_storage.url(item['name'])} {item['width']}w"
+        for item in items
+    )
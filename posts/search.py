@@ -0,0 +1,207 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Бэкенд выбирается по базе данных: SQLite FTS5 или tsvector PostgreSQL,
+либо явно через SEARCH_BACKEND в posts/settings.py. Результаты
+упорядочены по релевантности и выдаются постранично по курсору
+(релевантность, id поста).
+"""
+import base64
+import binascii
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from . import sharding
+from .models import Comment, Post
+from .settings import POSTS_PER_PAGE, SEARCH_BACKEND
+from .stemmer import WORD_RE, stem, stem_text
+
+FTS_TABLE = 'posts_search'
+
+
+def encode_cursor(rank, post_id):
+    return base64.urlsafe_b64encode(f'{rank!r}|{post_id}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        rank, post_id = base64.urlsafe_b64decode(
+            cursor.encode()
+        ).decode().split('|')
+        return float(rank), int(post_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+
+class SearchBackend:
+    def index_post(self, post):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def index_comment(self, comment):
+        pass
+
+    def remove_comment(self, comment_id):
+        pass
+
+    def ranked_ids(self, query, after=None, limit=POSTS_PER_PAGE):
+        """Список пар (релевантность, id поста), лучшие первыми."""
+        raise NotImplementedError
+
+    def clear(self):
+        pass
+
+    def rebuild(self):
+        """Заново индексирует все посты и комментарии."""
+        self.clear()
+        for post in Post.objects.only('text').iterator():
+            self.index_post(post)
+        for comment in Comment.objects.only('text', 'post').iterator():
+            self.index_comment(comment)
+
+    def search(self, query, after=None, limit=POSTS_PER_PAGE):
+        """Посты по запросу и курсор следующей страницы."""
+        after = after and decode_cursor(after)
+        if not WORD_RE.search(query):
+            return [], None
+        ranked = self.ranked_ids(query, after or None, limit + 1)
+        next_cursor = None
+        if len(ranked) > limit:
+            ranked = ranked[:limit]
+            next_cursor = encode_cursor(*ranked[-1])
+        posts = sharding.in_bulk(Post.objects.for_feed(),
+                                 [post_id for _, post_id in ranked])
+        return ([posts[post_id] for _, post_id in ranked
+                 if post_id in posts], next_cursor)
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """FTS5 с ранжированием bm25.
+
+    В индексе хранятся основы слов, запрос тоже приводится к основам и
+    ищется по префиксу. Строка поста хранится под rowid 2 * id,
+    комментария - под 2 * id + 1.
+    """
+
+    def _replace(self, rowid, post_id, text):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [rowid])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, stems, post_id) '
+                f'VALUES (%s, %s, %s)',
+                [rowid, stem_text(text), post_id],
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def _delete(self, rowid):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [rowid])
+
+    def index_post(self, post):
+        self._replace(2 * post.pk, post.pk, post.text)
+
+    def remove_post(self, post_id):
+        self._delete(2 * post_id)
+
+    def index_comment(self, comment):
+        self._replace(2 * comment.pk + 1, comment.post_id, comment.text)
+
+    def remove_comment(self, comment_id):
+        self._delete(2 * comment_id + 1)
+
+    @staticmethod
+    def match_expression(query):
+        return ' '.join(f'"{stem(word)}"*' for word in WORD_RE.findall(query))
+
+    def ranked_ids(self, query, after=None, limit=POSTS_PER_PAGE):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        having, params = '', [expression]
+        if after:
+            rank, post_id = after
+            having = ('HAVING MIN(rank) > %s '
+                      'OR (MIN(rank) = %s AND post_id > %s)')
+            params += [rank, rank, post_id]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT MIN(rank) AS score, post_id FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s GROUP BY post_id {having} '
+                f'ORDER BY score, post_id LIMIT %s',
+                params + [limit],
+            )
+            return cursor.fetchall()
+
+
+class PostgresBackend(SearchBackend):
+    """Поиск по tsvector с русской конфигурацией словаря.
+
+    Посты и комментарии ищутся отдельно, каждый по своему GIN-индексу
+    to_tsvector('russian', text): выражение в запросе должно совпадать
+    с выражением индекса. Как и в SQLite, у поста берётся лучший ранг
+    из его текста и комментариев, ранг комментария весит меньше.
+    """
+
+    COMMENT_WEIGHT = 0.4
+
+    def ranked_ids(self, query, after=None, limit=POSTS_PER_PAGE):
+        having, params = '', [query, self.COMMENT_WEIGHT, query]
+        if after:
+            rank, post_id = after
+            having = ('HAVING MIN(score) > %s '
+                      'OR (MIN(score) = %s AND post_id > %s)')
+            params += [rank, rank, post_id]
+        # Ранг со знаком минус, чтобы порядок совпадал с bm25 в SQLite.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT MIN(score) AS score, post_id FROM ('
+                f"SELECT -ts_rank(to_tsvector('russian', text), q)"
+                f'::double precision AS score, id AS post_id '
+                f'FROM {Post._meta.db_table}, '
+                f"websearch_to_tsquery('russian', %s) q "
+                f"WHERE to_tsvector('russian', text) @@ q "
+                f'UNION ALL '
+                f"SELECT -ts_rank(to_tsvector('russian', text), q)"
+                f'::double precision * %s, post_id '
+                f'FROM {Comment._meta.db_table}, '
+                f"websearch_to_tsquery('russian', %s) q "
+                f"WHERE to_tsvector('russian', text) @@ q"
+                f') found GROUP BY post_id {having} '
+                f'ORDER BY score, post_id LIMIT %s',
+                params + [limit],
+            )
+            return cursor.fetchall()
+
+
+class LikeBackend(SearchBackend):
+    """Запасной вариант для других баз: поиск вхождения без ранжирования."""
+
+    def ranked_ids(self, query, after=None, limit=POSTS_PER_PAGE):
+        condition = Q()
+        for word in WORD_RE.findall(query):
+            condition &= (Q(text__icontains=word)
+                          | Q(comments__text__icontains=word))
+        posts = Post.objects.filter(condition)
+        if after:
+            posts = posts.filter(pk__gt=after[1])
+        return [(0.0, post_id) for post_id in
+                posts.order_by('pk').values_list('pk', flat=True)
+                .distinct()[:limit]]
+
+
+def get_backend():
+    if SEARCH_BACKEND:
+        return import_string(SEARCH_BACKEND)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTSBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresBackend()
+    return LikeBackend()
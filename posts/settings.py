@@ -1 +1,61 @@
 POSTS_PER_PAGE = 10
+# Авторы с большим числом подписчиков не рассылают посты по лентам,
+# их записи подмешиваются в ленту при чтении.
+FEED_FANOUT_LIMIT = 1000
+# Популярный автор снова рассылает посты, только когда подписчиков
+# становится меньше этого числа: колебания у границы не гоняют туда и
+# обратно раскладку его постов по лентам.
+FEED_FANOUT_RESUME_LIMIT = 900
+# Сколько записей ленты вставляется за раз, когда посты автора
+# раскладываются по лентам всех его подписчиков.
+FEED_FANOUT_BATCH_SIZE = 1000
+# Сколько последних постов автора попадает в ленту при подписке.
+FEED_BACKFILL_SIZE = 100
+# Сколько авторов можно подписать или отписать одним запросом.
+FOLLOW_BULK_LIMIT = 100
+# Комментарии под постом выдаются страницами по курсору.
+COMMENTS_PER_PAGE = 20
+# Глубже ответы не вкладываются, а становятся соседями родителя.
+COMMENT_MAX_DEPTH = 5
+# Сколько секунд кешируется список популярных авторов.
+FEED_CELEBRITIES_TIMEOUT = 60
+# Время жизни готовых страниц в кеше. Они сбрасываются при записи,
+# поэтому могут жить долго.
+PAGE_CACHE_TIMEOUT = 60 * 60
+# Сколько секунд прокси могут отдавать анонимные страницы из своего кеша.
+# Браузеры проверяют страницы каждый раз по ETag.
+PAGE_EDGE_MAX_AGE = 10
+# Миниатюры картинок постов готовятся в фоне после сохранения.
+THUMBNAIL_GEOMETRY = '960x339'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+THUMBNAIL_WORKERS = 2
+# Адаптивные копии картинок постов: ширины, форматы по убыванию
+# предпочтения (неподдерживаемые Pillow пропускаются) и пропорции карточки.
+RENDITION_WIDTHS = (480, 960, 1920)
+RENDITION_FORMATS = ('avif', 'webp', 'jpeg')
+RENDITION_ASPECT = (960, 339)
+RENDITION_QUALITY = 80
+# Путь к классу поиска; по умолчанию выбирается по базе данных.
+SEARCH_BACKEND = None
+# Сколько строк выгрузки читается из базы и пишется в поток за раз.
+EXPORT_CHUNK_SIZE = 2000
+# Сколько лучших результатов поиска показывать в админке.
+SEARCH_ADMIN_LIMIT = 1000
+# Сколько строк загрузки вставляется одной транзакцией.
+IMPORT_BATCH_SIZE = 1000
+# Сколько найденных авторов, групп и постов загрузка держит в памяти.
+IMPORT_CACHE_SIZE = 100000
+# Авторы делятся на корзины по остатку id, корзины раскладываются по шардам.
+SHARD_BUCKETS = 1024
+# Сколько id постов и комментариев процесс берёт из общей
+# последовательности за раз.
+SHARD_ID_BLOCK = 100
+# Сколько секунд кешируется размещение корзин по шардам.
+SHARD_PLACEMENT_TIMEOUT = 60
+# Сколько записей переносится между шардами одной транзакцией.
+SHARD_MOVE_BATCH_SIZE = 1000
+# Сколько счётчиков постов пересчёт по шардам сохраняет одним запросом.
+RECOUNT_BATCH_SIZE = 1000
+# Время жизни HTML карточек постов. Ключ меняется при правке поста,
+# поэтому карточки могут жить долго.
+CARD_CACHE_TIMEOUT = 24 * 60 * 60
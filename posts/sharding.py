@@ -0,0 +1,273 @@
+"""Шардирование постов и комментариев по автору.
+
+Включается списком баз DATABASE_SHARDS (YATUBE_SHARDS). Пост живёт в
+шарде своего автора, комментарий - в шарде поста, так что профиль, пост
+и ветка его комментариев читаются из одной базы. Авторы разложены по
+SHARD_BUCKETS корзинам по остатку id, корзины по базам - таблицей
+ShardBucket основной базы. Корзина без строки в таблице ещё живёт в
+основной базе: так шардирование включается на работающем сайте, а
+manage.py rebalance_shards переносит корзины и выравнивает их число по
+шардам, в том числе после добавления нового.
+
+Пользователи, группы, подписки и счётчики остаются в основной базе. В
+шард копируются только нужные его записям строки авторов и групп (имя
+и название), так что внешние ключи и JOIN внутри шарда работают как
+раньше. Списки из всех шардов - главная, группа, лента подписок -
+собираются запросом в каждую базу и слиянием упорядоченных частей.
+id постов и комментариев выдаются блоками из ShardSequence и уникальны
+во всех базах.
+"""
+import itertools
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Max
+
+from .models import Comment, Group, Post, ShardBucket, ShardSequence, User
+from .paginator import MergedList
+from .settings import SHARD_BUCKETS, SHARD_ID_BLOCK, SHARD_PLACEMENT_TIMEOUT
+
+PLACEMENT_CACHE_KEY = 'shards:placement'
+# Поля строк, которые копируются в шарды вместе с постами.
+REFERENCES = {
+    User: ('username', 'first_name', 'last_name'),
+    Group: ('title', 'slug', 'description'),
+}
+
+_id_blocks = {}
+_id_lock = threading.Lock()
+
+
+def get_shards():
+    return getattr(settings, 'DATABASE_SHARDS', [])
+
+
+def is_sharded():
+    return bool(get_shards())
+
+
+def get_placement():
+    """Шард каждой перенесённой корзины."""
+    placement = cache.get(PLACEMENT_CACHE_KEY)
+    if placement is None:
+        placement = dict(ShardBucket.objects.using(
+            DEFAULT_DB_ALIAS
+        ).values_list('bucket', 'database'))
+        cache.set(PLACEMENT_CACHE_KEY, placement, SHARD_PLACEMENT_TIMEOUT)
+    return placement
+
+
+def set_placement(buckets, database):
+    """Переключает корзины на шард database."""
+    ShardBucket.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+        [ShardBucket(bucket=bucket, database=database)
+         for bucket in buckets],
+        ignore_conflicts=True,
+    )
+    ShardBucket.objects.using(DEFAULT_DB_ALIAS).filter(
+        bucket__in=buckets
+    ).update(database=database)
+    cache.delete(PLACEMENT_CACHE_KEY)
+
+
+def get_bucket(author_id):
+    return author_id % SHARD_BUCKETS
+
+
+def shard_for(author_id):
+    """База постов автора; без шардов - None, базу выберут роутеры."""
+    if not is_sharded() or author_id is None:
+        return None
+    return get_placement().get(get_bucket(author_id), DEFAULT_DB_ALIAS)
+
+
+def get_databases():
+    """Базы, в которых сейчас есть посты."""
+    if not is_sharded():
+        return [None]
+    placement = get_placement()
+    databases = sorted(set(placement.values()))
+    if len(placement) < SHARD_BUCKETS:
+        databases.insert(0, DEFAULT_DB_ALIAS)
+    return databases
+
+
+def find_db(post_id):
+    """База поста, о котором известен только id."""
+    databases = get_databases()
+    if len(databases) == 1:
+        return databases[0]
+    for database in databases:
+        if Post.objects.using(database).filter(pk=post_id).exists():
+            return database
+    return None
+
+
+def db_of(instance):
+    """База записей пользователя, поста или комментария."""
+    if isinstance(instance, User):
+        return shard_for(instance.pk)
+    if isinstance(instance, Post):
+        return shard_for(instance.author_id)
+    if isinstance(instance, Comment):
+        if Comment.post.is_cached(instance):
+            return db_of(instance.post)
+        return instance._state.db or find_db(instance.post_id)
+    return None
+
+
+def scatter(queryset):
+    """Тот же запрос к каждой базе с постами."""
+    if not is_sharded():
+        return [queryset]
+    return [queryset.using(database) for database in get_databases()]
+
+
+def scatter_list(queryset, key=('pub_date', 'pk')):
+    """Список для вывода по номерам страниц и части для вывода по курсору."""
+    parts = scatter(queryset)
+    return (parts[0] if len(parts) == 1 else MergedList(parts, key)), parts
+
+
+def author_posts(username):
+    """Посты автора по имени, при шардах - из его базы."""
+    if not is_sharded():
+        return Post.objects.filter(author__username=username)
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    return Post.objects.using(shard_for(author_id)).filter(
+        author_id=author_id
+    )
+
+
+def in_bulk(queryset, ids):
+    """Записи по id из всех баз."""
+    found = {}
+    for part in scatter(queryset):
+        found.update(part.in_bulk(ids))
+    return found
+
+
+def max_id(model):
+    return max(
+        model.objects.using(database).aggregate(max_id=Max('pk'))['max_id']
+        or 0
+        for database in [DEFAULT_DB_ALIAS, *get_shards()]
+    )
+
+
+def reserve_ids(model, count):
+    """Забирает count id из общей последовательности, возвращает последний.
+
+    Последовательность начинается с наибольшего id во всех базах.
+    """
+    name = model._meta.db_table
+    sequences = ShardSequence.objects.using(DEFAULT_DB_ALIAS)
+    sequences.get_or_create(name=name, defaults={'value': max_id(model)})
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        sequences.filter(name=name).update(value=F('value') + count)
+        return sequences.get(name=name).value
+
+
+def next_id(model):
+    """id новой записи, уникальный во всех шардах."""
+    with _id_lock:
+        new_id = next(_id_blocks.get(model, iter(())), None)
+        if new_id is None:
+            last = reserve_ids(model, SHARD_ID_BLOCK)
+            _id_blocks[model] = iter(range(last - SHARD_ID_BLOCK + 1,
+                                           last + 1))
+            new_id = next(_id_blocks[model])
+        return new_id
+
+
+def copy_references(database, model, ids):
+    """Копирует в шард строки авторов или групп для его записей."""
+    if database in (None, DEFAULT_DB_ALIAS):
+        return
+    keys = {pk: f'shards:{database}:{model._meta.model_name}:{pk}'
+            for pk in set(ids) if pk}
+    copied = cache.get_many(keys.values())
+    missing = [pk for pk, key in keys.items() if key not in copied]
+    if not missing:
+        return
+    model.objects.using(database).bulk_create(
+        [model(**row) for row in model.objects.using(DEFAULT_DB_ALIAS)
+         .filter(pk__in=missing).values('pk', *REFERENCES[model])],
+        ignore_conflicts=True,
+    )
+    cache.set_many({keys[pk]: True for pk in missing})
+
+
+def update_references(instance, update_fields=None):
+    """Обновляет копии автора или группы в шардах."""
+    fields = REFERENCES[type(instance)]
+    if update_fields is not None:
+        fields = [field for field in fields if field in update_fields]
+    if not fields:
+        return
+    for database in get_shards():
+        type(instance).objects.using(database).filter(
+            pk=instance.pk
+        ).update(**{field: getattr(instance, field) for field in fields})
+
+
+def prepare(instance):
+    """id и строки-ссылки для поста или комментария перед сохранением."""
+    if instance.pk is None:
+        instance.pk = next_id(type(instance))
+    database = db_of(instance)
+    if isinstance(instance, Post):
+        copy_references(database, User, [instance.author_id])
+        copy_references(database, Group, [instance.group_id])
+    else:
+        copy_references(database, User, [instance.author_id])
+
+
+def plan_placement(placement, shards):
+    """Поровну корзин на каждый шард при наименьшем числе переносов."""
+    quotas = {
+        shard: SHARD_BUCKETS // len(shards)
+        + (number < SHARD_BUCKETS % len(shards))
+        for number, shard in enumerate(shards)
+    }
+    target, spare = {}, []
+    for bucket in range(SHARD_BUCKETS):
+        shard = placement.get(bucket)
+        if quotas.get(shard, 0):
+            target[bucket] = shard
+            quotas[shard] -= 1
+        else:
+            spare.append(bucket)
+    free = itertools.chain.from_iterable(
+        itertools.repeat(shard, quota) for shard, quota in quotas.items()
+    )
+    target.update(zip(spare, free))
+    return target
+
+
+class ShardRouter:
+    """Посты и комментарии - в базу автора, остальное решают другие роутеры.
+
+    Без подсказки instance (Post.objects.filter(...)) запрос идёт в
+    основную базу; списки по всем шардам собирает scatter().
+    """
+
+    def db_for_read(self, model, **hints):
+        if (model in (Post, Comment) and 'instance' in hints
+                and is_sharded()):
+            return db_of(hints['instance'])
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_migrate(self, db, app_label, **hints):
+        # У шардов та же схема, что и у основной базы. Миграции данных
+        # (RunPython без model_name) на шардах не нужны: шард создаётся
+        # пустым, а записи в него копирует rebalance_shards уже готовыми.
+        if db in get_shards():
+            return 'model_name' in hints
+        return None
@@ -0,0 +1,102 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import caching, comments, counters, feed, follows, sharding
+from .search import get_backend
+from .models import Comment, Follow, Group, Post, ProfileStats, User
+
+
+def comment_scopes(comment):
+    post = Post.objects.using(comment._state.db).filter(
+        pk=comment.post_id
+    ).only(
+        'author', 'group'
+    ).first()
+    # Пост удаляется вместе с комментариями и сбросит кеш сам.
+    return caching.post_scopes(post) if post else []
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ProfileStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Group)
+def reference_changed(sender, instance, created, raw=False,
+                      update_fields=None, **kwargs):
+    if not created and not raw and sharding.is_sharded():
+        sharding.update_references(instance, update_fields)
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        # Пост мог уйти из прежней группы или от прежнего автора.
+        old_post = Post.objects.using(sharding.db_of(instance)).filter(
+            pk=instance.pk
+        ).only('author', 'group').first()
+        if old_post:
+            caching.bump(*caching.post_scopes(old_post))
+    if not raw and sharding.is_sharded():
+        sharding.prepare(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    caching.bump(*caching.post_scopes(instance))
+    get_backend().index_post(instance)
+    if created:
+        counters.change_stats(instance.author_id, posts_count=1)
+        feed.fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    caching.bump(*caching.post_scopes(instance))
+    get_backend().remove_post(instance.pk)
+    counters.change_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(pre_save, sender=Comment)
+def comment_changing(sender, instance, raw=False, **kwargs):
+    if not raw and sharding.is_sharded():
+        sharding.prepare(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and not instance.path:
+        comments.assign_path(instance)
+    caching.bump(*comment_scopes(instance))
+    get_backend().index_comment(instance)
+    if created:
+        counters.change_comment_count(instance.post_id, 1,
+                                      using=instance._state.db)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    caching.bump(*comment_scopes(instance))
+    get_backend().remove_comment(instance.pk)
+    counters.change_comment_count(instance.post_id, -1,
+                                  using=instance._state.db)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # Название группы есть в карточках постов на всех страницах.
+    caching.bump('global')
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        follows.followed(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    follows.unfollowed(instance.user_id, [instance.author_id])
@@ -0,0 +1,57 @@
+"""Упрощённый стеммер для русского языка.
+
+Отрезает самые частые окончания, возвратные частицы и суффиксы по мотивам
+алгоритма Snowball. Одинаково применяется к тексту при индексации и к
+запросу, поэтому «постами», «посты» и «пост» находят друг друга.
+Латиница не изменяется.
+"""
+import re
+
+WORD_RE = re.compile(r'\w+')
+VOWELS = 'аеиоуыэюя'
+
+REFLEXIVE = ('ся', 'сь')
+ENDINGS = tuple(sorted((
+    # Деепричастия и причастия.
+    'вшись', 'вши', 'ывшись', 'ившись', 'ывши', 'ивши',
+    'ивш', 'ывш', 'ующ', 'ющ', 'ащ', 'ящ', 'ущ',
+    # Прилагательные.
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+    # Глаголы.
+    'ла', 'на', 'ете', 'йте', 'ли', 'ло', 'но', 'ет', 'ют', 'ны', 'ть',
+    'ешь', 'нно', 'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли',
+    'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить',
+    'ыть', 'ишь', 'ал', 'ял', 'ил', 'ыл', 'ел', 'овать', 'евать', 'овал',
+    'овала', 'овали',
+    # Существительные.
+    'а', 'ев', 'ов', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'иям', 'ям', 'ием', 'ам', 'о', 'у', 'ах', 'иях', 'ях', 'ы',
+    'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я', 'й',
+    # Превосходная степень и словообразование.
+    'ейш', 'ейше', 'ость', 'ост',
+), key=len, reverse=True))
+
+MIN_STEM = 2
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    # Окончания ищутся только после первой гласной, как в Snowball.
+    start = next((i + 1 for i, char in enumerate(word) if char in VOWELS),
+                 len(word))
+    for suffix in REFLEXIVE:
+        if word.endswith(suffix) and len(word) - len(suffix) >= start:
+            word = word[:-len(suffix)]
+            break
+    for ending in ENDINGS:
+        stem_length = len(word) - len(ending)
+        if (word.endswith(ending) and stem_length >= start
+                and stem_length >= MIN_STEM):
+            return word[:stem_length]
+    return word
+
+
+def stem_text(text):
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
@@ -0,0 +1,16 @@
+from django import template
+
+from posts.page_cache import hole_marker, render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **params):
+    """Личный кусочек страницы, см. posts/page_cache.py.
+
+    В заготовке для кеша страниц выводится метка, иначе - сам кусочек.
+    """
+    if context.get('punch_holes'):
+        return hole_marker(name, params)
+    return render_hole(context['request'], name, params)
@@ -0,0 +1,17 @@
+from django import template
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, show_group=True):
+    """Карточки постов списка за один проход, см. posts/cards.py."""
+    return render_cards(context, posts, show_group)
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    """Карточка одного поста, как в списках."""
+    return render_cards(context, [post])
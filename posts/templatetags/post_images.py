@@ -0,0 +1,37 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from posts.renditions import FORMATS, srcset
+
+register = template.Library()
+
+CARD_SIZES = '(min-width: 992px) 960px, 100vw'
+
+
+@register.simple_tag
+def post_picture(post, css_class='card-img', sizes=CARD_SIZES):
+    """Картинка поста с копиями под ширину экрана и современные форматы.
+
+    Всё берётся из описания копий в БД, файлы и Pillow не нужны.
+    """
+    if not post.image:
+        return ''
+    renditions = post.renditions or {}
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((FORMATS[fmt][1], srcset(items), sizes)
+         for fmt, items in renditions.items()
+         if fmt != 'jpeg' and items),
+    )
+    fallback = renditions.get('jpeg')
+    if fallback:
+        image = format_html(
+            '<img class="{}" src="{}" srcset="{}" sizes="{}" '
+            'width="{}" height="{}" loading="lazy" />',
+            css_class, post.thumbnail_url, srcset(fallback), sizes,
+            fallback[-1]['width'], fallback[-1]['height'],
+        )
+    else:
+        image = format_html('<img class="{}" src="{}" />',
+                            css_class, post.thumbnail_url)
+    return format_html('<picture>{}{}</picture>', sources, image)
@@ -0,0 +1,76 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from posts.cards import render_cards, url_pattern
+from posts.models import Group, Post, User
+
+from . import constants
+from .utils import run_on_commit
+
+
+class CardsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=constants.USERNAME)
+        cls.reader = User.objects.create_user(username=constants.USERNAME2)
+        cls.group = Group.objects.create(
+            title=constants.GROUP_NAME,
+            slug=constants.GROUP_SLUG,
+            description=constants.GROUP_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(text=constants.POST_TEXT,
+                                       author=cls.user, group=cls.group)
+        cls.edit_url = reverse('posts:post_edit',
+                               args=[cls.user.username, cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self, user=None, **kwargs):
+        request = RequestFactory().get(constants.INDEX_URL)
+        request.user = user or AnonymousUser()
+        return render_cards({'request': request},
+                            Post.objects.for_feed(), **kwargs)
+
+    def test_cards(self):
+        """Проверка карточек из кеша и их сброса при правке поста"""
+        card = self.render()
+        self.assertIn(constants.POST_TEXT, card)
+        self.assertIn(f'href="{constants.PROFILE_URL}"', card)
+        self.assertIn(f'href="{constants.GROUP_URL}"', card)
+        self.assertNotIn(constants.GROUP_URL, self.render(show_group=False))
+        self.assertEqual(self.render(), card)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        self.assertEqual(self.render(), card)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertIn('Новый текст', self.render())
+        self.group.title = 'Новое название'
+        with run_on_commit():
+            self.group.save()
+        self.assertIn('Новое название', self.render())
+
+    def test_author_rename(self):
+        """Проверка карточек после смены имени автора"""
+        self.assertIn(constants.PROFILE_URL, self.render())
+        User.objects.filter(pk=self.user.pk).update(username='renamed')
+        card = self.render()
+        self.assertIn(reverse('posts:profile', args=['renamed']), card)
+        self.assertNotIn(constants.PROFILE_URL, card)
+
+    def test_holes_filled_per_user(self):
+        """Проверка кнопок поста для каждого посетителя"""
+        self.assertIn(self.edit_url, self.render(self.user))
+        self.assertNotIn(self.edit_url, self.render(self.reader))
+        self.assertNotIn('<!--hole:', self.render())
+
+    def test_url_pattern(self):
+        """Проверка адресов по образцу, как у reverse"""
+        profile_url = url_pattern('posts:profile')
+        for username in ('user', 'us.er+1@mail', 'юзер'):
+            with self.subTest(username=username):
+                self.assertEqual(profile_url(username),
+                                 reverse('posts:profile', args=[username]))
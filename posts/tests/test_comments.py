@@ -0,0 +1,154 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import comments
+from posts.models import Comment, Post, User
+
+from . import constants
+
+
+class CommentThreadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=constants.USERNAME)
+        cls.post = Post.objects.create(text=constants.POST_TEXT,
+                                       author=cls.user)
+        cls.post_url = reverse('posts:post',
+                               args=[cls.user.username, cls.post.pk])
+        cls.comments_url = reverse('posts:post_comments',
+                                   args=[cls.user.username, cls.post.pk])
+        cls.add_comment_url = reverse('posts:add_comment',
+                                      args=[cls.user.username, cls.post.pk])
+        cls.client = Client()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def comment(self, text, parent=None):
+        return Comment.objects.create(post=self.post, author=self.user,
+                                      text=text, parent=parent)
+
+    def reply(self, text, parent):
+        self.client.post(self.add_comment_url,
+                         {'text': text, 'parent': parent.pk})
+        return Comment.objects.get(text=text)
+
+    def texts(self, page):
+        return [comment.text for comment in page]
+
+    def test_threads_order(self):
+        """Проверка порядка: новые ветки первыми, ответы под родителем"""
+        first = self.comment('first')
+        second = self.comment('second')
+        reply = self.reply('reply', first)
+        self.reply('nested', reply)
+        self.reply('late', second)
+        page, next_cursor = comments.get_page(self.post.pk)
+        self.assertEqual(self.texts(page),
+                         ['second', 'late', 'first', 'reply', 'nested'])
+        self.assertEqual([comment.depth for comment in page],
+                         [0, 1, 0, 1, 2])
+        self.assertIsNone(next_cursor)
+
+    def test_subtree(self):
+        """Проверка выборки всех ответов ветки одним запросом"""
+        first = self.comment('first')
+        reply = self.reply('reply', first)
+        self.reply('nested', reply)
+        self.comment('other')
+        with self.assertNumQueries(1):
+            page = list(comments.thread(self.post.pk, root=first))
+        self.assertEqual(self.texts(page), ['reply', 'nested'])
+
+    def test_max_depth(self):
+        """Проверка, что ответы глубже предела становятся соседями"""
+        parent = self.comment('root')
+        with mock.patch('posts.comments.COMMENT_MAX_DEPTH', 2):
+            for depth in range(1, 4):
+                parent = self.reply(f'reply-{depth}', parent)
+        self.assertEqual(parent.depth, 2)
+        self.assertEqual(parent.parent.text, 'reply-1')
+
+    def test_reply_to_another_post(self):
+        """Проверка, что ответ на комментарий чужого поста - корень"""
+        other_post = Post.objects.create(text='other', author=self.user)
+        other = Comment.objects.create(post=other_post, author=self.user,
+                                       text='other')
+        comment = self.reply('reply', other)
+        self.assertIsNone(comment.parent)
+        self.assertEqual(comment.depth, 0)
+
+    def test_cursor_pages(self):
+        """Проверка страниц по курсору на странице поста и во фрагментах"""
+        for i in range(5):
+            self.comment(f'comment-{i}')
+        with mock.patch('posts.comments.COMMENTS_PER_PAGE', 2):
+            response = self.client.get(self.post_url)
+            self.assertEqual(self.texts(response.context['comments']),
+                             ['comment-4', 'comment-3'])
+            cursor = response.context['next_cursor']
+            response = self.client.get(self.comments_url,
+                                       {'after': cursor})
+            data = response.json()
+            self.assertEqual([item['text'] for item in data['comments']],
+                             ['comment-2', 'comment-1'])
+            response = self.client.get(self.comments_url,
+                                       {'after': data['next'],
+                                        'format': 'html'})
+            self.assertContains(response, 'comment-0')
+            self.assertNotContains(response, 'comment-1')
+            self.assertIsNone(response.context['next_cursor'])
+
+    def test_subtree_pages(self):
+        """Проверка страниц ответов одной ветки по курсору"""
+        root = self.comment('root')
+        for i in range(3):
+            self.reply(f'reply-{i}', root)
+        self.comment('other')
+        with mock.patch('posts.comments.COMMENTS_PER_PAGE', 2):
+            response = self.client.get(self.comments_url,
+                                       {'root': root.pk, 'format': 'html'})
+            self.assertEqual(self.texts(response.context['comments']),
+                             ['reply-0', 'reply-1'])
+            cursor = response.context['next_cursor']
+            self.assertContains(
+                response, f'?comments_root={root.pk}&comments_after={cursor}'
+            )
+            self.assertContains(response,
+                                f'&root={root.pk}&after={cursor}')
+            response = self.client.get(self.comments_url, {
+                'root': root.pk, 'after': cursor, 'format': 'html',
+            })
+            self.assertEqual(self.texts(response.context['comments']),
+                             ['reply-2'])
+            response = self.client.get(self.post_url, {
+                'comments_root': root.pk, 'comments_after': cursor,
+            })
+            self.assertEqual(self.texts(response.context['comments']),
+                             ['reply-2'])
+
+    def test_authors_in_one_query(self):
+        """Проверка, что авторы комментариев не догружаются по одному"""
+        for i in range(10):
+            author = User.objects.create_user(username=f'author-{i}')
+            Comment.objects.create(post=self.post, author=author,
+                                   text=f'comment-{i}')
+        with self.assertNumQueries(2):
+            page, _ = comments.get_page(self.post.pk, limit=5)
+            [comment.author.username for comment in page]
+
+    def test_bad_parameters(self):
+        """Проверка неверных курсора и корня ветки"""
+        self.comment('comment')
+        response = self.client.get(self.comments_url, {'after': 'bad'})
+        self.assertEqual(len(response.json()['comments']), 1)
+        for root in ('bad', '0'):
+            with self.subTest(root=root):
+                response = self.client.get(self.comments_url,
+                                           {'root': root})
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,98 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import follows
+from posts.models import Group, Post, User
+
+from . import constants
+from .utils import run_on_commit
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=constants.USERNAME)
+        cls.reader = User.objects.create_user(username=constants.USERNAME2)
+        cls.group = Group.objects.create(
+            title=constants.GROUP_NAME,
+            slug=constants.GROUP_SLUG,
+            description=constants.GROUP_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(text=constants.POST_TEXT,
+                                       author=cls.user, group=cls.group)
+        cls.post_url = reverse('posts:post',
+                               args=[cls.user.username, cls.post.pk])
+        cls.urls = [constants.INDEX_URL, constants.GROUP_URL,
+                    constants.PROFILE_URL, cls.post_url]
+        cls.guest_client = Client()
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, client, url, response):
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code
+
+    def test_not_modified(self):
+        """Проверка ответа 304 на неизменившиеся страницы"""
+        for client in (self.guest_client, self.reader_client):
+            for url in self.urls:
+                with self.subTest(url=url, user=client is self.reader_client):
+                    response = client.get(url)
+                    self.assertEqual(self.revalidate(client, url, response),
+                                     304)
+                    status = client.get(
+                        url,
+                        HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+                    ).status_code
+                    self.assertEqual(status, 304)
+
+    def test_not_modified_without_list_queries(self):
+        """Проверка, что ответ 304 не выбирает посты из базы"""
+        expected = {constants.INDEX_URL: 0, constants.GROUP_URL: 1}
+        for url, queries in expected.items():
+            with self.subTest(url=url):
+                etag = self.reader_client.get(url)['ETag']
+                # Сессия и пользователь - ещё 2 запроса.
+                with self.assertNumQueries(queries + 2):
+                    self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_writes_change_validators(self):
+        """Проверка, что записи меняют ETag затронутых страниц"""
+        writes = [
+            (self.urls, lambda: Post.objects.create(
+                text='New', author=self.user, group=self.group)),
+            ([self.post_url], lambda: self.post.comments.create(
+                author=self.reader, text='Comment')),
+            ([constants.PROFILE_URL, self.post_url],
+             lambda: follows.follow(self.reader, [self.user.pk])),
+        ]
+        for urls, write in writes:
+            responses = {url: self.reader_client.get(url) for url in urls}
+            with run_on_commit():
+                write()
+            for url, response in responses.items():
+                with self.subTest(url=url):
+                    self.assertEqual(
+                        self.revalidate(self.reader_client, url, response),
+                        200,
+                    )
+
+    def test_etag_depends_on_user(self):
+        """Проверка, что чужой ETag не подходит другому посетителю"""
+        response = self.guest_client.get(constants.INDEX_URL)
+        self.assertEqual(self.revalidate(self.reader_client,
+                                         constants.INDEX_URL, response), 200)
+
+    def test_cache_headers(self):
+        """Проверка заголовков кеширования для гостя и пользователя"""
+        guest = self.guest_client.get(constants.INDEX_URL)
+        self.assertIn('public', guest['Cache-Control'])
+        self.assertIn('s-maxage', guest['Cache-Control'])
+        reader = self.reader_client.get(constants.INDEX_URL)
+        self.assertIn('private', reader['Cache-Control'])
+        for response in (guest, reader):
+            self.assertIn('Cookie', response['Vary'])
@@ -0,0 +1,68 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Post, ProfileStats, User
+
+from . import constants
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username=constants.USERNAME,
+        )
+        cls.another_user = User.objects.create_user(
+            username=constants.USERNAME2,
+        )
+
+    def assertStats(self, user, posts, followers, following):
+        stats = ProfileStats.objects.get(user=user)
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count,
+             stats.following_count),
+            (posts, followers, following),
+        )
+
+    def test_counters_follow_writes(self):
+        """Проверка обновления счётчиков при создании и удалении"""
+        post = Post.objects.create(text=constants.POST_TEXT, author=self.user)
+        Comment.objects.create(post=post, author=self.another_user,
+                               text='comment')
+        Follow.objects.create(user=self.another_user, author=self.user)
+        self.assertStats(self.user, 1, 1, 0)
+        self.assertStats(self.another_user, 0, 0, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        Follow.objects.all().delete()
+        Comment.objects.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        post.delete()
+        self.assertStats(self.user, 0, 0, 0)
+        self.assertStats(self.another_user, 0, 0, 0)
+
+    def test_recount_stats_repairs_counters(self):
+        """Проверка исправления счётчиков командой recount_stats"""
+        post = Post.objects.create(text=constants.POST_TEXT, author=self.user)
+        Comment.objects.create(post=post, author=self.user, text='comment')
+        ProfileStats.objects.all().delete()
+        Post.objects.update(comment_count=7)
+        call_command('recount_stats', stdout=StringIO())
+        self.assertStats(self.user, 1, 0, 0)
+        self.assertStats(self.another_user, 0, 0, 0)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+    def test_post_save_keeps_comment_count(self):
+        """Проверка, что правка поста не затирает счётчик комментариев"""
+        post = Post.objects.create(text=constants.POST_TEXT, author=self.user)
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post, author=self.user, text='comment')
+        stale.text = 'Новый текст'
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual((post.text, post.comment_count), ('Новый текст', 1))
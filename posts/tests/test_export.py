@@ -0,0 +1,109 @@
+import csv
+import datetime as dt
+import gzip
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Follow, Group, Post, User
+
+from . import constants
+
+EXPORT_URL = reverse('posts:export', args=['posts'])
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=constants.USERNAME)
+        cls.reader = User.objects.create_user(username=constants.USERNAME2)
+        cls.group = Group.objects.create(
+            title=constants.GROUP_NAME,
+            slug=constants.GROUP_SLUG,
+            description=constants.GROUP_DESCRIPTION,
+        )
+        cls.posts = [
+            Post.objects.create(text=f'Пост "{i}",\nстрока', author=cls.user,
+                                group=cls.group)
+            for i in range(5)
+        ]
+        cls.posts[0].comments.create(author=cls.reader, text='comment')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.staff = User.objects.create_user(username='staff',
+                                             is_staff=True)
+        cls.staff_client = Client()
+        cls.staff_client.force_login(cls.staff)
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def export(self, *args):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export')
+            call_command('export_posts', *args, '--output', path,
+                         stderr=io.StringIO())
+            with open(path, 'rb') as file:
+                return file.read()
+
+    def ndjson(self, content):
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_ndjson(self):
+        """Проверка выгрузки постов, комментариев и подписок в NDJSON"""
+        rows = self.ndjson(self.export('posts'))
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts])
+        self.assertEqual(rows[0]['author_username'], self.user.username)
+        self.assertEqual(rows[0]['group_slug'], self.group.slug)
+        self.assertEqual(rows[0]['text'], self.posts[0].text)
+        comments = self.ndjson(self.export('comments'))
+        self.assertEqual(comments[0]['post_id'], self.posts[0].pk)
+        follows = self.ndjson(self.export('follows'))
+        self.assertEqual(follows[0]['user_username'], self.reader.username)
+
+    def test_csv_gzip(self):
+        """Проверка сжатой выгрузки в CSV"""
+        content = gzip.decompress(self.export('posts', '--format', 'csv',
+                                              '--gzip'))
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(rows[0][:2], ['id', 'author_username'])
+        self.assertEqual([row[3] for row in rows[1:]],
+                         [post.text for post in self.posts])
+
+    def test_incremental(self):
+        """Проверка выгрузки только новых строк по id и по времени"""
+        rows = self.ndjson(self.export('posts', '--after-id',
+                                       str(self.posts[2].pk)))
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts[3:]])
+        future = (timezone.now() + dt.timedelta(days=1)).isoformat()
+        self.assertEqual(self.export('posts', '--since', future), b'')
+
+    def test_single_cursor(self):
+        """Проверка, что выгрузка идёт одним запросом по курсору"""
+        with mock.patch('posts.export.EXPORT_CHUNK_SIZE', 2), \
+                self.assertNumQueries(1):
+            rows = self.ndjson(self.export('posts'))
+        self.assertEqual(len(rows), len(self.posts))
+
+    def test_endpoint(self):
+        """Проверка потоковой выгрузки для персонала"""
+        response = self.reader_client.get(EXPORT_URL)
+        self.assertEqual(response.status_code, 302)
+        response = self.staff_client.get(EXPORT_URL,
+                                         HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(len(self.ndjson(content)), len(self.posts))
+        response = self.staff_client.get(
+            reverse('posts:export', args=['follows']), {'since': '2021-01-01'}
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+
+from jobs.models import Job
+from jobs.queue import run_pending
+from posts.feed import get_feed, sync_celebrities
+from posts.models import FeedEntry, Follow, Post, User
+
+from . import constants
+from .utils import run_on_commit
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username=constants.USERNAME,
+        )
+        cls.follower = User.objects.create_user(
+            username=constants.USERNAME2,
+        )
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_new_post_fans_out(self):
+        """Проверка попадания нового поста в ленту подписчика"""
+        Follow.objects.create(user=self.follower, author=self.user)
+        post = Post.objects.create(text=constants.POST_TEXT, author=self.user)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.follower, post=post, pub_date=post.pub_date
+        ).exists())
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        """Проверка заполнения ленты при подписке и очистки при отписке"""
+        posts = [
+            Post.objects.create(text=f'Test-{i}', author=self.user)
+            for i in range(3)
+        ]
+        self.follower_client.get(constants.PROFILE_FOLLOW_URL)
+        self.assertCountEqual(get_feed(self.follower), posts)
+        self.follower_client.get(constants.PROFILE_UNFOLLOW_URL)
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.follower
+        ).exists())
+        self.assertFalse(get_feed(self.follower).exists())
+
+    def test_celebrity_posts_read_on_demand(self):
+        """Проверка ленты с постами популярного автора"""
+        Follow.objects.create(user=self.follower, author=self.user)
+        # Список популярных авторов уже в кеше и сбрасывается отметкой.
+        list(get_feed(self.follower))
+        with mock.patch('posts.feed.FEED_FANOUT_LIMIT', 0), \
+                mock.patch('posts.feed.FEED_FANOUT_RESUME_LIMIT', 0):
+            with run_on_commit():
+                sync_celebrities()
+            post = Post.objects.create(text=constants.POST_TEXT,
+                                       author=self.user)
+            self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+            self.assertIn(post, get_feed(self.follower))
+
+    def test_former_celebrity_posts_fan_out(self):
+        """Проверка ленты, когда автор перестаёт быть популярным"""
+        Follow.objects.create(user=self.follower, author=self.user)
+        with mock.patch('posts.feed.FEED_FANOUT_LIMIT', 0), \
+                mock.patch('posts.feed.FEED_FANOUT_RESUME_LIMIT', 0):
+            sync_celebrities()
+            post = Post.objects.create(text=constants.POST_TEXT,
+                                       author=self.user)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        self.assertIn(post, get_feed(self.follower))
+        # Ниже FEED_FANOUT_LIMIT, но не ниже границы возврата: автор
+        # остаётся популярным.
+        with mock.patch('posts.feed.FEED_FANOUT_RESUME_LIMIT', 1):
+            sync_celebrities()
+        self.assertFalse(Job.objects.exists())
+        # Раскладка идёт фоновым заданием, до него пост читается из
+        # профиля автора.
+        with mock.patch('posts.feed.FEED_FANOUT_RESUME_LIMIT', 2):
+            sync_celebrities()
+            self.user.stats.refresh_from_db()
+            self.assertTrue(self.user.stats.celebrity)
+            self.assertIn(post, get_feed(self.follower))
+            run_pending()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.follower, post=post
+        ).exists())
+        self.user.stats.refresh_from_db()
+        self.assertFalse(self.user.stats.celebrity)
+        self.assertIn(post, get_feed(self.follower))
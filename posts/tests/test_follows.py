@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.db import IntegrityError, transaction
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import follows
+from posts.models import FeedEntry, Follow, Post, ProfileStats, User
+
+from . import constants
+
+FOLLOW_BULK_URL = reverse('posts:follow_bulk')
+UNFOLLOW_BULK_URL = reverse('posts:unfollow_bulk')
+
+
+class FollowTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=constants.USERNAME)
+        cls.authors = [
+            User.objects.create_user(username=f'author-{i}')
+            for i in range(3)
+        ]
+        cls.post = Post.objects.create(text=constants.POST_TEXT,
+                                       author=cls.authors[0])
+        cls.client = Client()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def stats(self, user):
+        stats = ProfileStats.objects.get(user=user)
+        return stats.followers_count, stats.following_count
+
+    def test_constraints(self):
+        """Проверка запрета повторной подписки и подписки на себя"""
+        Follow.objects.create(user=self.user, author=self.authors[0])
+        for author in (self.authors[0], self.user):
+            with self.subTest(author=author):
+                with self.assertRaises(IntegrityError), transaction.atomic():
+                    Follow.objects.create(user=self.user, author=author)
+
+    def test_follow_and_unfollow_are_idempotent(self):
+        """Проверка, что повторные подписка и отписка ничего не меняют"""
+        author = self.authors[0]
+        follow_url = reverse('posts:profile_follow', args=[author.username])
+        for supported in (True, False):
+            with self.subTest(returning=supported), mock.patch(
+                'posts.follows.returning_supported', return_value=supported
+            ):
+                for _ in range(2):
+                    self.client.get(follow_url)
+                self.assertEqual(Follow.objects.count(), 1)
+                self.assertEqual(self.stats(author), (1, 0))
+                self.assertEqual(self.stats(self.user), (0, 1))
+                self.assertTrue(FeedEntry.objects.filter(
+                    user=self.user, post=self.post
+                ).exists())
+                self.assertEqual(follows.unfollow(self.user, [author.pk]),
+                                 [author.pk])
+                self.assertEqual(follows.unfollow(self.user, [author.pk]),
+                                 [])
+                self.assertEqual(self.stats(author), (0, 0))
+                self.assertEqual(self.stats(self.user), (0, 0))
+                self.assertFalse(FeedEntry.objects.exists())
+
+    def test_bulk_follow(self):
+        """Проверка подписки и отписки на нескольких авторов сразу"""
+        Follow.objects.create(user=self.user, author=self.authors[0])
+        usernames = [author.username for author in self.authors]
+        response = self.client.post(FOLLOW_BULK_URL, {
+            'username': usernames + [self.user.username, 'nobody'],
+        })
+        self.assertCountEqual(response.json()['changed'], usernames[1:])
+        self.assertEqual(self.stats(self.user), (0, 3))
+        response = self.client.post(UNFOLLOW_BULK_URL,
+                                    {'username': usernames[:2]})
+        self.assertCountEqual(response.json()['changed'], usernames[:2])
+        self.assertEqual(
+            list(Follow.objects.values_list('author', flat=True)),
+            [self.authors[2].pk],
+        )
+        self.assertEqual(self.stats(self.user), (0, 1))
+        self.assertEqual(self.client.get(FOLLOW_BULK_URL).status_code, 405)
@@ -0,0 +1,161 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.importer import Importer
+from posts.models import Comment, FeedEntry, Follow, Group, Post, User
+from posts.search import get_backend
+
+from . import constants
+
+
+def ndjson(*rows):
+    return ''.join(json.dumps(row, ensure_ascii=False) + '\n'
+                   for row in rows).encode()
+
+
+def post_row(post_id, text=constants.POST_TEXT,
+             author=constants.USERNAME, **fields):
+    return {'id': post_id, 'author_username': author,
+            'group_slug': constants.GROUP_SLUG, 'text': text,
+            'pub_date': '2020-01-02T03:04:05', **fields}
+
+
+class ImportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title=constants.GROUP_NAME,
+            slug=constants.GROUP_SLUG,
+            description=constants.GROUP_DESCRIPTION,
+        )
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def load(self, kind, content, *args, name='input'):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'wb') as file:
+            file.write(content)
+        stderr = io.StringIO()
+        call_command('import_content', kind, path, *args,
+                     stdout=io.StringIO(), stderr=stderr)
+        return stderr.getvalue()
+
+    def load_users(self):
+        self.load('users', ndjson(
+            {'username': constants.USERNAME, 'email': 'one@example.com'},
+            {'username': constants.USERNAME2},
+        ))
+        return (User.objects.get(username=constants.USERNAME),
+                User.objects.get(username=constants.USERNAME2))
+
+    def test_import(self):
+        """Проверка загрузки пользователей, постов, комментариев, подписок"""
+        author, reader = self.load_users()
+        self.assertEqual(author.email, 'one@example.com')
+        self.assertFalse(author.has_usable_password())
+        self.load('follows', ndjson({'user_username': reader.username,
+                                     'author_username': author.username}))
+        self.load('posts', ndjson(post_row(10), post_row(11)))
+        self.load('comments', ndjson(
+            {'id': 5, 'post_id': 10, 'author_username': reader.username,
+             'text': 'Корень', 'created': '2020-01-03T00:00:00'},
+            {'id': 6, 'post_id': 10, 'parent_id': 5,
+             'author_username': author.username, 'text': 'Ответ'},
+        ))
+        post = Post.objects.get(pk=10)
+        self.assertEqual((post.author, post.group), (author, self.group))
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.comment_count, 2)
+        self.assertEqual(author.stats.posts_count, 2)
+        self.assertEqual(reader.stats.following_count, 1)
+        self.assertEqual(FeedEntry.objects.filter(user=reader).count(), 2)
+        reply = Comment.objects.get(pk=6)
+        self.assertEqual(reply.depth, 1)
+        self.assertTrue(reply.path.startswith(Comment.objects.get(
+            pk=5).path))
+
+    def test_invalid_rows(self):
+        """Проверка, что неверные строки пропускаются с номером строки"""
+        author, reader = self.load_users()
+        errors = self.load('posts', ndjson(
+            post_row(1), post_row(2, text=' '), post_row(3, author='nobody'),
+            post_row(4, group_slug='nothing'), post_row('x'),
+        ))
+        self.assertEqual(list(Post.objects.values_list('pk', flat=True)),
+                         [1])
+        for number in (2, 3, 4, 5):
+            self.assertIn(f'Строка {number}:', errors)
+        errors = self.load('follows', ndjson(
+            {'user_username': reader.username,
+             'author_username': reader.username},
+        ))
+        self.assertIn('Строка 1:', errors)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_repeat_and_resume(self):
+        """Проверка повторной загрузки и продолжения с отметки"""
+        self.load_users()
+        content = ndjson(*(post_row(pk) for pk in range(1, 6)))
+        self.load('posts', content)
+        self.load('posts', content)
+        self.assertEqual(Post.objects.count(), 5)
+        Post.objects.all().delete()
+        checkpoint = os.path.join(self.directory.name, 'input.checkpoint')
+        with open(checkpoint, 'w') as file:
+            json.dump({'kind': 'posts', 'rows': 3}, file)
+        self.load('posts', content, '--resume')
+        self.assertEqual(list(Post.objects.order_by('pk').values_list(
+            'pk', flat=True)), [4, 5])
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_csv_gzip(self):
+        """Проверка загрузки сжатого CSV"""
+        self.load_users()
+        content = gzip.compress(
+            'id,author_username,group_slug,text,pub_date\n'
+            f'1,{constants.USERNAME},,"Пост, с запятой",\n'.encode()
+        )
+        self.load('posts', content, '--format', 'csv', '--gzip')
+        post = Post.objects.get()
+        self.assertEqual(post.text, 'Пост, с запятой')
+        self.assertIsNone(post.group)
+
+    def test_queries_per_batch(self):
+        """Проверка вставки пачки одним запросом и кеша ссылок"""
+        self.load_users()
+        importer = Importer('posts', search=False)
+        rows = [(pk, post_row(pk)) for pk in range(1, 21)]
+        # Автор, группа, точка сохранения, поиск уже загруженных id,
+        # вставка, освобождение точки.
+        with self.assertNumQueries(6):
+            importer.insert(rows[:2])
+        with self.assertNumQueries(4):
+            importer.insert(rows[2:])
+        self.assertEqual(Post.objects.count(), 20)
+
+    def test_existing_ids_skipped(self):
+        """Проверка, что строки с занятыми id не меняют пост и поиск"""
+        self.load_users()
+        self.load('posts', ndjson(post_row(1, text='Оригинал')))
+        importer = Importer('posts')
+        self.assertEqual(importer.insert([
+            (1, post_row(1, text='Подмена')),
+            (2, post_row(2, text='Новый')),
+            (3, post_row(2, text='Повтор')),
+        ]), (1, 2, []))
+        self.assertEqual(Post.objects.get(pk=1).text, 'Оригинал')
+        self.assertEqual(Post.objects.get(pk=2).text, 'Новый')
+        search = get_backend()
+        self.assertEqual(search.ranked_ids('Подмена'), [])
+        self.assertEqual(search.ranked_ids('Повтор'), [])
+        self.assertEqual([pk for _, pk in search.ranked_ids('Оригинал')],
+                         [1])
@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.caching import get_generations
+from posts.models import Group, Post, User
+
+from . import constants
+from .utils import run_on_commit
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=constants.USERNAME)
+        cls.reader = User.objects.create_user(username=constants.USERNAME2)
+        cls.group = Group.objects.create(
+            title=constants.GROUP_NAME,
+            slug=constants.GROUP_SLUG,
+            description=constants.GROUP_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(text=constants.POST_TEXT,
+                                       author=cls.user, group=cls.group)
+        cls.edit_url = reverse('posts:post_edit',
+                               args=[cls.user.username, cls.post.pk])
+        cls.urls = [constants.INDEX_URL, constants.GROUP_URL,
+                    constants.PROFILE_URL]
+        cls.guest_client = Client()
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.user)
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_guest_pages_served_from_cache(self):
+        """Проверка, что гостю повторно страница отдаётся без базы"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertIsNone(second.context)
+                self.assertEqual(first.content, second.content)
+                self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_holes_filled_per_user(self):
+        """Проверка личных кусочков на странице из общей заготовки"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                author = self.author_client.get(url)
+                self.assertTemplateNotUsed(author, 'base.html')
+                self.assertContains(author, self.edit_url)
+                self.assertContains(author, self.user.username)
+                reader = self.reader_client.get(url)
+                self.assertNotContains(reader, self.edit_url)
+                self.assertContains(reader, 'Добавить комментарий')
+                guest = self.guest_client.get(url)
+                self.assertNotContains(guest, 'Добавить комментарий')
+                self.assertNotContains(guest, '<!--hole')
+
+    def test_follow_button(self):
+        """Проверка кнопки подписки на странице профиля из кеша"""
+        self.reader_client.get(constants.PROFILE_URL)
+        self.assertContains(self.reader_client.get(constants.PROFILE_URL),
+                            constants.PROFILE_FOLLOW_URL)
+        self.reader_client.get(constants.PROFILE_FOLLOW_URL)
+        self.assertContains(self.reader_client.get(constants.PROFILE_URL),
+                            constants.PROFILE_UNFOLLOW_URL)
+
+    def test_invalidated_on_write(self):
+        """Проверка сброса страниц гостя при новом посте"""
+        for url in self.urls:
+            self.guest_client.get(url)
+        with run_on_commit():
+            Post.objects.create(text='Новый пост', author=self.user,
+                                group=self.group)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Новый пост')
+
+    def test_bump_after_commit(self):
+        """Проверка сброса кеша только после фиксации транзакции"""
+        generations = get_generations('index')
+        with run_on_commit():
+            with transaction.atomic():
+                Post.objects.create(text='Новый пост', author=self.user)
+                self.assertEqual(get_generations('index'), generations)
+                self.guest_client.get(constants.INDEX_URL)
+        self.assertNotEqual(get_generations('index'), generations)
+        self.assertContains(self.guest_client.get(constants.INDEX_URL),
+                            'Новый пост')
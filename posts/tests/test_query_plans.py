@@ -0,0 +1,56 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.feed import get_feed, get_feed_parts
+from posts.models import Follow, Post, User
+from posts.paginator import CursorPaginator
+from posts.query_plans import (FULL_SCAN, TEMP_SORT, capture_selects,
+                               explain, plan_problems, query_problems)
+from posts.settings import POSTS_PER_PAGE
+
+from . import constants
+
+
+def problems(queryset):
+    return plan_problems(explain(*queryset.query.sql_with_params()))
+
+
+class QueryPlanTest(TestCase):
+    def test_pages_use_indexes(self):
+        """Проверка, что запросы страниц идут по индексам"""
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('в порядке', out.getvalue())
+
+    def test_bad_plans_detected(self):
+        """Проверка распознавания полного просмотра и сортировки"""
+        scan = problems(Post.objects.filter(text=constants.POST_TEXT))
+        self.assertTrue(scan[0].startswith(FULL_SCAN))
+        sort = problems(Post.objects.filter(author=1).order_by('text'))
+        self.assertTrue(sort[0].startswith(TEMP_SORT))
+        self.assertEqual(problems(Post.objects.filter(author=1)), [])
+
+    def test_celebrity_feed_merges_parts(self):
+        """Проверка ленты с популярным автором: слияние частей по курсору"""
+        author = User.objects.create_user(username=constants.USERNAME)
+        reader = User.objects.create_user(username=constants.USERNAME2)
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=reader, author=other)
+        Follow.objects.create(user=reader, author=author)
+        posts = [
+            Post.objects.create(text=f'Test-{i}', author=user)
+            for i in range(POSTS_PER_PAGE) for user in (author, other)
+        ]
+        paginator = CursorPaginator(
+            get_feed(reader, [author.pk]), POSTS_PER_PAGE,
+            ('feed_date', 'feed_post'),
+            parts=get_feed_parts(reader, [author.pk]),
+        )
+        with capture_selects() as selects:
+            first = paginator.get_cursor_page()
+            second = paginator.get_cursor_page(after=first.next_cursor)
+        self.assertEqual(query_problems(selects), {})
+        self.assertEqual(list(first) + list(second), posts[::-1])
+        self.assertIsNone(second.next_cursor)
@@ -0,0 +1,117 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+from posts.search import get_backend
+from posts.settings import POSTS_PER_PAGE
+from posts.stemmer import stem
+
+from . import constants
+
+SEARCH_URL = reverse('posts:search')
+SEARCH_JSON_URL = reverse('posts:search_json')
+
+
+class StemmerTest(TestCase):
+    def test_word_forms_share_stem(self):
+        """Проверка общей основы у форм одного слова"""
+        forms = [
+            ['пост', 'посты', 'постами', 'постов'],
+            ['красивая', 'красивые', 'красивого'],
+            ['учиться', 'учится', 'учились'],
+            ['ёлка', 'елки'],
+        ]
+        for words in forms:
+            with self.subTest(words=words):
+                self.assertEqual(len({stem(word) for word in words}), 1)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username=constants.USERNAME,
+        )
+        cls.post = Post.objects.create(
+            text='Пишу о красивых котятах',
+            author=cls.user,
+        )
+        cls.other_post = Post.objects.create(
+            text='Заметки о путешествиях',
+            author=cls.user,
+        )
+        Comment.objects.create(post=cls.other_post, author=cls.user,
+                               text='Котята тоже путешествуют')
+        cls.client = Client()
+
+    def search(self, query, after=None):
+        return get_backend().search(query, after=after)[0]
+
+    def test_search_word_forms_and_comments(self):
+        """Проверка поиска по формам слов в постах и комментариях"""
+        self.assertEqual(self.search('красивые котята'), [self.post])
+        self.assertCountEqual(self.search('котят'),
+                              [self.post, self.other_post])
+        self.assertEqual(self.search('путешествие'), [self.other_post])
+        self.assertEqual(self.search('собаки'), [])
+        self.assertEqual(self.search('"*'), [])
+
+    def test_index_follows_writes(self):
+        """Проверка обновления индекса при изменении и удалении"""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Теперь о собаках'
+        post.save()
+        self.assertEqual(self.search('собака'), [post])
+        self.assertEqual(self.search('красивый'), [])
+        Comment.objects.all().delete()
+        self.assertEqual(self.search('котята'), [])
+        post.delete()
+        self.assertEqual(self.search('собака'), [])
+
+    def test_search_pages_by_cursor(self):
+        """Проверка постраничного вывода результатов по курсору"""
+        posts = [
+            Post.objects.create(text=f'Котята {i}', author=self.user)
+            for i in range(POSTS_PER_PAGE + 2)
+        ]
+        backend = get_backend()
+        found, cursor = backend.search('котята')
+        self.assertEqual(len(found), POSTS_PER_PAGE)
+        rest, last_cursor = backend.search('котята', after=cursor)
+        self.assertIsNone(last_cursor)
+        self.assertCountEqual(found + rest,
+                              posts + [self.post, self.other_post])
+
+    def test_search_views(self):
+        """Проверка страницы и JSON-ответа поиска"""
+        response = self.client.get(SEARCH_URL, {'q': 'котята'})
+        self.assertTemplateUsed(response, 'search.html')
+        self.assertCountEqual(response.context['posts'],
+                              [self.post, self.other_post])
+        data = self.client.get(SEARCH_JSON_URL, {'q': 'котята'}).json()
+        self.assertEqual([item['id'] for item in data['results']],
+                         [post.pk for post in response.context['posts']])
+        self.assertIsNone(data['next'])
+
+    def test_admin_search(self):
+        """Проверка поиска в списке постов админки"""
+        admin = User.objects.create_superuser(username='admin')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:posts_post_changelist'),
+                                   {'q': 'путешествовать'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.other_post])
+
+    def test_admin_search_keeps_rank_order(self):
+        """Проверка порядка релевантности в поиске админки"""
+        # Новый пост с длинным текстом ниже по релевантности, чем по id.
+        Post.objects.create(text='котята ' + 'слово ' * 50, author=self.user)
+        admin = User.objects.create_superuser(username='admin')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:posts_post_changelist'),
+                                   {'q': 'котята'})
+        ranked = [pk for _, pk in get_backend().ranked_ids('котята')]
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list], ranked
+        )
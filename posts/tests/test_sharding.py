@@ -0,0 +1,236 @@
+import io
+import json
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import sharding
+from posts.counters import recount_comments, recount_stats
+from posts.export import export_lines
+from posts.models import Comment, Group, Post, ProfileStats, User
+from posts.settings import SHARD_BUCKETS
+
+from . import constants
+
+SHARDS = ['shard0', 'shard1']
+
+
+@override_settings(DATABASE_SHARDS=SHARDS)
+class ShardingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Шарды - базы в памяти, которые есть только у этих тестов,
+        # поэтому запускалка тестов о них не знает.
+        with override_settings(DATABASE_SHARDS=SHARDS):
+            for alias in SHARDS:
+                connections.databases[alias] = {
+                    'ENGINE': 'django.db.backends.sqlite3',
+                    'NAME': ':memory:',
+                }
+                connections.ensure_defaults(alias)
+                connections.prepare_test_settings(alias)
+                connections[alias].creation.create_test_db(
+                    verbosity=0, serialize=False
+                )
+        cls.databases = {'default', *SHARDS}
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=constants.USERNAME)
+        cls.reader = User.objects.create_user(username=constants.USERNAME2)
+        cls.group = Group.objects.create(
+            title=constants.GROUP_NAME,
+            slug=constants.GROUP_SLUG,
+            description=constants.GROUP_DESCRIPTION,
+        )
+        cls.reader.follower.create(author=cls.author)
+        cls.client = Client()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in SHARDS:
+            del connections[alias]
+            del connections.databases[alias]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def place(self):
+        """Автор - в shard1, читатель - в shard0."""
+        sharding.set_placement(range(SHARD_BUCKETS), 'shard0')
+        sharding.set_placement([sharding.get_bucket(self.author.pk)],
+                               'shard1')
+
+    def test_posts_follow_author(self):
+        """Проверка записи постов и комментариев в шард автора"""
+        self.place()
+        post = self.author.posts.create(text='Автор', group=self.group)
+        own = self.reader.posts.create(text='Читатель')
+        comment = post.comments.create(author=self.reader, text='Ответ')
+        self.assertTrue(Post.objects.using('shard1').filter(
+            pk=post.pk, author=self.author, group=self.group
+        ).exists())
+        self.assertTrue(Post.objects.using('shard0').filter(
+            pk=own.pk
+        ).exists())
+        self.assertFalse(Post.objects.using('default').exists())
+        self.assertTrue(Comment.objects.using('shard1').filter(
+            pk=comment.pk
+        ).exists())
+        self.assertEqual(Post.objects.using('shard1').get(
+            pk=post.pk
+        ).comment_count, 1)
+        self.assertNotEqual(post.pk, own.pk)
+        self.assertEqual(sharding.find_db(post.pk), 'shard1')
+
+    def test_pages(self):
+        """Проверка страниц, собранных из нескольких шардов"""
+        self.place()
+        post = self.author.posts.create(text='Автор', group=self.group)
+        self.reader.posts.create(text='Читатель', group=self.group)
+        post.comments.create(author=self.reader, text='Комментарий')
+        post_url = reverse('posts:post', args=[self.author.username,
+                                               post.pk])
+        pages = {
+            constants.INDEX_URL: ['Автор', 'Читатель'],
+            constants.INDEX_URL + '?page=1': ['Автор', 'Читатель'],
+            constants.GROUP_URL: ['Автор', 'Читатель'],
+            constants.PROFILE_URL: ['Автор'],
+            constants.FOLLOW_URL: ['Автор'],
+            constants.FOLLOW_URL + '?page=1': ['Автор'],
+        }
+        for url, texts in pages.items():
+            with self.subTest(url=url):
+                page = self.client.get(url).context['page']
+                self.assertEqual([item.text for item in page], texts[::-1])
+        response = self.client.get(post_url)
+        self.assertEqual(response.context['post'], post)
+        self.assertEqual(response.context['author'].stats.posts_count, 1)
+        self.assertContains(response, 'Комментарий')
+        self.client.post(
+            reverse('posts:add_comment',
+                    args=[self.author.username, post.pk]),
+            {'text': 'Новый'},
+        )
+        self.assertTrue(Comment.objects.using('shard1').filter(
+            text='Новый'
+        ).exists())
+
+    def test_rebalance(self):
+        """Проверка переноса постов из основной базы по шардам"""
+        post = self.author.posts.create(text='Автор', group=self.group)
+        own = self.reader.posts.create(text='Читатель')
+        root = post.comments.create(author=self.reader, text='Корень')
+        post.comments.create(author=self.author, text='Ответ', parent=root)
+        self.assertEqual(Post.objects.using('default').count(), 2)
+        out = io.StringIO()
+        call_command('rebalance_shards', '--wait', '0', stdout=out)
+        self.assertFalse(Post.objects.using('default').exists())
+        self.assertFalse(Comment.objects.using('default').exists())
+        database = sharding.shard_for(self.author.pk)
+        self.assertIn(database, SHARDS)
+        self.assertEqual(Comment.objects.using(database).filter(
+            post=post
+        ).count(), 2)
+        self.assertTrue(Post.objects.using(
+            sharding.shard_for(self.reader.pk)
+        ).filter(pk=own.pk).exists())
+        self.assertEqual(sharding.get_databases(), SHARDS)
+        out = io.StringIO()
+        call_command('rebalance_shards', '--wait', '0', stdout=out)
+        self.assertEqual(out.getvalue(), '')
+
+    def test_plan_placement(self):
+        """Проверка, что новый шард забирает только свою долю корзин"""
+        old = sharding.plan_placement({}, SHARDS)
+        self.assertEqual(sorted(old.values()).count('shard0'),
+                         SHARD_BUCKETS // 2)
+        new = sharding.plan_placement(old, [*SHARDS, 'shard2'])
+        moved = [bucket for bucket in new if new[bucket] != old[bucket]]
+        self.assertEqual(len(moved), SHARD_BUCKETS // 3)
+        self.assertEqual({new[bucket] for bucket in moved}, {'shard2'})
+
+    def test_reference_copies(self):
+        """Проверка обновления копий группы в шардах"""
+        self.place()
+        self.author.posts.create(text='Автор', group=self.group)
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertEqual(Group.objects.using('shard1').get(
+            pk=self.group.pk
+        ).title, 'Новое название')
+
+    def test_api(self):
+        """Проверка API для постов из разных шардов"""
+        self.place()
+        post = self.author.posts.create(text='Автор', group=self.group)
+        own = self.reader.posts.create(text='Читатель', group=self.group)
+        post.comments.create(author=self.reader, text='Комментарий')
+        lists = {
+            reverse('api:posts'): ['Читатель', 'Автор'],
+            reverse('api:group_posts', args=[constants.GROUP_SLUG]): [
+                'Читатель', 'Автор'
+            ],
+            reverse('api:profile_posts', args=[constants.USERNAME]): [
+                'Автор'
+            ],
+        }
+        for url, texts in lists.items():
+            with self.subTest(url=url):
+                results = self.client.get(url).json()['results']
+                self.assertEqual([item['text'] for item in results], texts)
+        detail = self.client.get(reverse('api:post', args=[post.pk]))
+        self.assertEqual(detail.json()['text'], 'Автор')
+        comments = self.client.get(
+            reverse('api:post_comments', args=[post.pk])
+        ).json()['results']
+        self.assertEqual([item['text'] for item in comments],
+                         ['Комментарий'])
+        found = self.client.get(reverse('api:posts_bulk'), {
+            'ids': f'{post.pk},{own.pk}'
+        }).json()
+        self.assertEqual(found['missing'], [])
+
+    def test_recount_and_export(self):
+        """Проверка пересчёта счётчиков и выгрузки по всем шардам"""
+        self.place()
+        post = self.author.posts.create(text='Автор')
+        own = self.reader.posts.create(text='Читатель')
+        post.comments.create(author=self.reader, text='Комментарий')
+        ProfileStats.objects.update(posts_count=0)
+        Post.objects.using('shard1').update(comment_count=0)
+        recount_stats()
+        recount_comments()
+        self.assertEqual(ProfileStats.objects.get(
+            user=self.author
+        ).posts_count, 1)
+        self.assertEqual(ProfileStats.objects.get(
+            user=self.reader
+        ).posts_count, 1)
+        self.assertEqual(Post.objects.using('shard1').get(
+            pk=post.pk
+        ).comment_count, 1)
+        ids = [json.loads(line)['id'] for line in export_lines('posts')]
+        self.assertEqual(ids, sorted([post.pk, own.pk]))
+
+    def test_import_refused(self):
+        """Проверка отказа загружать посты при шардах"""
+        self.place()
+        with self.assertRaises(CommandError):
+            call_command('import_content', 'posts', '/dev/null')
+
+    def test_admin(self):
+        """Проверка админки постов из шарда"""
+        self.place()
+        post = self.author.posts.create(text='Автор')
+        admin = User.objects.create_superuser(username='admin')
+        self.client.force_login(admin)
+        change_url = reverse('admin:posts_post_change', args=[post.pk])
+        self.assertContains(self.client.get(change_url), 'Автор')
+        changelist = reverse('admin:posts_post_changelist')
+        self.assertNotContains(self.client.get(changelist), 'Автор')
+        self.assertContains(self.client.get(changelist, {'shard': 'shard1'}),
+                            'Автор')
@@ -0,0 +1,43 @@
+import io
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.template import engines
+from django.test import SimpleTestCase, override_settings
+
+CACHED_TEMPLATES = [{
+    **settings.TEMPLATES[0],
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'loaders': [('django.template.loaders.cached.Loader',
+                     settings.TEMPLATE_LOADERS)],
+    },
+}]
+
+
+class WarmTemplatesTest(SimpleTestCase):
+    @override_settings(TEMPLATES=CACHED_TEMPLATES)
+    def test_templates_cached(self):
+        """Проверка компиляции всех шаблонов в кеш загрузчика"""
+        out = io.StringIO()
+        call_command('warm_templates', stdout=out)
+        self.assertIn('Шаблонов:', out.getvalue())
+        loader = engines['django'].engine.template_loaders[0]
+        for name in ('index.html', 'post-item.html', 'paginator.html',
+                     'misc/404.html'):
+            with self.subTest(name=name):
+                self.assertIn(name, loader.get_template_cache)
+
+    def test_syntax_error(self):
+        """Проверка, что шаблон с ошибкой останавливает прогрев"""
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'broken.html'), 'w') as file:
+                file.write('{% if %}')
+            templates = [{**settings.TEMPLATES[0], 'DIRS': [directory]}]
+            stderr = io.StringIO()
+            with override_settings(TEMPLATES=templates), \
+                    self.assertRaises(CommandError):
+                call_command('warm_templates', stderr=stderr)
+        self.assertIn('broken.html', stderr.getvalue())
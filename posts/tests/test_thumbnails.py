@@ -0,0 +1,124 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from jobs.models import Job
+from jobs.queue import run_pending
+from posts import thumbnails
+from posts.models import Post, User
+
+from . import constants
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username=constants.USERNAME,
+        )
+        cls.post = Post.objects.create(
+            text=constants.POST_TEXT,
+            author=cls.user,
+            image=SimpleUploadedFile(
+                name='image.gif',
+                content=constants.IMAGE,
+                content_type='image/gif',
+            ),
+        )
+        cls.guest_client = Client()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_original_image_until_thumbnail_ready(self):
+        """Проверка вывода исходной картинки, пока нет миниатюры"""
+        response = self.guest_client.get(constants.INDEX_URL)
+        self.assertContains(response, self.post.image.url)
+
+    def test_generate_thumbnail(self):
+        """Проверка подготовки миниатюры и её вывода в ленте"""
+        name = thumbnails.generate(self.post.pk)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.thumbnail, name)
+        self.assertTrue(default_storage.exists(name))
+        response = self.guest_client.get(constants.INDEX_URL)
+        self.assertContains(response, post.thumbnail_url)
+        self.assertNotContains(response, self.post.image.url)
+
+    def test_generate_renditions(self):
+        """Проверка адаптивных копий картинки и их вывода в srcset"""
+        thumbnails.generate(self.post.pk)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertIn('webp', post.renditions)
+        self.assertIn('jpeg', post.renditions)
+        for items in post.renditions.values():
+            for item in items:
+                with self.subTest(name=item['name']):
+                    self.assertEqual(default_storage.size(item['name']),
+                                     item['size'])
+        webp = post.renditions['webp'][0]
+        response = self.guest_client.get(constants.INDEX_URL)
+        self.assertContains(response, '<source type="image/webp" srcset="'
+                            f'{default_storage.url(webp["name"])} '
+                            f'{webp["width"]}w"')
+
+    def test_edit_image_resets_thumbnail(self):
+        """Проверка сброса миниатюры при замене картинки"""
+        thumbnails.generate(self.post.pk)
+        author_client = Client()
+        author_client.force_login(self.user)
+        author_client.post(
+            reverse('posts:post_edit', args=[self.user.username,
+                                             self.post.pk]),
+            data={
+                'text': constants.POST_TEXT,
+                'image': SimpleUploadedFile(
+                    name='image2.gif',
+                    content=constants.IMAGE,
+                    content_type='image/gif',
+                ),
+            },
+        )
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.thumbnail, '')
+        self.assertEqual(post.renditions, {})
+        self.assertEqual(post.thumbnail_url, post.image.url)
+
+    def test_new_image_queues_job(self):
+        """Проверка, что копии новой картинки готовит фоновое задание"""
+        author_client = Client()
+        author_client.force_login(self.user)
+        for name in ('image2.gif', 'image3.gif'):
+            author_client.post(
+                reverse('posts:post_edit', args=[self.user.username,
+                                                 self.post.pk]),
+                data={
+                    'text': constants.POST_TEXT,
+                    'image': SimpleUploadedFile(
+                        name=name,
+                        content=constants.IMAGE,
+                        content_type='image/gif',
+                    ),
+                },
+            )
+        job = Job.objects.get()
+        self.assertEqual(job.args, [self.post.pk])
+        run_pending()
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertNotEqual(post.thumbnail, '')
+        self.assertIn('image3', post.image.name)
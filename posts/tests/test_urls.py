@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
@@ -38,6 +39,9 @@ class StaticURLTests(TestCase):
         cls.other_client = Client()
         cls.other_client.force_login(cls.another_user)
 
+    def setUp(self):
+        cache.clear()
+
     def test_response_codes_pages(self):
         """Проверка доступности страниц"""
         urls = [
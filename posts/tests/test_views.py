@@ -12,6 +12,7 @@ from posts.models import Follow, Group, Post, User
 from posts.settings import POSTS_PER_PAGE
 
 from . import constants
+from .utils import run_on_commit
 
 MEDIA_ROOT = tempfile.mkdtemp()
 
@@ -63,6 +64,10 @@ class ViewsTest(TestCase):
         super().tearDownClass()
         shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
 
+    def setUp(self):
+        # Страницы из кеша отдаются без контекста шаблона.
+        cache.clear()
+
     def test_post_in_someone_else_group(self):
         """Проверка не наличия поста в неправильной группе"""
         response = self.author_client.get(constants.GROUP2_URL)
@@ -120,16 +125,44 @@ class ViewsTest(TestCase):
     def test_cache_working(self):
         """Проверка работы кеша"""
         response = self.author_client.get(constants.INDEX_URL)
-        Post.objects.create(
-            text='test',
-            author=self.user,
-        )
+        Post.objects.filter(pk=self.post.pk).update(text='changed')
         response2 = self.author_client.get(constants.INDEX_URL)
         self.assertEqual(response.content, response2.content)
         cache.clear()
         response3 = self.author_client.get(constants.INDEX_URL)
         self.assertNotEqual(response2.content, response3.content)
 
+    def test_cache_invalidated_on_write(self):
+        """Проверка сброса кеша при создании поста и комментария"""
+        urls = [constants.INDEX_URL, constants.GROUP_URL,
+                constants.PROFILE_URL]
+        for url in urls:
+            self.another_client.get(url)
+        with run_on_commit():
+            post = Post.objects.create(
+                text='Новый пост',
+                author=self.user,
+                group=self.group,
+            )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.another_client.get(url)
+                self.assertContains(response, post.text)
+        with run_on_commit():
+            post.comments.create(author=self.another_user, text='comment')
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.another_client.get(url)
+                self.assertContains(response, 'Комментариев: 1')
+
+    def test_cache_not_shared_with_author_buttons(self):
+        """Проверка, что кнопка редактирования не попадает к другим"""
+        self.author_client.get(constants.INDEX_URL)
+        response = self.another_client.get(constants.INDEX_URL)
+        self.assertNotContains(response, self.POST_EDIT_URL)
+        response = Client().get(constants.INDEX_URL)
+        self.assertNotContains(response, 'Добавить комментарий')
+
     def test_subscribe_work(self):
         """Проверка корректно работающей подписки"""
         Follow.objects.all().delete()
@@ -195,3 +228,74 @@ class PaginatorViewsTest(TestCase):
                     )
                     posts_count = len(response.context['page'])
                     self.assertLessEqual(posts_count, POSTS_PER_PAGE)
+
+    def test_cursor_pages_walk_all_records(self):
+        """Проверка обхода всех постов по курсорам вперёд и назад"""
+        urls = [
+            [constants.INDEX_URL, self.posts],
+            [constants.GROUP_URL, self.group.posts.all()],
+            [constants.FOLLOW_URL, self.user.posts.all()],
+        ]
+        for url, expected_posts in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                pages = [self.author_client.get(url).context['page']]
+                while pages[-1].next_cursor:
+                    pages.append(self.author_client.get(
+                        f'{url}?after={pages[-1].next_cursor}'
+                    ).context['page'])
+                posts = [post for page in pages for post in page]
+                self.assertEqual(posts, list(expected_posts))
+                self.assertIsNone(pages[0].previous_cursor)
+                cache.clear()
+                previous = self.author_client.get(
+                    f'{url}?before={pages[-1].previous_cursor}'
+                ).context['page']
+                self.assertEqual(list(previous), list(pages[-2]))
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username=constants.USERNAME,
+        )
+        cls.another_user = User.objects.create_user(
+            username=constants.USERNAME2,
+        )
+        cls.group = Group.objects.create(
+            title=constants.GROUP_NAME,
+            slug=constants.GROUP_SLUG,
+            description=constants.GROUP_DESCRIPTION,
+        )
+        cls.another_user.follower.create(author=cls.user)
+        for i in range(POSTS_PER_PAGE + 2):
+            post = Post.objects.create(
+                text=f'Test-{i}',
+                author=cls.user,
+                group=cls.group,
+            )
+            post.comments.create(author=cls.another_user, text='comment')
+        cls.guest_client = Client()
+        cls.another_client = Client()
+        cls.another_client.force_login(cls.another_user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_list_views_query_budget(self):
+        """Проверка фиксированного числа запросов на страницах списков"""
+        # Авторизованный клиент: сессия и пользователь - ещё 2 запроса.
+        urls = [
+            [constants.INDEX_URL, self.guest_client, 1],
+            [constants.GROUP_URL, self.guest_client, 2],
+            [constants.PROFILE_URL, self.guest_client, 2],
+            [constants.PROFILE_URL, self.another_client, 5],
+            [constants.FOLLOW_URL, self.another_client, 4],
+        ]
+        for url, client, expected_queries in urls:
+            with self.subTest(url=url, client=client):
+                cache.clear()
+                with self.assertNumQueries(expected_queries):
+                    client.get(url)
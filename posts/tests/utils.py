@@ -0,0 +1,17 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextmanager
+def run_on_commit(using=DEFAULT_DB_ALIAS):
+    """Выполняет функции transaction.on_commit, отложенные в блоке.
+
+    TestCase не фиксирует транзакцию, и без этого они не выполняются.
+    То же, что captureOnCommitCallbacks(execute=True) из Django 3.2.
+    """
+    connection = connections[using]
+    start = len(connection.run_on_commit)
+    yield
+    for _, callback in connection.run_on_commit[start:]:
+        callback()
@@ -0,0 +1,42 @@
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+
+from jobs.queue import task
+
+from . import caching, sharding
+from .models import Post
+from .renditions import delete_renditions, make_renditions
+from .settings import THUMBNAIL_GEOMETRY, THUMBNAIL_OPTIONS
+
+
+@task(priority=1)
+def generate(post_id):
+    """Готовит миниатюру и адаптивные копии картинки поста."""
+    posts = Post.objects.using(sharding.find_db(post_id))
+    post = posts.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return None
+    thumbnail = get_thumbnail(post.image, THUMBNAIL_GEOMETRY,
+                              **THUMBNAIL_OPTIONS)
+    renditions = make_renditions(post)
+    # Картинку могли заменить, пока готовились копии.
+    if posts.filter(pk=post.pk, image=post.image.name).update(
+        thumbnail=thumbnail.name,
+        renditions=renditions,
+        updated=timezone.now(),
+    ):
+        delete_renditions(post.renditions)
+        caching.bump(*caching.post_scopes(post))
+    else:
+        delete_renditions(renditions)
+    return thumbnail.name
+
+
+def schedule(post):
+    """Ставит подготовку копий картинки в фоновую очередь.
+
+    Задание сохраняется в той же транзакции, что и пост. Ключ не даёт
+    копить задания одного поста: ждущее в очереди всё равно прочитает
+    последнюю картинку.
+    """
+    generate.enqueue([post.pk], key=f'thumbnail:{post.pk}')
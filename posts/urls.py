@@ -10,13 +10,20 @@ urlpatterns = [
     path('500/', views.server_error, name='500'),
     path('new/', views.new_post, name='new_post'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/bulk/', views.follow_bulk, name='follow_bulk'),
+    path('unfollow/bulk/', views.unfollow_bulk, name='unfollow_bulk'),
+    path('search/', views.search, name='search'),
+    path('search/json/', views.search_json, name='search_json'),
     path('group/<slug:slug>/', views.group_posts, name='group'),
+    path('export/<str:kind>/', views.export, name='export'),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path('<str:username>/<int:post_id>/edit/', views.post_edit,
          name='post_edit'),
     path('<str:username>/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
+    path('<str:username>/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('<str:username>/follow/', views.profile_follow,
          name='profile_follow'),
     path('<str:username>/unfollow/', views.profile_unfollow,
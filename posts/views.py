@@ -1,28 +1,37 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import (Http404, HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 
+from . import comments, follows, sharding
+from .caching import post_scopes, stats_scopes
+from .conditional import render_conditional
+from .export import (EXPORTS, FORMATS, encode, export_lines, gzip_chunks,
+                     parse_time)
+from .feed import FEED_KEY, follow_feed
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .settings import POSTS_PER_PAGE
+from .models import Group, Post, User
+from .paginator import paginate
+from .search import get_backend
+from .settings import FOLLOW_BULK_LIMIT
 
 
 def index(request):
-    posts = Post.objects.all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'index.html', {
-        'page': page,
-    })
+    def context():
+        posts, parts = sharding.scatter_list(Post.objects.for_feed())
+        page = paginate(request, posts, parts=parts)
+        return {'page': page}
+    return render_conditional(request, ['index'], 'index.html', context)
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts, parts = follow_feed(request.user)
+    page = paginate(request, posts, key=FEED_KEY, parts=parts)
     return render(request, 'follow.html', {
         'page': page,
     })
@@ -30,97 +39,237 @@ def follow_index(request):
 
 @login_required
 def profile_follow(request, username):
-    if not (request.user.username == username
-            or Follow.objects.filter(user=request.user,
-                                     author__username=username).exists()):
-        Follow.objects.create(
-            user=request.user,
-            author=get_object_or_404(User, username=username)
-        )
+    author = get_object_or_404(User, username=username)
+    follows.follow(request.user, [author.pk])
     return redirect('posts:profile', username)
-    # request.GET.get('next')
 
 
 @login_required
 def profile_unfollow(request, username):
-    get_object_or_404(Follow, user=request.user,
-                      author__username=username).delete()
+    author = get_object_or_404(User, username=username)
+    follows.unfollow(request.user, [author.pk])
     return redirect('posts:profile', username)
 
 
+def bulk_follow_response(request, action):
+    usernames = request.POST.getlist('username')[:FOLLOW_BULK_LIMIT]
+    authors = dict(User.objects.filter(
+        username__in=usernames
+    ).values_list('pk', 'username'))
+    changed = action(request.user, authors)
+    return JsonResponse({'changed': [authors[pk] for pk in changed]})
+
+
+@login_required
+@require_POST
+def follow_bulk(request):
+    return bulk_follow_response(request, follows.follow)
+
+
+@login_required
+@require_POST
+def unfollow_bulk(request):
+    return bulk_follow_response(request, follows.unfollow)
+
+
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'group.html', {
-        'group': group,
-        'page': page,
+    scope = f'group:{group.pk}'
+
+    def context():
+        posts, parts = sharding.scatter_list(group.posts.for_feed())
+        page = paginate(request, posts, parts=parts)
+        return {
+            'group': group,
+            'page': page,
+        }
+    return render_conditional(request, [scope], 'group.html', context)
+
+
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    posts, next_cursor = get_backend().search(
+        query, after=request.GET.get('after')
+    )
+    return query, posts, next_cursor
+
+
+def search(request):
+    query, posts, next_cursor = search_posts(request)
+    return render(request, 'search.html', {
+        'query': query,
+        'posts': posts,
+        'next_cursor': next_cursor,
+    })
+
+
+def search_json(request):
+    query, posts, next_cursor = search_posts(request)
+    return JsonResponse({
+        'query': query,
+        'results': [{
+            'id': post.pk,
+            'text': post.text,
+            'author': post.author.username,
+            'group': post.group.slug if post.group else None,
+            'pub_date': post.pub_date.isoformat(),
+            'url': reverse('posts:post', args=[post.author.username,
+                                               post.pk]),
+        } for post in posts],
+        'next': next_cursor,
     })
 
 
 @login_required
+@transaction.atomic
 def new_post(request):
     form = PostForm(data=request.POST or None, files=request.FILES or None)
     if not form.is_valid():
         return render(request, 'post-form.html',
                       {'form': form})
-    new_post = form.save(commit=False)
-    new_post.author = request.user
-    new_post.save()
+    form.instance.author = request.user
+    form.save()
     return redirect('posts:index')
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    following = (request.user.is_authenticated
-                 and request.user.username != username
-                 and Follow.objects.filter(user=request.user, author=author))
-    posts = author.posts.all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'profile.html', {
-        'author': author,
-        'following': following,
-        'page': page,
-    })
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    scope = f'profile:{author.pk}'
+
+    def context():
+        posts = author.posts.for_feed()
+        page = paginate(request, posts)
+        return {
+            'author': author,
+            'page': page,
+        }
+    return render_conditional(
+        request, [scope, *stats_scopes(author.pk)], 'profile.html', context
+    )
 
 
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
-    following = (request.user.is_authenticated
-                 and request.user.username != username
-                 and Follow.objects.filter(user=request.user,
-                                           author=post.author))
-    comments = post.comments.all()
-    form = CommentForm()
-    return render(request, 'post.html', {
-        'author': post.author,
-        'following': following or None,
-        'post': post,
-        'form': form,
-        'comments': comments,
+    post = get_object_or_404(
+        sharding.author_posts(username).select_related('author__stats',
+                                                       'group'),
+        pk=post_id,
+    )
+    if sharding.is_sharded():
+        # В шарде у автора только имя, счётчики - в основной базе.
+        post.author = User.objects.select_related('stats').get(
+            pk=post.author_id
+        )
+
+    def context():
+        root, page, next_cursor = comments.post_page(
+            post, request.GET.get('comments_after'),
+            request.GET.get('comments_root', ''),
+        )
+        reply_to = request.GET.get('reply', '')
+        form = CommentForm()
+        return {
+            'author': post.author,
+            'post': post,
+            'form': form,
+            'comments': page,
+            'next_cursor': next_cursor,
+            'root': root,
+            'reply_to': reply_to if reply_to.isdigit() else '',
+        }
+    # Форма комментария и кнопки ответа - личные, страница не кешируется.
+    return render_conditional(
+        request, [*post_scopes(post), *stats_scopes(post.author_id)],
+        'post.html', context, cache_page=False,
+    )
+
+
+def post_comments(request, username, post_id):
+    """Следующие комментарии поста: JSON или HTML-фрагмент для страницы."""
+    post = get_object_or_404(
+        sharding.author_posts(username).select_related('author').only(
+            'author__username'
+        ),
+        pk=post_id,
+    )
+    root, page, next_cursor = comments.post_page(
+        post, request.GET.get('after'), request.GET.get('root', ''),
+    )
+    if request.GET.get('format') == 'html':
+        return render(request, 'comments-page.html', {
+            'post': post,
+            'comments': page,
+            'next_cursor': next_cursor,
+            'root': root,
+        })
+    return JsonResponse({
+        'comments': [{
+            'id': comment.pk,
+            'parent': comment.parent_id,
+            'depth': comment.depth,
+            'author': comment.author.username,
+            'text': comment.text,
+            'created': comment.created.isoformat(),
+        } for comment in page],
+        'next': next_cursor,
     })
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, username, post_id):
     form = CommentForm(request.POST or None)
     if form.is_valid():
         new_comment = form.save(commit=False)
         new_comment.author = request.user
-        new_comment.post = Post.objects.get(pk=post_id)
+        new_comment.post = get_object_or_404(
+            sharding.author_posts(username), pk=post_id
+        )
+        parent_id = request.POST.get('parent', '')
+        if parent_id.isdigit():
+            new_comment.parent = comments.reply_parent(
+                post_id, parent_id, using=sharding.db_of(new_comment.post)
+            )
         new_comment.save()
     return redirect('posts:post', username, post_id)
 
 
+@staff_member_required
+def export(request, kind):
+    """Потоковая выгрузка для аналитиков, см. posts/export.py."""
+    export_format = request.GET.get('format', 'ndjson')
+    if kind not in EXPORTS or export_format not in FORMATS:
+        raise Http404
+    after_id = request.GET.get('after_id', '')
+    try:
+        since = request.GET.get('since')
+        lines = export_lines(
+            kind, export_format,
+            since=parse_time(since) if since else None,
+            after_id=int(after_id) if after_id else None,
+        )
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    chunks = encode(lines)
+    gzipped = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    response = StreamingHttpResponse(
+        gzip_chunks(chunks) if gzipped else chunks,
+        content_type=f'{FORMATS[export_format]}; charset=utf-8',
+    )
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    response['Vary'] = 'Accept-Encoding'
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{export_format}"'
+    )
+    return response
+
+
 @login_required
 def post_edit(request, username, post_id):
     if request.user.username != username:
         return redirect('posts:post', username=username, post_id=post_id)
-    post = get_object_or_404(Post, author=request.user, pk=post_id)
+    post = get_object_or_404(request.user.posts, pk=post_id)
     form = PostForm(
         instance=post,
         data=request.POST or None,
@@ -1,4 +1,14 @@
+import pytest
+from django.core.cache import cache
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Тест откатывает транзакцию, и кеш страниц не сбрасывается сам:
+    # поколения меняются только после фиксации.
+    cache.clear()
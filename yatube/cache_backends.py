@@ -0,0 +1,241 @@
+"""Двухуровневый кеш: память процесса перед общим для всех процессов кешем.
+
+L1 - LRU-словарь в памяти процесса с коротким временем жизни записей,
+L2 - любой другой настроенный кеш (файловый, в базе, Redis), общий для
+всех воркеров. Ключи с префиксами из L2_ONLY, например счётчики
+поколений, в L1 не попадают: их изменение должны сразу видеть все
+воркеры.
+
+get() только читает. Защита от одновременного пересчёта одного ключа
+есть в get_or_set(): при промахе значение считает только владелец
+блокировки в L2, остальные ненадолго ждут, а незадолго до истечения
+записи один из читателей с некоторой вероятностью пересчитывает её
+заранее. Записи L2 для этого хранят срок жизни и время вычисления.
+"""
+import math
+import random
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+Entry = namedtuple('Entry', 'value expires delta')
+
+METRICS = ('l1_hits', 'l2_hits', 'misses', 'early_expirations',
+           'lock_waits', 'sets')
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2_alias = location or 'shared'
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        self.l1_max_entries = options.get('L1_MAX_ENTRIES', 1000)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 10)
+        self.lock_wait = options.get('LOCK_WAIT', 0.5)
+        self.beta = options.get('BETA', 1.0)
+        self.l2_only = tuple(options.get('L2_ONLY', ()))
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.metrics = dict.fromkeys(METRICS, 0)
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def get_stats(self):
+        """Счётчики попаданий и промахов с долей попаданий."""
+        with self._lock:
+            stats = dict(self.metrics)
+        hits = stats['l1_hits'] + stats['l2_hits']
+        requests = hits + stats['misses']
+        stats['hit_ratio'] = hits / requests if requests else 0.0
+        return stats
+
+    def _count(self, metric):
+        with self._lock:
+            self.metrics[metric] += 1
+        counters = getattr(self._local, 'counters', None)
+        if counters is not None:
+            counters[metric] = counters.get(metric, 0) + 1
+
+    def track(self):
+        """Начинает подсчёт метрик текущего потока, например на запрос."""
+        self._local.counters = {}
+        return self._local.counters
+
+    def untrack(self):
+        return self._local.__dict__.pop('counters', {})
+
+    def _l1_get(self, l1_key):
+        if l1_key is None:
+            return None
+        with self._lock:
+            item = self._l1.get(l1_key)
+            if item is None:
+                return None
+            expires, entry = item
+            if expires < time.monotonic():
+                del self._l1[l1_key]
+                return None
+            self._l1.move_to_end(l1_key)
+            return entry
+
+    def _l1_set(self, l1_key, entry):
+        if l1_key is None:
+            return
+        timeout = self.l1_timeout
+        if entry.expires is not None:
+            timeout = min(timeout, entry.expires - time.time())
+        if timeout <= 0:
+            return
+        with self._lock:
+            self._l1[l1_key] = (time.monotonic() + timeout, entry)
+            self._l1.move_to_end(l1_key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, l1_key):
+        if l1_key is None:
+            return
+        with self._lock:
+            self._l1.pop(l1_key, None)
+
+    def _expires_early(self, entry):
+        # XFetch: чем дольше считается значение и чем ближе срок,
+        # тем вероятнее досрочный пересчёт.
+        if entry.expires is None or not entry.delta:
+            return False
+        gap = -entry.delta * self.beta * math.log(1 - random.random())
+        return time.time() + gap >= entry.expires
+
+    def _l1_key(self, key, version):
+        """Ключ L1 или None для ключей, которые живут только в L2."""
+        l1_key = self.make_key(key, version)
+        self.validate_key(l1_key)
+        if key.startswith(self.l2_only):
+            return None
+        return l1_key
+
+    def _get_entry(self, key, version):
+        l1_key = self._l1_key(key, version)
+        entry = self._l1_get(l1_key)
+        if entry is not None:
+            self._count('l1_hits')
+            return entry
+        entry = self.l2.get(key, version=version)
+        if entry is not None:
+            self._count('l2_hits')
+            self._l1_set(l1_key, entry)
+        else:
+            self._count('misses')
+        return entry
+
+    def _wait(self, key, version):
+        self._count('lock_waits')
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            entry = self.l2.get(key, version=version)
+            if entry is not None:
+                self._l1_set(self._l1_key(key, version), entry)
+                return entry
+        return None
+
+    def _compute(self, key, default, timeout, version):
+        started = time.monotonic()
+        value = default() if callable(default) else default
+        if value is not None:
+            self._store(key, value, timeout, version,
+                        time.monotonic() - started)
+        return value
+
+    def get(self, key, default=None, version=None):
+        entry = self._get_entry(key, version)
+        return default if entry is None else entry.value
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT,
+                   version=None):
+        """Значение из кеша или посчитанное одним воркером на все.
+
+        Блокировка в L2 снимается и тогда, когда вычисление падает.
+        """
+        entry = self._get_entry(key, version)
+        if entry is not None and not self._expires_early(entry):
+            return entry.value
+        lock = f'lock:{key}'
+        if self.l2.add(lock, 1, self.lock_timeout, version):
+            if entry is not None:
+                self._count('early_expirations')
+            try:
+                return self._compute(key, default, timeout, version)
+            finally:
+                self.l2.delete(lock, version)
+        if entry is not None:
+            # Досрочно пересчитывает другой воркер, старое ещё годно.
+            return entry.value
+        entry = self._wait(key, version)
+        if entry is not None:
+            return entry.value
+        return self._compute(key, default, timeout, version)
+
+    def _store(self, key, value, timeout, version, delta=0):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        expires = None if timeout is None else time.time() + timeout
+        entry = Entry(value, expires, delta)
+        self.l2.set(key, entry, timeout, version)
+        self._count('sets')
+        self._l1_set(self._l1_key(key, version), entry)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        expires = None if timeout is None else time.time() + timeout
+        entry = Entry(value, expires, 0)
+        added = self.l2.add(key, entry, timeout, version)
+        if added:
+            self._l1_set(self._l1_key(key, version), entry)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        entry = self.l2.get(key, version=version)
+        if entry is None:
+            return False
+        self.set(key, entry.value, timeout, version)
+        return True
+
+    def delete(self, key, version=None):
+        self._l1_delete(self._l1_key(key, version))
+        return self.l2.delete(key, version)
+
+    def has_key(self, key, version=None):
+        return self.l2.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        # Не атомарно между процессами, как и incr() в BaseCache. Для
+        # счётчиков поколений этого хватает: любое изменение сбрасывает кеш.
+        # Чтобы другие воркеры сразу видели новое значение, такие ключи
+        # перечисляются в L2_ONLY.
+        entry = self.l2.get(key, version=version)
+        if entry is None:
+            raise ValueError(f"Key '{key}' not found")
+        value = entry.value + delta
+        timeout = None
+        if entry.expires is not None:
+            timeout = max(entry.expires - time.time(), 0)
+        self.l2.set(key, entry._replace(value=value), timeout, version)
+        self._l1_delete(self._l1_key(key, version))
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        self.l2.clear()
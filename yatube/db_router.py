@@ -0,0 +1,82 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики перечислены в DATABASE_REPLICAS. Чтение уходит на случайную
+реплику, кроме трёх случаев:
+- приложения PRIMARY_APPS, которым нужна самая свежая запись
+  (сессии, очередь заданий);
+- запросы внутри транзакции основной базы;
+- запросы, закреплённые за основной базой через pin_primary().
+
+После любой записи ReplicaPinMiddleware ставит посетителю cookie, и
+следующие REPLICA_PIN_SECONDS секунд все его запросы читают из основной
+базы. Так автор сразу видит свой пост, даже если реплики отстают.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'primary_until'
+PRIMARY_APPS = ('sessions', 'jobs', 'django_cache')
+
+_state = threading.local()
+
+
+def pin_primary():
+    """Читать из основной базы до конца текущего запроса."""
+    _state.pinned = True
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if (not replicas or is_pinned()
+                or model._meta.app_label in PRIMARY_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in PRIMARY_APPS:
+            _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной базы.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinMiddleware:
+    """Закрепляет за основной базой посетителей, которые только что писали."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+    def __call__(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        _state.pinned = pinned_until > time.time()
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            wrote = _state.wrote
+        finally:
+            _state.pinned = _state.wrote = False
+        if wrote:
+            response.set_cookie(
+                PIN_COOKIE, int(time.time() + self.pin_seconds) + 1,
+                max_age=self.pin_seconds, httponly=True, samesite='Lax',
+            )
+        return response
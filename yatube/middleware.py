@@ -0,0 +1,140 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger('yatube.performance')
+
+# Списки IN (%s, %s, ...) разной длины считаются одним видом запроса.
+PLACEHOLDERS_RE = re.compile(r'\(%s(?:\s*,\s*%s)*\)')
+
+_state = threading.local()
+
+
+def instrument_templates():
+    """Считает время отрисовки шаблонов в текущем замере.
+
+    Вложенные шаблоны (include, extends) входят во время внешнего.
+    """
+    if getattr(Template.render, 'instrumented', False):
+        return
+    render = Template.render
+
+    def instrumented_render(self, context):
+        metrics = getattr(_state, 'metrics', None)
+        if metrics is None or metrics['template_depth']:
+            return render(self, context)
+        metrics['template_depth'] += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics['template_time'] += time.perf_counter() - started
+            metrics['template_depth'] -= 1
+
+    instrumented_render.instrumented = True
+    Template.render = instrumented_render
+
+
+class PerformanceMiddleware:
+    """Замеряет запросы к БД, шаблоны, кеш и время обработки запроса.
+
+    Итог уходит в заголовок Server-Timing и в лог yatube.performance.
+    Повторяющиеся запросы одного вида отмечаются как возможный N+1.
+    Замеряется доля запросов PERFORMANCE_SAMPLE_RATE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PERFORMANCE_SAMPLE_RATE', 1.0)
+        self.n_plus_one_threshold = getattr(
+            settings, 'PERFORMANCE_N_PLUS_ONE_THRESHOLD', 5
+        )
+        instrument_templates()
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        metrics = _state.metrics = {
+            'queries': Counter(),
+            'db_time': 0.0,
+            'template_time': 0.0,
+            'template_depth': 0,
+        }
+        track = getattr(cache, 'track', None)
+        cache_counters = track() if track else None
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(self.record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            total = time.perf_counter() - started
+            del _state.metrics
+            if track:
+                cache.untrack()
+        self.report(request, response, metrics, cache_counters, total)
+        return response
+
+    @staticmethod
+    def record_query(execute, sql, params, many, context):
+        metrics = _state.metrics
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics['db_time'] += time.perf_counter() - started
+            metrics['queries'][PLACEHOLDERS_RE.sub('(...)', sql)] += 1
+
+    def report(self, request, response, metrics, cache_counters, total):
+        queries = metrics['queries']
+        repeated = {
+            sql: count for sql, count in queries.items()
+            if count > self.n_plus_one_threshold
+        }
+        db_time = metrics['db_time']
+        template_time = metrics['template_time']
+        timings = [
+            f'db;dur={db_time * 1000:.1f};'
+            f'desc="{sum(queries.values())} queries"',
+            f'tpl;dur={template_time * 1000:.1f}',
+            f'view;dur={(total - db_time - template_time) * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        if cache_counters is not None:
+            hits = (cache_counters.get('l1_hits', 0)
+                    + cache_counters.get('l2_hits', 0))
+            timings.append(
+                f'cache;desc="{hits} hits, '
+                f'{cache_counters.get("misses", 0)} misses"'
+            )
+        if repeated:
+            timings.append(f'n1;desc="{len(repeated)} repeated queries"')
+        response['Server-Timing'] = ', '.join(timings)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_ms': round(db_time * 1000, 1),
+            'queries': sum(queries.values()),
+            'template_ms': round(template_time * 1000, 1),
+            'cache': cache_counters,
+            'n_plus_one': repeated,
+        }
+        logger.info(json.dumps(record, ensure_ascii=False))
+        if repeated:
+            logger.warning('Возможный N+1 на %s: %s', request.path,
+                           json.dumps(repeated, ensure_ascii=False))
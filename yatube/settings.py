@@ -23,7 +23,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = 'e#zsrbbhkl#2jix!f2o5fpszixgp82e08p#1&ta#xt^f_xojbs'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv('YATUBE_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -39,6 +39,8 @@ INSTALLED_APPS = [
     'about',
     'users',
     'posts',
+    'api',
+    'jobs',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -50,6 +52,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'yatube.middleware.PerformanceMiddleware',
+    'yatube.db_router.ReplicaPinMiddleware',
+    'posts.page_cache.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,12 +65,30 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+# Скомпилированные шаблоны хранятся в памяти процесса, и include не
+# разбирает файл заново на каждой карточке поста. Без DEBUG кеш включён.
+# YATUBE_TEMPLATE_CACHE=1 или 0 включает или выключает кеш независимо от
+# DEBUG, например для замеров benchmarks.render.
+TEMPLATE_CACHE = os.getenv('YATUBE_TEMPLATE_CACHE',
+                           '0' if DEBUG else '1') == '1'
+# С YATUBE_WARM_TEMPLATES=1 и кешем шаблонов wsgi.py при старте воркера
+# компилирует все шаблоны командой warm_templates, и ошибка в любом из
+# них не даёт приложению запуститься. Без неё шаблоны компилируются при
+# первом запросе, а проверить их можно той же командой перед выкладкой.
+WARM_TEMPLATES = (TEMPLATE_CACHE
+                  and os.getenv('YATUBE_WARM_TEMPLATES', '0') == '1')
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ] if TEMPLATE_CACHE else TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -83,20 +106,133 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Профиль SQLite для работы под нагрузкой (yatube/sqlite): журнал WAL,
+# чтобы читатели не ждали писателя, synchronous=NORMAL без fsync на
+# каждую транзакцию, mmap и кеш страниц побольше, ожидание занятой базы
+# вместо ошибки и соединения, которые живут между запросами.
+# YATUBE_SQLITE_TUNING=0 возвращает настройки Django по умолчанию, с ними
+# сравнивает benchmarks.concurrency.
+SQLITE_TUNING = os.getenv('YATUBE_SQLITE_TUNING', '1') != '0'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательный размер - в КиБ.
+    'cache_size': -64 * 1024,
+    'temp_store': 'memory',
+}
+SQLITE = {
+    'ENGINE': 'yatube.sqlite',
+    'OPTIONS': {'timeout': 20},
+    'CONN_MAX_AGE': 60,
+} if SQLITE_TUNING else {
+    'ENGINE': 'django.db.backends.sqlite3',
+}
+
+# YATUBE_DB позволяет держать отдельную базу, например для замеров
+# benchmarks.seed и benchmarks.load.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        **SQLITE,
+        'NAME': os.getenv('YATUBE_DB', os.path.join(BASE_DIR, 'db.sqlite3')),
     }
 }
 
+# Реплики только для чтения. YATUBE_REPLICAS - пути к файлам SQLite через
+# запятую, их заполняет manage.py sync_replicas. В тестах реплики
+# совпадают с основной базой.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.getenv('YATUBE_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        **SQLITE,
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+# Шарды постов и комментариев. YATUBE_SHARDS - пути к файлам SQLite через
+# запятую; схему в них создаёт manage.py migrate --database shardN, а
+# записи переносит manage.py rebalance_shards. См. posts/sharding.py.
+DATABASE_SHARDS = []
+for number, path in enumerate(
+    filter(None, os.getenv('YATUBE_SHARDS', '').split(','))
+):
+    DATABASES[f'shard{number}'] = {
+        **SQLITE,
+        'NAME': path,
+    }
+    DATABASE_SHARDS.append(f'shard{number}')
+
+DATABASE_ROUTERS = [
+    'posts.sharding.ShardRouter',
+    'yatube.db_router.ReplicaRouter',
+]
+# Сколько секунд после записи посетитель читает из основной базы, чтобы
+# увидеть свои изменения, пока их нет на репликах.
+REPLICA_PIN_SECONDS = 5
 
-# Cache
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Cache
+# local - кеш в памяти каждого процесса, для разработки и тестов.
+# tiered - память процесса (L1) перед общим файловым кешем (L2),
+# одним на все воркеры. Вместо файлового кеша можно указать
+# DatabaseCache или Redis.
+
+CACHE_PROFILE = os.getenv('YATUBE_CACHE', 'local')
+
+if CACHE_PROFILE == 'tiered':
+    CACHES = {
+        'default': {
+            'BACKEND': 'yatube.cache_backends.TieredCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {
+                'L1_TIMEOUT': 5,
+                'L1_MAX_ENTRIES': 1000,
+                'LOCK_TIMEOUT': 10,
+                'LOCK_WAIT': 0.5,
+                # Поколения и отметки изменений читаются только из L2,
+                # иначе сброс кеша в одном воркере не видят другие.
+                'L2_ONLY': ['posts:generation:', 'posts:changed:'],
+            },
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, 'cache'),
+            'TIMEOUT': 60 * 60,
+        },
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Доля запросов, для которых PerformanceMiddleware собирает метрики
+# и отдаёт заголовок Server-Timing. В продакшене хватит 0.01-0.1.
+PERFORMANCE_SAMPLE_RATE = float(os.getenv('YATUBE_PERF_SAMPLE_RATE', 1))
+# Сколько раз может повториться запрос одного вида до пометки N+1.
+PERFORMANCE_N_PLUS_ONE_THRESHOLD = 5
+
+# Строка с метриками пишется на уровне INFO, предупреждения о N+1 -
+# на уровне WARNING.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.performance': {
+            'handlers': ['console'],
+            'level': os.getenv('YATUBE_PERF_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
 }
 
 
@@ -0,0 +1,20 @@
+"""SQLite, настроенный для сайта под нагрузкой.
+
+Каждое новое соединение получает прагмы из SQLITE_PRAGMAS. Транзакции
+начинаются с BEGIN IMMEDIATE: писатель сразу занимает блокировку записи
+и ждёт её до timeout из OPTIONS. В обычной отложенной транзакции запись
+после чтения при занятой базе сразу падает с «database is locked».
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
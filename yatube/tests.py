@@ -0,0 +1,257 @@
+import json
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.db import OperationalError, connections, transaction
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from yatube.cache_backends import Entry, TieredCache
+from yatube.db_router import (PIN_COOKIE, ReplicaPinMiddleware,
+                              ReplicaRouter, is_pinned, pin_primary)
+from yatube.middleware import PerformanceMiddleware
+from yatube.sqlite.base import DatabaseWrapper
+
+User = get_user_model()
+PERFORMANCE_N_PLUS_ONE_THRESHOLD = settings.PERFORMANCE_N_PLUS_ONE_THRESHOLD
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-tests',
+    },
+}
+OPTIONS = {'L1_TIMEOUT': 60, 'LOCK_WAIT': 0.05}
+
+
+@override_settings(CACHES=CACHES)
+class TieredCacheTest(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        # Два экземпляра с общим L2 ведут себя как два воркера.
+        self.worker = TieredCache('shared', {'OPTIONS': OPTIONS})
+        self.another_worker = TieredCache('shared', {'OPTIONS': OPTIONS})
+
+    def test_l1_and_l2_hits(self):
+        """Проверка попаданий в память процесса и в общий кеш"""
+        self.worker.set('key', 'value')
+        self.assertEqual(self.worker.get('key'), 'value')
+        self.assertEqual(self.another_worker.get('key'), 'value')
+        self.assertEqual(self.worker.get_stats()['l1_hits'], 1)
+        self.assertEqual(self.another_worker.get_stats()['l2_hits'], 1)
+
+    def test_delete_and_incr(self):
+        """Проверка удаления и увеличения значений"""
+        self.worker.set('counter', 1, None)
+        self.assertEqual(self.worker.incr('counter'), 2)
+        self.assertEqual(self.another_worker.get('counter'), 2)
+        self.worker.delete('counter')
+        self.assertIsNone(self.worker.get('counter'))
+        with self.assertRaises(ValueError):
+            self.worker.incr('missing')
+
+    def test_get_does_not_lock(self):
+        """Проверка, что промах get() не заставляет других ждать"""
+        self.assertIsNone(self.worker.get('key'))
+        started = time.monotonic()
+        self.assertIsNone(self.another_worker.get('key'))
+        self.assertLess(time.monotonic() - started, OPTIONS['LOCK_WAIT'])
+        self.assertEqual(self.another_worker.get_stats()['lock_waits'], 0)
+        self.assertFalse(caches['shared'].has_key('lock:key'))
+
+    def test_single_flight_on_miss(self):
+        """Проверка, что при промахе значение считает один воркер"""
+        caches['shared'].add('lock:key', 1)
+        started = time.monotonic()
+        self.assertEqual(self.another_worker.get_or_set('key', 'own'), 'own')
+        self.assertGreaterEqual(time.monotonic() - started,
+                                OPTIONS['LOCK_WAIT'])
+        self.assertEqual(self.another_worker.get_stats()['lock_waits'], 1)
+        self.assertEqual(self.worker.get_or_set('new', lambda: 'value'),
+                         'value')
+        self.assertEqual(self.another_worker.get_or_set('new', 'other'),
+                         'value')
+        self.assertFalse(caches['shared'].has_key('lock:new'))
+
+    def test_lock_released_on_error(self):
+        """Проверка снятия блокировки, когда вычисление падает"""
+        def fail():
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            self.worker.get_or_set('key', fail)
+        self.assertFalse(caches['shared'].has_key('lock:key'))
+
+    def test_early_expiration(self):
+        """Проверка досрочного пересчёта перед истечением срока"""
+        caches['shared'].set('key', Entry('value', time.time() + 1, 1000))
+        self.assertEqual(self.worker.get_or_set('key', 'new'), 'new')
+        self.assertEqual(self.worker.get_stats()['early_expirations'], 1)
+        caches['shared'].set('key', Entry('value', time.time() + 1, 1000))
+        caches['shared'].add('lock:key', 1)
+        self.assertEqual(self.another_worker.get_or_set('key', 'new'),
+                         'value')
+
+    def test_l2_only_keys(self):
+        """Проверка, что увеличение поколения сразу видят все воркеры"""
+        options = {**OPTIONS, 'L2_ONLY': ['generation:']}
+        worker = TieredCache('shared', {'OPTIONS': options})
+        another_worker = TieredCache('shared', {'OPTIONS': options})
+        worker.set('generation:index', 1, None)
+        self.assertEqual(another_worker.get('generation:index'), 1)
+        worker.incr('generation:index')
+        self.assertEqual(another_worker.get('generation:index'), 2)
+        self.assertEqual(another_worker.get_stats()['l1_hits'], 0)
+
+
+class PerformanceMiddlewareTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def run_middleware(self, view):
+        return PerformanceMiddleware(view)(self.factory.get('/'))
+
+    def test_server_timing_header(self):
+        """Проверка заголовка Server-Timing на странице"""
+        response = self.client.get(reverse('posts:index'))
+        metrics = {
+            part.split(';')[0] for part in
+            response['Server-Timing'].split(', ')
+        }
+        self.assertEqual(metrics, {'db', 'tpl', 'view', 'total'})
+
+    def test_n_plus_one_detected(self):
+        """Проверка пометки повторяющихся запросов одного вида"""
+        def view(request):
+            for pk in range(PERFORMANCE_N_PLUS_ONE_THRESHOLD + 1):
+                list(User.objects.filter(pk__in=range(pk + 1)))
+            return HttpResponse()
+
+        with self.assertLogs('yatube.performance', 'INFO') as logs:
+            response = self.run_middleware(view)
+        self.assertIn('n1;desc="1 repeated queries"',
+                      response['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['queries'],
+                         PERFORMANCE_N_PLUS_ONE_THRESHOLD + 1)
+        self.assertEqual(len(record['n_plus_one']), 1)
+
+    @override_settings(CACHES={
+        **CACHES,
+        'default': {
+            'BACKEND': 'yatube.cache_backends.TieredCache',
+            'LOCATION': 'shared',
+        },
+    })
+    def test_cache_counters(self):
+        """Проверка подсчёта попаданий и промахов кеша за запрос"""
+        def view(request):
+            cache.get('missing')
+            cache.set('key', 'value')
+            cache.get('key')
+            return HttpResponse()
+
+        response = self.run_middleware(view)
+        self.assertIn('cache;desc="1 hits, 1 misses"',
+                      response['Server-Timing'])
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0)
+    def test_sampling(self):
+        """Проверка, что вне выборки запрос не замеряется"""
+        response = self.run_middleware(lambda request: HttpResponse())
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTest(SimpleTestCase):
+    databases = {'default'}
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def run_middleware(self, view, **cookies):
+        request = self.factory.get('/')
+        request.COOKIES.update(cookies)
+        return ReplicaPinMiddleware(view)(request)
+
+    def test_reads_and_writes(self):
+        """Проверка чтения с реплик и записи в основную базу"""
+        self.assertIn(self.router.db_for_read(User), ['replica1', 'replica2'])
+        self.assertEqual(self.router.db_for_write(User), 'default')
+        self.assertEqual(self.router.db_for_read(Session), 'default')
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(User), 'default')
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_pin_after_write(self):
+        """Проверка чтения из основной базы после записи посетителя"""
+        def write(request):
+            self.router.db_for_write(User)
+            return HttpResponse()
+
+        def read(request):
+            return HttpResponse(self.router.db_for_read(User))
+
+        self.assertNotIn(PIN_COOKIE, self.run_middleware(read).cookies)
+        cookie = self.run_middleware(write).cookies[PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        response = self.run_middleware(read, **{PIN_COOKIE: cookie.value})
+        self.assertEqual(response.content, b'default')
+        response = self.run_middleware(read, **{PIN_COOKIE: '1'})
+        self.assertNotEqual(response.content, b'default')
+
+    def test_pin_primary(self):
+        """Проверка закрепления запроса за основной базой"""
+        def view(request):
+            pin_primary()
+            return HttpResponse(self.router.db_for_read(User))
+
+        self.assertEqual(self.run_middleware(view).content, b'default')
+        self.assertFalse(is_pinned())
+
+
+class SQLiteTuningTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_dict = {
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(directory.name, 'db.sqlite3'),
+            'OPTIONS': {'timeout': 0},
+        }
+
+    def connect(self):
+        connection = DatabaseWrapper(dict(self.settings_dict), 'tuning')
+        self.addCleanup(connection.close)
+        return connection
+
+    def test_pragmas(self):
+        """Проверка прагм нового соединения"""
+        cursor = self.connect().cursor()
+        pragmas = {'journal_mode': 'wal', 'synchronous': 1,
+                   'cache_size': -64 * 1024, 'temp_store': 2}
+        for pragma, value in pragmas.items():
+            with self.subTest(pragma=pragma):
+                cursor.execute(f'PRAGMA {pragma}')
+                self.assertEqual(cursor.fetchone()[0], value)
+
+    def test_immediate_transactions(self):
+        """Проверка, что транзакция сразу занимает блокировку записи"""
+        writer, another = self.connect(), self.connect()
+        writer._start_transaction_under_autocommit()
+        with self.assertRaises(OperationalError):
+            another.cursor().execute('CREATE TABLE test (id integer)')
+        writer.cursor().execute('ROLLBACK')
+        another.cursor().execute('CREATE TABLE test (id integer)')